@@ -50,6 +50,25 @@ inline __host__ __device__ float3 physical_to_index(float3 physical, float3 orig
     return make_float3((physical.x - origin.x) / spacing.x, (physical.y - origin.y) / spacing.y, (physical.z - origin.z) / spacing.z);
 }
 
-#endif
+// Fundamental domain of the 90 degree rotation around the center of a square size x size grid:
+// one quarter of the grid plus the center pixel of odd sized grids.
+inline __host__ __device__ bool in_rotation_domain(int x, int y, int size)
+{
+    const bool center = (size % 2 == 1) && x == size / 2 && y == size / 2;
+    return x < (size + 1) / 2 && (y < size / 2 || center);
+}
 
+// Fills quadruple with the pixel (x, y) rotated r times by direction * 90 degree around the grid center.
+// Returns the number of distinct members, i.e. 1 for the center pixel and 4 otherwise.
+inline __host__ __device__ int rotation_quadruple(int x, int y, int size, int direction, int2 *quadruple)
+{
+    quadruple[0] = make_int2(x, y);
+    for (int r = 1; r < 4; ++r)
+    {
+        const int2 previous = quadruple[r - 1];
+        quadruple[r] = direction > 0 ? make_int2(size - 1 - previous.y, previous.x) : make_int2(previous.y, size - 1 - previous.x);
+    }
+    return (quadruple[1].x == x && quadruple[1].y == y) ? 1 : 4;
+}
 
+#endif
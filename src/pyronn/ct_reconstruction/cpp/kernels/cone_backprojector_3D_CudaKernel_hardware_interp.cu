@@ -53,7 +53,8 @@ inline __device__ float3 map( float3 coordinates, const float* d_projection_matr
 __global__ void backproject_3Dcone_beam_kernel_tex_interp( float* vol, const float* d_projection_matrices, const int number_of_projections,
                                                 const uint3 volume_size, const float *volume_spacing_ptr, 
                                                 const float *volume_origin_ptr, 
-                                                const float *projection_multiplier)
+                                                const float *projection_multiplier,
+                                                const unsigned char *fov_mask)
 {
    const int i = blockIdx.x*blockDim.x + threadIdx.x;
    const int j = blockIdx.y*blockDim.y + threadIdx.y;
@@ -64,6 +65,16 @@ __global__ void backproject_3Dcone_beam_kernel_tex_interp( float* vol, const flo
     
    if( i >= volume_size.x  || j >= volume_size.y || k >= volume_size.z )
       return;
+
+   // linear volume address
+   const unsigned int l = volume_size.x * ( k*volume_size.y + j ) + i;
+
+   // skip voxels outside of the field of view
+   if( fov_mask != nullptr && fov_mask[l] == 0 )
+   {
+      vol[l] = 0.0f;
+      return;
+   }
    
    const float3 coordinates = index_to_physical(make_float3(i,j,k),volume_origin,volume_spacing); 
 
@@ -79,11 +90,65 @@ __global__ void backproject_3Dcone_beam_kernel_tex_interp( float* vol, const flo
       val += tex2DLayered( sinogram_as_texture, ip.x + 0.5, ip.y + 0.5, n ) *  ip.z *  ip.z;
    }
 
-   // linear volume address
-   const unsigned int l = volume_size.x * ( k*volume_size.y + j ) + i;
    vol[l] = (val * (*projection_multiplier));
 }
 
+// Symmetry-aware variant for trajectories which map onto themselves under a rotation by 90 degree around the z-axis after a
+// quarter of the views. The projection of voxel (x, y, z) at view n equals the one of its in-plane rotated voxel at view
+// n + r * N/4, thus each thread maps the voxel once per view and accumulates it for the whole symmetric quadruple.
+__global__ void backproject_3Dcone_beam_kernel_tex_interp_symmetric( float* vol, const float* d_projection_matrices, const int number_of_projections,
+                                                const uint3 volume_size, const float *volume_spacing_ptr,
+                                                const float *volume_origin_ptr,
+                                                const float *projection_multiplier,
+                                                const unsigned char *fov_mask, const int symmetry)
+{
+   const int i = blockIdx.x*blockDim.x + threadIdx.x;
+   const int j = blockIdx.y*blockDim.y + threadIdx.y;
+   const int k = blockIdx.z*blockDim.z + threadIdx.z;
+
+   float3 volume_spacing = make_float3(*(volume_spacing_ptr+2), *(volume_spacing_ptr+1), *volume_spacing_ptr);
+   float3 volume_origin = make_float3(*(volume_origin_ptr+2), *(volume_origin_ptr+1), *volume_origin_ptr);
+
+   if( !in_rotation_domain(i, j, volume_size.x) || k >= volume_size.z )
+      return;
+
+   int2 quadruple[4];
+   const int members = rotation_quadruple(i, j, volume_size.x, symmetry, quadruple);
+   const int quarter = number_of_projections / 4;
+
+   // linear volume addresses of the quadruple
+   unsigned int l[4];
+   bool inside[4];
+   float val[4];
+   for( int r = 0; r < members; ++r )
+   {
+      l[r] = volume_size.x * ( k*volume_size.y + quadruple[r].y ) + quadruple[r].x;
+      inside[r] = fov_mask == nullptr || fov_mask[l[r]] != 0;
+      val[r] = 0.0f;
+   }
+
+   const float3 coordinates = index_to_physical(make_float3(i,j,k),volume_origin,volume_spacing);
+
+   for( int n = 0; n < number_of_projections; ++n )
+   {
+      auto ip = map(coordinates , d_projection_matrices, n );
+
+      ip.z = 1.0f / (float)ip.z;
+      ip.x *= ip.z;
+      ip.y *= ip.z;
+      const float weight = ip.z * ip.z;
+
+      for( int r = 0; r < members; ++r )
+      {
+         if( inside[r] )
+            val[r] += tex2DLayered( sinogram_as_texture, ip.x + 0.5, ip.y + 0.5, (n + r * quarter) % number_of_projections ) * weight;
+      }
+   }
+
+   for( int r = 0; r < members; ++r )
+      vol[l[r]] = inside[r] ? (val[r] * (*projection_multiplier)) : 0.0f;
+}
+
 /*************** WARNING ******************./
     * 
     *   Tensorflow is allocating the whole GPU memory for itself and just leave a small slack memory
@@ -103,7 +168,8 @@ void Cone_Backprojection3D_Kernel_Tex_Interp_Launcher(const float *sinogram_ptr,
                                     const int number_of_projections,
                                     const int volume_width, const int volume_height, const int volume_depth, 
                                     const float *volume_spacing, const float *volume_origin,
-                                    const int detector_width, const int detector_height, const float *projection_multiplier)
+                                    const int detector_width, const int detector_height, const float *projection_multiplier,
+                                    const unsigned char *fov_mask, const int symmetry)
 {
     uint3 volume_size = make_uint3(volume_width, volume_height, volume_depth);
     uint2 detector_size = make_uint2(detector_width, detector_height);
@@ -146,11 +212,23 @@ void Cone_Backprojection3D_Kernel_Tex_Interp_Launcher(const float *sinogram_ptr,
     const unsigned int gridsize_x = (volume_size.x-1) / BLOCKSIZE_X + 1;
     const unsigned int gridsize_y = (volume_size.y-1) / BLOCKSIZE_Y + 1;
     const unsigned int gridsize_z = (volume_size.z-1) / BLOCKSIZE_Z + 1;
-    const dim3 grid = dim3( gridsize_x, gridsize_y, gridsize_z );
     const dim3 block = dim3( BLOCKSIZE_X, BLOCKSIZE_Y, BLOCKSIZE_Z );
 
-    backproject_3Dcone_beam_kernel_tex_interp<<< grid, block >>>( out, projection_matrix, number_of_projections,
-                                                            volume_size, volume_spacing, volume_origin, projection_multiplier );
+    if( symmetry != 0 )
+    {
+        // only the in-plane fundamental domain of the rotation symmetry is launched
+        const unsigned int half_size = (volume_size.x + 1) / 2;
+        const dim3 grid = dim3( (half_size-1) / BLOCKSIZE_X + 1, (half_size-1) / BLOCKSIZE_Y + 1, gridsize_z );
+        backproject_3Dcone_beam_kernel_tex_interp_symmetric<<< grid, block >>>( out, projection_matrix, number_of_projections,
+                                                                volume_size, volume_spacing, volume_origin, projection_multiplier,
+                                                                fov_mask, symmetry );
+    }
+    else
+    {
+        const dim3 grid = dim3( gridsize_x, gridsize_y, gridsize_z );
+        backproject_3Dcone_beam_kernel_tex_interp<<< grid, block >>>( out, projection_matrix, number_of_projections,
+                                                                volume_size, volume_spacing, volume_origin, projection_multiplier, fov_mask );
+    }
 
 
     gpuErrchk(cudaUnbindTexture(sinogram_as_texture));
@@ -28,7 +28,7 @@ texture<float, cudaTextureType2D, cudaReadModeElementType> sinogram_as_texture;
 __global__ void backproject_2Dfan_beam_kernel(float *pVolume, const float2 *d_rays, const int number_of_projections, const float sampling_step_size,
                                               const int2 volume_size, const float *volume_spacing_ptr, const float *volume_origin_ptr,
                                               const int detector_size, const float *detector_spacing, const float *detector_origin,
-                                              const float *sid, const float *sdd)
+                                              const float *sid, const float *sdd, const unsigned char *fov_mask)
 {
     const float pi = 3.14159265359f;
     unsigned int volume_x = blockIdx.x * blockDim.x + threadIdx.x;
@@ -37,6 +37,13 @@ __global__ void backproject_2Dfan_beam_kernel(float *pVolume, const float2 *d_ra
     {
         return;
     }
+    const unsigned volume_linearized_idx = volume_y * volume_size.x + volume_x;
+    //Skip pixels outside of the field of view
+    if (fov_mask != nullptr && fov_mask[volume_linearized_idx] == 0)
+    {
+        pVolume[volume_linearized_idx] = 0.0f;
+        return;
+    }
     //Preparations:
     float2 volume_spacing = make_float2(*(volume_spacing_ptr+1), *volume_spacing_ptr);
     float2 volume_origin = make_float2(*(volume_origin_ptr+1), *volume_origin_ptr);
@@ -59,11 +66,68 @@ __global__ void backproject_2Dfan_beam_kernel(float *pVolume, const float2 *d_ra
         pixel_value += tex2D(sinogram_as_texture, s_idx + 0.5f, n + 0.5f) * distance_weight * distance_weight;
     }
 
-    const unsigned volume_linearized_idx = volume_y * volume_size.x + volume_x;
     pVolume[volume_linearized_idx] = (*sid) * (*sdd) * pi * pixel_value / number_of_projections;
 
     return;
 }
+// Symmetry-aware variant for trajectories which map onto themselves under a rotation by 90 degree after a quarter of the views.
+// Source position, intersection and distance weight of pixel p at view n equal the ones of R^r p at view n + r * N/4,
+// thus each thread computes them once per view and accumulates them for the whole symmetric quadruple.
+__global__ void backproject_2Dfan_beam_kernel_symmetric(float *pVolume, const float2 *d_rays, const int number_of_projections,
+                                                        const int2 volume_size, const float *volume_spacing_ptr, const float *volume_origin_ptr,
+                                                        const int detector_size, const float *detector_spacing, const float *detector_origin,
+                                                        const float *sid, const float *sdd, const unsigned char *fov_mask, const int symmetry)
+{
+    const float pi = 3.14159265359f;
+    unsigned int volume_x = blockIdx.x * blockDim.x + threadIdx.x;
+    unsigned int volume_y = blockIdx.y * blockDim.y + threadIdx.y;
+    if (!in_rotation_domain(volume_x, volume_y, volume_size.x))
+    {
+        return;
+    }
+    int2 quadruple[4];
+    const int members = rotation_quadruple(volume_x, volume_y, volume_size.x, symmetry, quadruple);
+    const int quarter = number_of_projections / 4;
+
+    unsigned volume_linearized_idx[4];
+    bool inside[4];
+    float pixel_value[4];
+    for (int r = 0; r < members; ++r)
+    {
+        volume_linearized_idx[r] = quadruple[r].y * volume_size.x + quadruple[r].x;
+        inside[r] = fov_mask == nullptr || fov_mask[volume_linearized_idx[r]] != 0;
+        pixel_value[r] = 0.0f;
+    }
+
+    float2 volume_spacing = make_float2(*(volume_spacing_ptr+1), *volume_spacing_ptr);
+    float2 volume_origin = make_float2(*(volume_origin_ptr+1), *volume_origin_ptr);
+    const float2 pixel_coordinate = index_to_physical(make_float2(volume_x, volume_y), volume_origin, volume_spacing);
+
+    for (int n = 0; n < number_of_projections; n++)
+    {
+        float2 central_ray = d_rays[n];
+        float2 detector_vec = make_float2(-central_ray.y, central_ray.x);
+
+        float2 source_position = central_ray * (-(*sid));
+        float2 central_point = source_position + central_ray * (*sdd);
+
+        float2 intersection = intersectLines2D(pixel_coordinate, source_position, central_point, central_point + detector_vec);
+        float distance_weight = 1.0f / (float)length(pixel_coordinate - source_position);
+        float s = dot(intersection, detector_vec);
+        float s_idx = physical_to_index(s, *detector_origin, *detector_spacing);
+
+        for (int r = 0; r < members; ++r)
+        {
+            if (inside[r])
+                pixel_value[r] += tex2D(sinogram_as_texture, s_idx + 0.5f, (n + r * quarter) % number_of_projections + 0.5f) * distance_weight * distance_weight;
+        }
+    }
+
+    for (int r = 0; r < members; ++r)
+    {
+        pVolume[volume_linearized_idx[r]] = inside[r] ? (*sid) * (*sdd) * pi * pixel_value[r] / number_of_projections : 0.0f;
+    }
+}
 /*************** WARNING ******************./
     * 
     *   Tensorflow is allocating the whole GPU memory for itself and just leave a small slack memory
@@ -83,7 +147,7 @@ void Fan_Backprojection2D_Kernel_Launcher(const float *sinogram_ptr, float *out,
                                           const int volume_size_x, const int volume_size_y, const float *volume_spacing,
                                           const float *volume_origin,
                                           const int detector_size, const float *detector_spacing, const float *detector_origin,
-                                          const float *sid, const float *sdd)
+                                          const float *sid, const float *sdd, const unsigned char *fov_mask, const int symmetry)
 {
     cudaChannelFormatDesc channelDesc = cudaCreateChannelDesc<float>();
     sinogram_as_texture.addressMode[0] = cudaAddressModeBorder;
@@ -103,9 +167,22 @@ void Fan_Backprojection2D_Kernel_Launcher(const float *sinogram_ptr, float *out,
     const dim3 threads_per_block = dim3(block_size, block_size);
     const dim3 num_blocks = dim3(volume_size_x / threads_per_block.x + 1, volume_size_y / threads_per_block.y + 1);
 
-    backproject_2Dfan_beam_kernel<<<num_blocks, threads_per_block>>>(out, ((float2 *) ray_vectors), number_of_projections, sampling_step_size,
-                                                                     volume_size, volume_spacing, volume_origin,
-                                                                     detector_size, detector_spacing, detector_origin, sid, sdd);
+    if (symmetry != 0)
+    {
+        // only the fundamental domain of the rotation symmetry is launched
+        const int half_size = (volume_size_x + 1) / 2;
+        const dim3 symmetric_blocks = dim3(half_size / threads_per_block.x + 1, half_size / threads_per_block.y + 1);
+        backproject_2Dfan_beam_kernel_symmetric<<<symmetric_blocks, threads_per_block>>>(out, ((float2 *) ray_vectors), number_of_projections,
+                                                                                           volume_size, volume_spacing, volume_origin,
+                                                                                           detector_size, detector_spacing, detector_origin,
+                                                                                           sid, sdd, fov_mask, symmetry);
+    }
+    else
+    {
+        backproject_2Dfan_beam_kernel<<<num_blocks, threads_per_block>>>(out, ((float2 *) ray_vectors), number_of_projections, sampling_step_size,
+                                                                         volume_size, volume_spacing, volume_origin,
+                                                                         detector_size, detector_spacing, detector_origin, sid, sdd, fov_mask);
+    }
 
     cudaUnbindTexture(sinogram_as_texture);
     cudaFreeArray(sinogram_array);
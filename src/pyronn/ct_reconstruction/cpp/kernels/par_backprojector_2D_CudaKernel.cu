@@ -26,7 +26,8 @@ texture<float, cudaTextureType2D, cudaReadModeElementType> sinogram_as_texture;
 
 __global__ void backproject_2Dpar_beam_kernel(float *pVolume, const float2 *d_rays, const int number_of_projections,
                                               const int2 volume_size, const float *volume_spacing_ptr, const float *volume_origin_ptr,
-                                              const int detector_size, const float *detector_spacing, const float *detector_origin)
+                                              const int detector_size, const float *detector_spacing, const float *detector_origin,
+                                              const unsigned char *fov_mask)
 {
     const float pi = 3.14159265359f;
     unsigned int volume_x = blockIdx.x * blockDim.x + threadIdx.x;
@@ -35,6 +36,13 @@ __global__ void backproject_2Dpar_beam_kernel(float *pVolume, const float2 *d_ra
     {
         return;
     }
+    const unsigned volume_linearized_idx = volume_y * volume_size.x + volume_x;
+    //Skip pixels outside of the field of view
+    if (fov_mask != nullptr && fov_mask[volume_linearized_idx] == 0)
+    {
+        pVolume[volume_linearized_idx] = 0.0f;
+        return;
+    }
     //Preparations:
     //Prep: Wrap pointer to float2 for better readable code
     float2 volume_spacing = make_float2(*(volume_spacing_ptr+1), *volume_spacing_ptr);
@@ -53,11 +61,63 @@ __global__ void backproject_2Dpar_beam_kernel(float *pVolume, const float2 *d_ra
         pixel_value += tex2D(sinogram_as_texture, s_idx + 0.5f, n + 0.5f);
     }
 
-    const unsigned volume_linearized_idx = volume_y * volume_size.x + volume_x;
     pVolume[volume_linearized_idx] = pi * pixel_value / number_of_projections;
 
     return;
 }
+// Symmetry-aware variant for trajectories which map onto themselves under a rotation by 90 degree after a quarter of the views.
+// The coordinate of pixel p at view n equals the one of its rotated pixel R^r p at view n + r * N/4, thus each thread computes
+// the coordinate once per view and accumulates it for the whole symmetric quadruple.
+__global__ void backproject_2Dpar_beam_kernel_symmetric(float *pVolume, const float2 *d_rays, const int number_of_projections,
+                                                        const int2 volume_size, const float *volume_spacing_ptr, const float *volume_origin_ptr,
+                                                        const int detector_size, const float *detector_spacing, const float *detector_origin,
+                                                        const unsigned char *fov_mask, const int symmetry)
+{
+    const float pi = 3.14159265359f;
+    unsigned int volume_x = blockIdx.x * blockDim.x + threadIdx.x;
+    unsigned int volume_y = blockIdx.y * blockDim.y + threadIdx.y;
+    if (!in_rotation_domain(volume_x, volume_y, volume_size.x))
+    {
+        return;
+    }
+    int2 quadruple[4];
+    const int members = rotation_quadruple(volume_x, volume_y, volume_size.x, symmetry, quadruple);
+    const int quarter = number_of_projections / 4;
+
+    unsigned volume_linearized_idx[4];
+    bool inside[4];
+    float pixel_value[4];
+    for (int r = 0; r < members; ++r)
+    {
+        volume_linearized_idx[r] = quadruple[r].y * volume_size.x + quadruple[r].x;
+        inside[r] = fov_mask == nullptr || fov_mask[volume_linearized_idx[r]] != 0;
+        pixel_value[r] = 0.0f;
+    }
+
+    float2 volume_spacing = make_float2(*(volume_spacing_ptr+1), *volume_spacing_ptr);
+    float2 volume_origin = make_float2(*(volume_origin_ptr+1), *volume_origin_ptr);
+    const float2 pixel_coordinate = index_to_physical(make_float2(volume_x, volume_y), volume_origin, volume_spacing);
+
+    for (int n = 0; n < number_of_projections; n++)
+    {
+        float2 detector_normal = d_rays[n];
+        float2 detector_vec = make_float2(-detector_normal.y, detector_normal.x);
+
+        float s = dot(pixel_coordinate, detector_vec);
+        float s_idx = physical_to_index(s, *detector_origin, *detector_spacing);
+
+        for (int r = 0; r < members; ++r)
+        {
+            if (inside[r])
+                pixel_value[r] += tex2D(sinogram_as_texture, s_idx + 0.5f, (n + r * quarter) % number_of_projections + 0.5f);
+        }
+    }
+
+    for (int r = 0; r < members; ++r)
+    {
+        pVolume[volume_linearized_idx[r]] = inside[r] ? pi * pixel_value[r] / number_of_projections : 0.0f;
+    }
+}
 /*************** WARNING ******************./
     * 
     *   Tensorflow is allocating the whole GPU memory for itself and just leave a small slack memory
@@ -76,7 +136,8 @@ __global__ void backproject_2Dpar_beam_kernel(float *pVolume, const float2 *d_ra
 void Parallel_Backprojection2D_Kernel_Launcher(const float *sinogram_ptr, float *out, const float *ray_vectors, const int number_of_projections,
                                                const int volume_size_x, const int volume_size_y,
                                                const float *volume_spacing_ptr, const float *volume_origin_ptr,
-                                               const int detector_size, const float *detector_spacing_ptr, const float *detector_origin_ptr)
+                                               const int detector_size, const float *detector_spacing_ptr, const float *detector_origin_ptr,
+                                               const unsigned char *fov_mask, const int symmetry)
 {
     cudaChannelFormatDesc channelDesc = cudaCreateChannelDesc<float>();
     sinogram_as_texture.addressMode[0] = cudaAddressModeBorder;
@@ -95,9 +156,22 @@ void Parallel_Backprojection2D_Kernel_Launcher(const float *sinogram_ptr, float
     const dim3 threads_per_block = dim3(block_size, block_size);
     const dim3 num_blocks = dim3(volume_size_x / threads_per_block.x + 1, volume_size_y / threads_per_block.y + 1);
 
-    backproject_2Dpar_beam_kernel<<<num_blocks, threads_per_block>>>(out, ((float2 *) ray_vectors), number_of_projections,
-                                                                     volume_size, volume_spacing_ptr, volume_origin_ptr,
-                                                                     detector_size, detector_spacing_ptr, detector_origin_ptr);
+    if (symmetry != 0)
+    {
+        // only the fundamental domain of the rotation symmetry is launched
+        const int half_size = (volume_size_x + 1) / 2;
+        const dim3 symmetric_blocks = dim3(half_size / threads_per_block.x + 1, half_size / threads_per_block.y + 1);
+        backproject_2Dpar_beam_kernel_symmetric<<<symmetric_blocks, threads_per_block>>>(out, ((float2 *) ray_vectors), number_of_projections,
+                                                                                           volume_size, volume_spacing_ptr, volume_origin_ptr,
+                                                                                           detector_size, detector_spacing_ptr, detector_origin_ptr,
+                                                                                           fov_mask, symmetry);
+    }
+    else
+    {
+        backproject_2Dpar_beam_kernel<<<num_blocks, threads_per_block>>>(out, ((float2 *) ray_vectors), number_of_projections,
+                                                                         volume_size, volume_spacing_ptr, volume_origin_ptr,
+                                                                         detector_size, detector_spacing_ptr, detector_origin_ptr, fov_mask);
+    }
 
     cudaUnbindTexture(sinogram_as_texture);
     cudaFreeArray(sinogram_array);
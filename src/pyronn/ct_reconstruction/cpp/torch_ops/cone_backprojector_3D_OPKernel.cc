@@ -25,12 +25,14 @@
 void Cone_Backprojection3D_Kernel_Tex_Interp_Launcher(const float *sinogram_ptr, float *out, const float *projection_matrix, const int number_of_projections,
                                     const int volume_width, const int volume_height, const int volume_depth, 
                                     const float *volume_spacing, const float *volume_origin,
-                                    const int detector_width, const int detector_height, const float *projection_multiplier);
+                                    const int detector_width, const int detector_height, const float *projection_multiplier,
+                                    const unsigned char *fov_mask, const int symmetry);
 
 void Cone_Backprojection3D_Kernel_Launcher(const float *sinogram_ptr, float *out, const float *projection_matrix, const int number_of_projections,
                                     const int volume_width, const int volume_height, const int volume_depth, 
                                     const float *volume_spacing, const float *volume_origin,
-                                    const int detector_width, const int detector_height, const float *projection_multiplier);
+                                    const int detector_width, const int detector_height, const float *projection_multiplier,
+                                    const unsigned char *fov_mask, const int symmetry);
 
 
 
@@ -42,7 +44,8 @@ void Cone_Backprojection3D_Kernel_Launcher(const float *sinogram_ptr, float *out
 
 torch::Tensor ConeBackprojection3D(torch::Tensor sinogram, torch::Tensor volume_shape,
                                 torch::Tensor volume_origin, torch::Tensor volume_spacing,
-                                torch::Tensor projection_matrices, torch::Tensor projection_multiplier, torch::Tensor hardware_interp ) 
+                                torch::Tensor projection_matrices, torch::Tensor projection_multiplier, torch::Tensor hardware_interp,
+                                torch::Tensor fov_mask, torch::Tensor rotational_symmetry ) 
 {
   CHECK_INPUT(sinogram);
   CHECK_INPUT(volume_shape);
@@ -50,6 +53,14 @@ torch::Tensor ConeBackprojection3D(torch::Tensor sinogram, torch::Tensor volume_
   CHECK_INPUT(volume_spacing);
   CHECK_INPUT(projection_matrices);
   CHECK_INPUT(projection_multiplier);
+  // an empty fov_mask disables the field of view masking
+  if (fov_mask.numel() > 0)
+  {
+    CHECK_INPUT(fov_mask);
+    fov_mask = fov_mask.to(torch::kUInt8);
+  }
+  // a non-zero rotational_symmetry selects the symmetry-aware kernel, see GeometryBase.detect_rotational_symmetry()
+  const int symmetry = rotational_symmetry.numel() > 0 ? rotational_symmetry[0].item<int>() : 0;
   
   auto batch_dim = sinogram.sizes()[0];
   auto out = torch::zeros({batch_dim, volume_shape[0].item<int>(),volume_shape[1].item<int>(), volume_shape[2].item<int>()}, torch::kFloat32).cuda().contiguous();
@@ -59,13 +70,15 @@ torch::Tensor ConeBackprojection3D(torch::Tensor sinogram, torch::Tensor volume_
     {
         Cone_Backprojection3D_Kernel_Tex_Interp_Launcher(sinogram[index].data_ptr<float>(), out[index].data_ptr<float>(), projection_matrices.data_ptr<float>(), sinogram.sizes()[1],
                                                         volume_shape[2].item<int>(), volume_shape[1].item<int>(),volume_shape[0].item<int>(), volume_spacing.data_ptr<float>(), volume_origin.data_ptr<float>(),
-                                                        sinogram.sizes()[3], sinogram.sizes()[2], projection_multiplier.data_ptr<float>());
+                                                        sinogram.sizes()[3], sinogram.sizes()[2], projection_multiplier.data_ptr<float>(),
+                                                        fov_mask.numel() > 0 ? fov_mask.data_ptr<uint8_t>() : nullptr, symmetry);
     }
     else
     {
         Cone_Backprojection3D_Kernel_Launcher(sinogram[index].data_ptr<float>(), out[index].data_ptr<float>(), projection_matrices.data_ptr<float>(), sinogram.sizes()[1],
                                                         volume_shape[2].item<int>(), volume_shape[1].item<int>(),volume_shape[0].item<int>(), volume_spacing.data_ptr<float>(), volume_origin.data_ptr<float>(),
-                                                        sinogram.sizes()[3], sinogram.sizes()[2], projection_multiplier.data_ptr<float>());
+                                                        sinogram.sizes()[3], sinogram.sizes()[2], projection_multiplier.data_ptr<float>(),
+                                                        fov_mask.numel() > 0 ? fov_mask.data_ptr<uint8_t>() : nullptr, symmetry);
     }
   }
 
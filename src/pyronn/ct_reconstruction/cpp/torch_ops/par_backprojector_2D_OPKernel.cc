@@ -25,7 +25,8 @@
 void Parallel_Backprojection2D_Kernel_Launcher(const float *sinogram_ptr, float *out, const float *ray_vectors, const int number_of_projections,
                                                const int volume_size_x, const int volume_size_y,
                                                const float *volume_spacing_ptr, const float *volume_origin_ptr,
-                                               const int detector_size, const float *detector_spacing_ptr, const float *detector_origin_ptr);
+                                               const int detector_size, const float *detector_spacing_ptr, const float *detector_origin_ptr,
+                                               const unsigned char *fov_mask, const int symmetry);
 
 // C++ interface
 
@@ -37,7 +38,7 @@ void Parallel_Backprojection2D_Kernel_Launcher(const float *sinogram_ptr, float
 torch::Tensor ParallelBackprojection2D(torch::Tensor sinogram, torch::Tensor volume_shape,
                                 torch::Tensor volume_origin, torch::Tensor detector_origin,
                                 torch::Tensor volume_spacing, torch::Tensor detector_spacing,
-                                torch::Tensor ray_vectors) 
+                                torch::Tensor ray_vectors, torch::Tensor fov_mask, torch::Tensor rotational_symmetry) 
 {
   CHECK_INPUT(sinogram);
   CHECK_INPUT(volume_shape);
@@ -46,6 +47,14 @@ torch::Tensor ParallelBackprojection2D(torch::Tensor sinogram, torch::Tensor vol
   CHECK_INPUT(volume_spacing);
   CHECK_INPUT(detector_spacing);
   CHECK_INPUT(ray_vectors);
+  // an empty fov_mask disables the field of view masking
+  if (fov_mask.numel() > 0)
+  {
+    CHECK_INPUT(fov_mask);
+    fov_mask = fov_mask.to(torch::kUInt8);
+  }
+  // a non-zero rotational_symmetry selects the symmetry-aware kernel, see GeometryBase.detect_rotational_symmetry()
+  const int symmetry = rotational_symmetry.numel() > 0 ? rotational_symmetry[0].item<int>() : 0;
 
   // auto input = sinogram.data_ptr<float>();
 
@@ -53,7 +62,8 @@ torch::Tensor ParallelBackprojection2D(torch::Tensor sinogram, torch::Tensor vol
   auto out = torch::zeros({batch_dim, volume_shape[0].item<int>(), volume_shape[1].item<int>()}, torch::kFloat32).cuda().contiguous();
   for(int index = 0; index < batch_dim; ++index){
     Parallel_Backprojection2D_Kernel_Launcher(sinogram[index].data_ptr<float>(), out[index].data_ptr<float>(), ray_vectors.data_ptr<float>(), sinogram.sizes()[1], volume_shape[1].item<int>(),  volume_shape[0].item<int>(),
-                                                     volume_spacing.data_ptr<float>(), volume_origin.data_ptr<float>(), sinogram.sizes()[2],  detector_spacing.data_ptr<float>(), detector_origin.data_ptr<float>());
+                                                     volume_spacing.data_ptr<float>(), volume_origin.data_ptr<float>(), sinogram.sizes()[2],  detector_spacing.data_ptr<float>(), detector_origin.data_ptr<float>(),
+                                                     fov_mask.numel() > 0 ? fov_mask.data_ptr<uint8_t>() : nullptr, symmetry);
   }
   // auto out = torch::zeros({volume_shape[0].item<int>(), volume_shape[1].item<int>()}, torch::kFloat32).cuda().contiguous();
 
@@ -10,7 +10,7 @@ torch::Tensor ParallelProjection2D(torch::Tensor volume, torch::Tensor projectio
 torch::Tensor ParallelBackprojection2D(torch::Tensor sinogram, torch::Tensor volume_shape,
                                 torch::Tensor volume_origin, torch::Tensor detector_origin,
                                 torch::Tensor volume_spacing, torch::Tensor detector_spacing,
-                                torch::Tensor ray_vectors) ;
+                                torch::Tensor ray_vectors, torch::Tensor fov_mask, torch::Tensor rotational_symmetry) ;
 
 // Fan Operators
 
@@ -24,7 +24,7 @@ torch::Tensor FanBackprojection2D(torch::Tensor sinogram, torch::Tensor volume_s
                                 torch::Tensor volume_origin, torch::Tensor detector_origin,
                                 torch::Tensor volume_spacing, torch::Tensor detector_spacing,
                                 torch::Tensor source_isocenter_distance, torch::Tensor source_detector_distance,
-                                torch::Tensor ray_vectors);
+                                torch::Tensor ray_vectors, torch::Tensor fov_mask, torch::Tensor rotational_symmetry);
 
 //Cone operators
 
@@ -34,7 +34,8 @@ torch::Tensor ConeProjection3D(torch::Tensor volume, torch::Tensor projection_sh
 
 torch::Tensor ConeBackprojection3D(torch::Tensor sinogram, torch::Tensor volume_shape,
                                 torch::Tensor volume_origin, torch::Tensor volume_spacing,
-                                torch::Tensor projection_matrices, torch::Tensor projection_multiplier, torch::Tensor hardware_interp );
+                                torch::Tensor projection_matrices, torch::Tensor projection_multiplier, torch::Tensor hardware_interp,
+                                torch::Tensor fov_mask, torch::Tensor rotational_symmetry );
 
 PYBIND11_MODULE(TORCH_EXTENSION_NAME, m) {
     //Parallel operators
@@ -35,12 +35,10 @@ class GeometryBase:
         # Volume Parameters:
         self.volume_shape = np.array(volume_shape)
         self.volume_spacing = np.array(volume_spacing, dtype=self.np_dtype)
-        self.volume_origin = -(self.volume_shape - 1) / 2.0 * self.volume_spacing
 
         # Detector Parameters:
         self.detector_shape = np.array(detector_shape)
         self.detector_spacing = np.array(detector_spacing, dtype=self.np_dtype)
-        self.detector_origin = -(self.detector_shape - 1) / 2.0 * self.detector_spacing
 
         # Trajectory Parameters:
         self.number_of_projections = number_of_projections
@@ -49,8 +47,6 @@ class GeometryBase:
         else:
             self.angular_range = [0, angular_range]
 
-        self.sinogram_shape = np.array([self.number_of_projections, *self.detector_shape])
-
         self.source_detector_distance = source_detector_distance
         self.source_isocenter_distance = source_isocenter_distance
         self.fan_angle = None
@@ -58,6 +54,17 @@ class GeometryBase:
         self.projection_multiplier = None
         self.step_size = None
 
+        self._derive_parameters()
+
+    def _derive_parameters(self):
+        """
+            Computes all members which are defined by the volume, detector and trajectory parameters.
+            Sub classes extend this to keep their convenience members consistent.
+        """
+        self.volume_origin = -(self.volume_shape - 1) / 2.0 * self.volume_spacing
+        self.detector_origin = -(self.detector_shape - 1) / 2.0 * self.detector_spacing
+        self.sinogram_shape = np.array([self.number_of_projections, *self.detector_shape])
+        self.rotational_symmetry = self.detect_rotational_symmetry()
 
     # def cuda(self):
     #     self.gpu_device = True
@@ -69,9 +76,145 @@ class GeometryBase:
         """
             Sets the member trajectory.
         Args:
-            trajectory: np.array defining the trajectory.
+            trajectory: np.array defining the trajectory or a compressed trajectory like KeyframeTrajectory.
+                        A compressed trajectory is kept as member keyframe_trajectory instead of the member trajectory
+                        and is expanded chunk by chunk where it is consumed, see trajectory_chunks.
+        """
+        if hasattr(trajectory, 'expand'):
+            self.keyframe_trajectory = trajectory
+            self.__dict__.pop('trajectory', None)
+        else:
+            self.__dict__.pop('keyframe_trajectory', None)
+            self.trajectory = np.array(trajectory, self.np_dtype)
+        self.rotational_symmetry = self.detect_rotational_symmetry()
+
+    def expand_trajectory(self, views=None):
+        """
+            The trajectory of the given views, expanded from keyframe_trajectory if the geometry holds a compressed one.
+        Args:
+            views:  Indices or slice of the views, by default all views, which materializes the full trajectory.
+        Returns:
+            np.array of the trajectory of the views.
+        """
+        keyframe_trajectory = getattr(self, 'keyframe_trajectory', None)
+        if keyframe_trajectory is None:
+            return self.trajectory if views is None else self.trajectory[views]
+        view_indices = np.arange(len(keyframe_trajectory))
+        if views is not None:
+            view_indices = view_indices[views]
+        return np.array(keyframe_trajectory.expand(view_indices), self.np_dtype)
+
+    def trajectory_chunks(self, chunk_size=1024):
+        """
+            Iterates over the trajectory chunk by chunk of views, only one chunk of a compressed trajectory is expanded at a time.
+        Args:
+            chunk_size: Maximum number of views per chunk.
+        Returns:
+            Generator of (view_indices, trajectory chunk) tuples, e.g. for streamed_backprojection.
+        """
+        keyframe_trajectory = getattr(self, 'keyframe_trajectory', None)
+        number_of_projections = len(self.trajectory if keyframe_trajectory is None else keyframe_trajectory)
+        for start in range(0, number_of_projections, chunk_size):
+            view_indices = np.arange(start, min(start + chunk_size, number_of_projections))
+            yield view_indices, self.expand_trajectory(slice(start, view_indices[-1] + 1))
+
+    def detect_rotational_symmetry(self):
+        """
+            Checks whether the trajectory maps onto itself under a rotation by 90 degree around the z-axis after a quarter
+            of the views, e.g. a full circular scan with a number of projections divisible by 4, and whether the in-plane
+            volume grid is square and centered. In this case the backprojection layers compute the per-view coordinates
+            once for each quadruple of symmetric voxels.
+        Returns:
+            The direction of the symmetry rotation, 1 or -1, or 0 if the geometry is not symmetric.
+        """
+        trajectory = getattr(self, 'trajectory', None)
+        if trajectory is None or len(trajectory) == 0 or len(trajectory) % 4 != 0:
+            return 0
+        shape, spacing, origin = self.volume_shape[-2:], self.volume_spacing[-2:], self.volume_origin[-2:]
+        if shape[0] != shape[1] or not np.isclose(spacing[0], spacing[1]) or not np.allclose(origin, -(shape - 1) / 2.0 * spacing):
+            return 0
+
+        # view n + N/4 of the trajectory
+        quarter = np.roll(trajectory, -(len(trajectory) // 4), axis=0)
+        # relative to each column, the translation column of projection matrices is orders of magnitude larger
+        tolerance = 1e-5 * np.abs(trajectory).max(axis=tuple(range(trajectory.ndim - 1)))
+        for direction in (1, -1):
+            if trajectory.ndim == 2:
+                # ray vectors in x, y order: d[n + N/4] = R d[n]
+                rotated = direction * np.stack([-trajectory[:, 1], trajectory[:, 0]], axis=1)
+                symmetric = np.allclose(quarter, rotated, rtol=0, atol=tolerance)
+            else:
+                # projection matrices, columns in x, y, z order: P[n + N/4] R = P[n]
+                rotated = quarter.copy()
+                rotated[:, :, 0] = direction * quarter[:, :, 1]
+                rotated[:, :, 1] = -direction * quarter[:, :, 0]
+                symmetric = np.allclose(rotated, trajectory, rtol=0, atol=tolerance)
+            if symmetric:
+                return direction
+        return 0
+
+    def fov_radius(self):
+        """
+            Radius of the cylindrical field of view of a circular scan around the z-axis in mm, i.e. the distance of the
+            outermost ray (in the central plane) to the rotation axis. Parallel beam geometries have no source distances.
+        """
+        half_width = self.detector_shape[-1] / 2.0 * self.detector_spacing[-1]
+        if self.source_isocenter_distance is None:
+            return half_width
+        return self.source_isocenter_distance * np.sin(np.arctan(half_width / self.source_detector_distance))
+
+    def _fov_cylinder(self):
+        # in-plane voxel center coordinates in Y, X order
+        y = self.volume_origin[-2] + np.arange(self.volume_shape[-2]) * self.volume_spacing[-2]
+        x = self.volume_origin[-1] + np.arange(self.volume_shape[-1]) * self.volume_spacing[-1]
+        disc = (y[:, None] ** 2 + x[None, :] ** 2) <= self.fov_radius() ** 2
+        return np.broadcast_to(disc, tuple(self.volume_shape)).copy()
+
+    def compute_fov_mask(self, general=False):
+        """
+            Computes the mask of all voxels inside the field of view, i.e. the voxels which are seen by every view.
+        Args:
+            general:    If False, the cylindrical field of view of a circular scan is used.
+                        If True, the mask is derived from the trajectory, which is required for arbitrary trajectories
+                        and short scans: from the ray vectors of 2D trajectories or the projection matrices in GeometryCone3D.
+        Returns:
+            np.array of volume_shape with dtype uint8.
         """
-        self.trajectory = np.array(trajectory, self.np_dtype)
+        if not general:
+            return self._fov_cylinder().astype(np.uint8)
+
+        # a pixel is inside if its detector coordinate u lies on the detector in every view. With the ray vector r and
+        # u_vec = (-r_y, r_x) of the 2D layers, u = p * u_vec for parallel beams and u = sdd * (p * u_vec) / (p * r + sid)
+        # for fan beams, checked on the depth p * r + sid to avoid the division
+        y = self.volume_origin[-2] + np.arange(self.volume_shape[-2]) * self.volume_spacing[-2]
+        x = self.volume_origin[-1] + np.arange(self.volume_shape[-1]) * self.volume_spacing[-1]
+        lower = self.detector_origin[-1] - 0.5 * self.detector_spacing[-1]
+        upper = self.detector_origin[-1] + (self.detector_shape[-1] - 0.5) * self.detector_spacing[-1]
+
+        mask = np.ones(self.volume_shape, dtype=bool)
+        for _, chunk in self.trajectory_chunks(16):
+            rays = chunk / np.linalg.norm(chunk, axis=1, keepdims=True)
+            along = rays[:, 0, None, None] * x[None, None, :] + rays[:, 1, None, None] * y[None, :, None]
+            across = rays[:, 0, None, None] * y[None, :, None] - rays[:, 1, None, None] * x[None, None, :]
+            if self.source_isocenter_distance is None:
+                mask &= np.all((across >= lower) & (across <= upper), axis=0)
+            else:
+                depth = along + self.source_isocenter_distance
+                across = across * self.source_detector_distance
+                mask &= np.all((depth > 0) & (across >= lower * depth) & (across <= upper * depth), axis=0)
+        return mask.astype(np.uint8)
+
+    def set_fov_mask(self, fov_mask):
+        """
+            Sets the member fov_mask. The layers skip voxels outside of the mask in the backprojection
+            and treat them as zero in the forward projection.
+        Args:
+            fov_mask: np.array of volume_shape, e.g. from compute_fov_mask(), or None to disable masking.
+        """
+        if fov_mask is None:
+            self.__dict__.pop('fov_mask', None)
+        else:
+            self.fov_mask = np.array(fov_mask, dtype=np.uint8)
 
     def update(self, dict):
         changed = []
@@ -83,6 +226,7 @@ class GeometryBase:
             else:
                 print(f'{key} is not a property of geometry! Please check it!')
         if changed:
+            self.rotational_symmetry = self.detect_rotational_symmetry()
             print(f'The following properties has been changed: {changed}')
             if 'trajectory' not in changed:
                 print(f'Please confirm whether you need to modify the trajectory.')
@@ -93,6 +237,63 @@ class GeometryBase:
             if i[:2] != '__': info[i] = getattr(self, i)
         return info
 
+    def coarsen(self, factor, decimate_views=False):
+        """
+            Derives a coarser geometry covering the same field of view.
+            Volume and detector are binned by factor, i.e. the shapes are divided (rounded up) and the spacings
+            are multiplied by factor. Projection matrices are rescaled to the binned detector pixel grid,
+            ray vectors of 2D trajectories stay unchanged.
+        Args:
+            factor:         Integer binning factor for volume and detector.
+            decimate_views: If True, only every factor-th view is kept as well.
+        Returns:
+            A new, independent Geometry object of the same type.
+        """
+        coarse = copy.deepcopy(self)
+        # the keyframes describe the fine detector grid and all views, the coarse geometry gets the expanded matrices
+        coarse.__dict__.pop('keyframe_trajectory', None)
+        coarse.volume_shape = np.maximum(-(-self.volume_shape // factor), 1)
+        coarse.volume_spacing = np.array(self.volume_spacing * factor, dtype=self.np_dtype)
+        coarse.detector_shape = np.maximum(-(-self.detector_shape // factor), 1)
+        coarse.detector_spacing = np.array(self.detector_spacing * factor, dtype=self.np_dtype)
+
+        view_step = factor if decimate_views else 1
+        if hasattr(self, 'trajectory') or hasattr(self, 'keyframe_trajectory'):
+            trajectory = self.expand_trajectory(slice(None, None, view_step))
+            if trajectory.ndim == 3:
+                # index space binning of the detector: u' = (u - c) / f + c' with c the detector center in pixels,
+                # row 0 of the projection matrices maps to the detector width, row 1 to the height
+                center = (self.detector_shape[::-1][:2] - 1) / 2.0
+                coarse_center = (coarse.detector_shape[::-1][:2] - 1) / 2.0
+                binning = np.eye(3)
+                binning[0:2, 0:2] /= factor
+                binning[0:2, 2] = coarse_center - center / factor
+                trajectory = np.einsum('ij,njk->nik', binning, trajectory)
+            coarse.trajectory = np.array(trajectory, self.np_dtype)
+            coarse.number_of_projections = len(coarse.trajectory)
+        else:
+            coarse.number_of_projections = -(-self.number_of_projections // view_step)
+
+        coarse._derive_parameters()
+        if getattr(self, 'fov_mask', None) is not None:
+            # a coarse voxel is kept if any of its fine voxels is inside the field of view
+            padded = np.zeros(coarse.volume_shape * factor, dtype=np.uint8)
+            padded[tuple(slice(0, n) for n in self.volume_shape)] = self.fov_mask
+            blocks = padded.reshape([n for size in coarse.volume_shape for n in (size, factor)])
+            coarse.fov_mask = blocks.max(axis=tuple(range(1, 2 * len(coarse.volume_shape), 2)))
+        return coarse
+
+    def pyramid(self, levels, decimate_views=False):
+        """
+            Builds a multi-resolution pyramid of consistent geometries for coarse-to-fine processing.
+        Args:
+            levels:         Number of levels, level l is binned by 2**l.
+            decimate_views: If True, the views are decimated by 2**l as well.
+        Returns:
+            List of Geometry objects, the first entry is this geometry itself.
+        """
+        return [self] + [self.coarsen(2 ** level, decimate_views) for level in range(1, levels)]
+
 
 class GeometryParallel2D(GeometryBase):
     """
@@ -126,6 +327,8 @@ class GeometryFan2D(GeometryBase):
                          number_of_projections, angular_range,
                          source_detector_distance, source_isocenter_distance, *args, **kwargs)
 
+    def _derive_parameters(self):
+        super()._derive_parameters()
         # defined by geometry so calculate for convenience use
         self.fan_angle = np.arctan(((self.detector_shape[0] - 1) / 2.0 * self.detector_spacing[0]) / self.source_detector_distance)
 
@@ -146,11 +349,149 @@ class GeometryCone3D(GeometryBase):
                          number_of_projections, angular_range,
                          source_detector_distance, source_isocenter_distance, *args, **kwargs)
 
+        # TODO: need to be changed or not?
+        self.step_size = 0.2
+
+    def _derive_parameters(self):
+        super()._derive_parameters()
         # defined by geometry so calculate for convenience use
         self.fan_angle = np.arctan(((self.detector_shape[1] - 1) / 2.0 * self.detector_spacing[1]) / self.source_detector_distance)
         self.cone_angle = np.arctan(((self.detector_shape[0] - 1) / 2.0 * self.detector_spacing[0]) / self.source_detector_distance)
 
         # Containing the constant part of the distance weight and discretization invariant
-        self.projection_multiplier = self.source_isocenter_distance * self.source_detector_distance * detector_spacing[-1] * np.pi / self.number_of_projections
-        # TODO: need to be changed or not?
-        self.step_size = 0.2
+        self.projection_multiplier = self.source_isocenter_distance * self.source_detector_distance * self.detector_spacing[-1] * np.pi / self.number_of_projections
+
+    def compute_fov_mask(self, general=False):
+        if not general:
+            return super().compute_fov_mask()
+
+        # a voxel is inside if it projects onto the detector in every view, checked as u >= -0.5*w and u <= (width-0.5)*w
+        # on the homogeneous coordinates to avoid the division
+        z = self.volume_origin[0] + np.arange(self.volume_shape[0]) * self.volume_spacing[0]
+        y = self.volume_origin[1] + np.arange(self.volume_shape[1]) * self.volume_spacing[1]
+        x = self.volume_origin[2] + np.arange(self.volume_shape[2]) * self.volume_spacing[2]
+        upper = np.array([self.detector_shape[-1], self.detector_shape[-2]], dtype=np.float32) - 0.5
+        mask = np.ones(self.volume_shape, dtype=bool)
+        for _, chunk in self.trajectory_chunks(16):
+            chunk = chunk.astype(np.float32)
+            # rows of the projection matrices evaluated on the (y, x) plane, z is added per slice
+            in_plane = chunk[:, :, 1, None, None] * y[None, None, :, None] + chunk[:, :, 0, None, None] * x[None, None, None, :]
+            for k in range(self.volume_shape[0]):
+                uvw = in_plane + (chunk[:, :, 2] * z[k] + chunk[:, :, 3])[:, :, None, None]
+                w = uvw[:, 2]
+                mask[k] &= np.all((w > 0)
+                                  & (uvw[:, 0] >= -0.5 * w) & (uvw[:, 0] <= upper[0] * w)
+                                  & (uvw[:, 1] >= -0.5 * w) & (uvw[:, 1] <= upper[1] * w), axis=0)
+        return mask.astype(np.uint8)
+
+
+class GeometryHelicalCone3D(GeometryCone3D):
+    """
+        3D Helical Cone specialization of Geometry.
+    """
+
+    def __init__(self,
+                 volume_shape, volume_spacing,
+                 detector_shape, detector_spacing,
+                 number_of_projections, number_of_turns, pitch,
+                 source_detector_distance, source_isocenter_distance, *args, **kwargs):
+        """
+            Constructor of the helical cone-beam Geometry.
+        Args:
+            number_of_projections:      Number of equidistant projections over all turns.
+            number_of_turns:            Number of full rotations (2*pi) of the source.
+            pitch:                      Helical pitch, i.e. table feed per turn relative to the detector height at the isocenter.
+            For the remaining arguments see GeometryBase.
+        """
+        self.number_of_turns = number_of_turns
+        self.pitch = pitch
+        super().__init__(volume_shape, volume_spacing,
+                         detector_shape, detector_spacing,
+                         number_of_projections, 2 * np.pi * number_of_turns,
+                         source_detector_distance, source_isocenter_distance, *args, **kwargs)
+
+    def _derive_parameters(self):
+        super()._derive_parameters()
+        # table feed per turn in mm, the detector height is scaled down to the isocenter
+        self.table_feed = self.pitch * self.detector_shape[0] * self.detector_spacing[0] * self.source_isocenter_distance / self.source_detector_distance
+
+        # every turn contributes, thus, the angular increment and not the number of projections is the invariant
+        angular_increment = (self.angular_range[1] - self.angular_range[0]) / self.number_of_projections
+        self.projection_multiplier = self.source_isocenter_distance * self.source_detector_distance * self.detector_spacing[-1] * angular_increment / 2.0
+
+    def coarsen(self, factor, decimate_views=False):
+        """
+            Derives a coarser geometry covering the same field of view, see GeometryBase.coarsen.
+            The binned detector height is rounded up, thus the table feed of the fine geometry is kept
+            and the pitch is derived back from it.
+        """
+        coarse = super().coarsen(factor, decimate_views)
+        coarse.table_feed = self.table_feed
+        coarse.pitch = self.pitch * (self.detector_shape[0] * self.detector_spacing[0]) / (coarse.detector_shape[0] * coarse.detector_spacing[0])
+        return coarse
+
+    def source_z_positions(self):
+        """
+            Returns the z-position of the source for every projection.
+        """
+        from ..helpers.trajectories.helical_trajectory import helical_source_positions
+        return helical_source_positions(self.number_of_projections, self.angular_range, self.table_feed)
+
+    def slab_view_ranges(self, slab_thickness):
+        """
+            Computes for every z-slab of the volume the range of views which can see any voxel of the slab.
+            A voxel at height z is only hit by views with |z - source_z| <= h, where h is the half detector height
+            scaled to the far side of the volume. As the source z-position is monotonic in the view index,
+            every slab is covered by one contiguous view range.
+        Args:
+            slab_thickness: Number of z-slices per slab.
+        Returns:
+            List of (z_slice, view_slice) tuples.
+        """
+        source_z = self.source_z_positions()
+        order = 1 if self.table_feed >= 0 else -1
+
+        # radius of the bounding cylinder of the volume in the xy-plane
+        radius = np.sqrt(np.sum((self.volume_shape[1:] * self.volume_spacing[1:] / 2.0) ** 2))
+        half_height = (self.detector_shape[0] / 2.0) * self.detector_spacing[0]
+        reach = half_height * (self.source_isocenter_distance + radius) / self.source_detector_distance
+
+        ranges = []
+        for z_start in range(0, self.volume_shape[0], slab_thickness):
+            z_stop = min(z_start + slab_thickness, self.volume_shape[0])
+            # physical extent of the slab including half a voxel on both sides
+            z_min = self.volume_origin[0] + (z_start - 0.5) * self.volume_spacing[0] - reach
+            z_max = self.volume_origin[0] + (z_stop - 0.5) * self.volume_spacing[0] + reach
+            if order > 0:
+                view_start = np.searchsorted(source_z, z_min, side='left')
+                view_stop = np.searchsorted(source_z, z_max, side='right')
+            else:
+                view_start = np.searchsorted(-source_z, -z_max, side='left')
+                view_stop = np.searchsorted(-source_z, -z_min, side='right')
+            ranges.append((slice(z_start, z_stop), slice(int(view_start), int(view_stop))))
+        return ranges
+
+    def slab_geometries(self, slab_thickness):
+        """
+            Splits the geometry into z-slabs, each restricted to the views covering it.
+            Backprojecting sinogram[:, view_slice] with the slab geometry yields volume[:, z_slice],
+            thus, the backprojection cost is proportional to the part of the helix which covers the slab.
+        Args:
+            slab_thickness: Number of z-slices per slab.
+        Returns:
+            List of (z_slice, view_slice, geometry) tuples.
+        """
+        slabs = []
+        for z_slice, view_slice in self.slab_view_ranges(slab_thickness):
+            slab = copy.deepcopy(self)
+            slab.__dict__.pop('keyframe_trajectory', None)
+            slab.volume_shape[0] = z_slice.stop - z_slice.start
+            slab.volume_origin[0] = self.volume_origin[0] + z_slice.start * self.volume_spacing[0]
+            slab.trajectory = self.expand_trajectory(view_slice)
+            slab.number_of_projections = view_slice.stop - view_slice.start
+            slab.sinogram_shape = np.array([slab.number_of_projections, *self.detector_shape])
+            slab.rotational_symmetry = slab.detect_rotational_symmetry()
+            if getattr(self, 'fov_mask', None) is not None:
+                slab.fov_mask = self.fov_mask[z_slice]
+            slabs.append((z_slice, view_slice, slab))
+        return slabs
@@ -0,0 +1,162 @@
+# Copyright [2019] [Christopher Syben, Markus Michen]
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+
+from pyronn.ct_reconstruction.helpers.filters.filters import half_spectrum_filter, padded_length, ram_lak
+from pyronn.ct_reconstruction.helpers.filters.weights import cosine_weight_coordinates, parker_weights_3d
+
+try:
+    # scipy is optional, its ffts keep single precision and run multi-threaded
+    import scipy.fft as _scipy_fft
+except ModuleNotFoundError:
+    _scipy_fft = None
+
+
+def _rfft(x, length, workers):
+    if _scipy_fft is not None:
+        return _scipy_fft.rfft(x, n=length, axis=-1, workers=workers)
+    return np.fft.rfft(x, n=length, axis=-1)
+
+
+def _irfft(x, length, workers):
+    if _scipy_fft is not None:
+        return _scipy_fft.irfft(x, n=length, axis=-1, workers=workers, overwrite_x=True)
+    return np.fft.irfft(x, n=length, axis=-1)
+
+
+def _view_slice(array, ndim, axis, view_slice):
+    # arrays which differ per view are sliced along the projection axis, aligned from the right
+    axis_from_end = ndim - axis
+    if array.ndim >= axis_from_end and array.shape[-axis_from_end] > 1:
+        index = [slice(None)] * array.ndim
+        index[-axis_from_end] = view_slice
+        array = array[tuple(index)]
+    return array
+
+
+class ChunkedFilter:
+    """
+        Filters sinograms along the detector rows chunk by chunk of views, in place on np.arrays or np.memmaps.
+        The rows are zero-padded and filtered with real ffts like rfft_filter. The padded buffer and the half-spectrum
+        filter are allocated once and reused for all chunks, thus the memory is bounded by the chunk size.
+        Weights, e.g. cosine and redundancy weights, are applied while the chunk is copied into the padded buffer,
+        thus weighting and filtering take a single pass over the sinogram. The cosine weights of a cone beam detector
+        do not depend on the view, they are computed once from their separable coordinates as one detector image.
+        Uses scipy.fft with the given number of workers if scipy is installed, np.fft otherwise.
+    """
+
+    def __init__(self, filter, detector_width, chunk_size=16, workers=-1, weights=(), cosine_coordinates=None,
+                 source_detector_distance=None):
+        """
+        Args:
+            filter:         Frequency domain filter for the detector width, e.g. from helpers.filters.filters.
+            detector_width: Width of the detector.
+            chunk_size:     Number of views filtered at once.
+            workers:        Number of fft threads of scipy.fft, -1 uses all cores.
+            weights:        Sequence of weights broadcastable against the sinogram, which are multiplied before filtering.
+            cosine_coordinates:         Squared detector coordinates (rows, columns) from cosine_weight_coordinates,
+                                        the cosine weights are multiplied before the other weights.
+            source_detector_distance:   Source to detector distance of the cosine weights.
+        """
+        self.detector_width = detector_width
+        self.padded_length = padded_length(detector_width)
+        self.half_spectrum = half_spectrum_filter(np.asarray(filter), self.padded_length, readonly=True)
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.weights = [np.asarray(w, dtype=np.float32) for w in weights]
+        self.cosine_weights = None
+        if cosine_coordinates is not None:
+            # same expression as cosine_weights_3d, the (rows, 1) and (1, columns) coordinates broadcast to the detector
+            rows, columns = cosine_coordinates
+            sdd = source_detector_distance
+            self.cosine_weights = (sdd / np.sqrt(sdd ** 2 + rows + columns)).astype(np.float32)
+
+    def _filter_chunk(self, buffer, chunk, spectrum, weights):
+        # the padding of the buffer stays zero, only the detector width is written
+        buffer[..., :self.detector_width] = chunk
+        if self.cosine_weights is not None:
+            buffer[..., :self.detector_width] *= self.cosine_weights
+        for w in weights:
+            buffer[..., :self.detector_width] *= w
+        x = _rfft(buffer, self.padded_length, self.workers)
+        x *= spectrum
+        return _irfft(x, self.padded_length, self.workers)[..., :self.detector_width]
+
+    def __call__(self, sinogram, out=None, axis=0):
+        """
+            Filters the sinogram.
+        Args:
+            sinogram:   Sinogram with the detector width as last axis as np.array or np.memmap.
+            out:        Output array of the same shape, by default the sinogram is filtered in place.
+            axis:       Projection axis the chunks are taken from, e.g. 1 for batched sinograms.
+        Returns:
+            The filtered sinogram.
+        """
+        if out is None:
+            out = sinogram
+        axis = axis % sinogram.ndim
+        buffer_shape = list(sinogram.shape)
+        buffer_shape[axis] = min(self.chunk_size, sinogram.shape[axis])
+        buffer_shape[-1] = self.padded_length
+        buffer = np.zeros(buffer_shape, dtype=np.float32)
+
+        index = [slice(None)] * sinogram.ndim
+        buffer_index = [slice(None)] * sinogram.ndim
+        for start in range(0, sinogram.shape[axis], self.chunk_size):
+            view_slice = slice(start, min(start + self.chunk_size, sinogram.shape[axis]))
+            index[axis] = view_slice
+            buffer_index[axis] = slice(0, view_slice.stop - start)
+            spectrum = _view_slice(self.half_spectrum, sinogram.ndim, axis, view_slice)
+            weights = [_view_slice(w, sinogram.ndim, axis, view_slice) for w in self.weights]
+            out[tuple(index)] = self._filter_chunk(buffer[tuple(buffer_index)], sinogram[tuple(index)], spectrum, weights)
+        return out
+
+
+def filter_sinogram_chunked(sinogram, filter, out=None, axis=0, chunk_size=16, workers=-1):
+    """
+        Filters a sinogram in place chunk by chunk of views, see ChunkedFilter.
+    Args:
+        sinogram:   Sinogram with the detector width as last axis as np.array or np.memmap.
+        filter:     Frequency domain filter for the detector width.
+        out:        Output array of the same shape, by default the sinogram is filtered in place.
+        axis:       Projection axis the chunks are taken from.
+        chunk_size: Number of views filtered at once.
+        workers:    Number of fft threads of scipy.fft, -1 uses all cores.
+    Returns:
+        The filtered sinogram.
+    """
+    return ChunkedFilter(filter, sinogram.shape[-1], chunk_size, workers)(sinogram, out, axis)
+
+
+def fdk_preprocessing(geometry, filter=None, chunk_size=16, workers=-1):
+    """
+        Plans the fused FDK preprocessing of a cone beam geometry: cosine weighting, Parker redundancy weighting
+        for short scans and filtering in one pass. The plan is reusable for all sinograms of the geometry.
+    Args:
+        geometry:   Cone beam Geometry object.
+        filter:     Frequency domain filter for the detector width, by default the ram_lak filter.
+        chunk_size: Number of views filtered at once.
+        workers:    Number of fft threads of scipy.fft, -1 uses all cores.
+    Returns:
+        ChunkedFilter object, call it with a sinogram of shape (number_of_projections, *detector_shape).
+    """
+    detector_width = geometry.detector_shape[-1]
+    if filter is None:
+        filter = ram_lak(detector_width, geometry.detector_spacing[-1])
+    weights = []
+    if geometry.angular_range[1] - geometry.angular_range[0] < 2 * np.pi:
+        weights.append(parker_weights_3d(geometry))
+    return ChunkedFilter(filter, detector_width, chunk_size, workers, weights,
+                         cosine_weight_coordinates(geometry), geometry.source_detector_distance)
@@ -13,9 +13,86 @@
 # limitations under the License.
 
 import numpy as np
+from pyronn.ct_reconstruction.helpers.misc.cache import cached
 from typing import Tuple
 
 
+def broadcast_filter(filter_1D:np.array, number_of_projections:int, ndim:int)->np.array:
+    """
+    broadcasts a 1d filter to the shape of a 2d (projections, width) or 3d (projections, 1, width) filter.
+    the result is a read-only view, no memory is allocated for the repetitions.
+
+    :param filter_1D: 1d filter
+    :param number_of_projections: number of projections
+    :param ndim: 2 or 3
+    :return: the broadcast filter
+    """
+    shape = (number_of_projections,) + (1,) * (ndim - 2) + (len(filter_1D),)
+    return np.broadcast_to(filter_1D.reshape((1,) * (ndim - 1) + (-1,)), shape)
+
+
+def compact_filter(filter):
+    """
+    collapses the broadcast axes of a filter, e.g. from broadcast_filter, to size 1.
+    the compact filter broadcasts against the sinogram, other filters are returned unchanged.
+
+    :param filter: filter as np.array or torch.Tensor
+    :return: the compact filter
+    """
+    if isinstance(filter, np.ndarray):
+        index = tuple(slice(0, 1) if stride == 0 else slice(None) for stride in filter.strides)
+        filter = np.ascontiguousarray(filter[index])
+    return filter
+
+
+def fast_fft_length(minimum_length:int)->int:
+    """
+    smallest 5-smooth length (only prime factors 2, 3 and 5) which is at least minimum_length, the fft is fast for these.
+
+    :param minimum_length: minimum length
+    :return: the fft length
+    """
+    length = max(int(minimum_length), 1)
+    while True:
+        remainder = length
+        for factor in (2, 3, 5):
+            while remainder % factor == 0:
+                remainder //= factor
+        if remainder == 1:
+            return length
+        length += 1
+
+
+def padded_length(detector_width:int)->int:
+    """
+    fft length of the zero-padded detector rows, at least twice the detector width to avoid the wraparound of the circular convolution.
+
+    :param detector_width: width of detector
+    :return: the padded length
+    """
+    return fast_fft_length(2 * detector_width)
+
+
+@cached
+def half_spectrum_filter(filter:np.array, padded_length:int)->np.array:
+    """
+    resamples a frequency domain filter in fft layout (as returned by the filters of this module) to the half-spectrum
+    layout of an rfft of length padded_length. the filters are even, the positive frequencies are linearly interpolated.
+
+    :param filter: filter with the detector width as last axis, broadcast axes are collapsed
+    :param padded_length: length of the rfft
+    :return: the filter with shape (..., padded_length // 2 + 1)
+    """
+    filter = compact_filter(np.asarray(filter))
+    detector_width = filter.shape[-1]
+    frequencies = np.arange(detector_width // 2 + 1) / detector_width
+    half_frequencies = np.fft.rfftfreq(padded_length)
+    rows = filter.reshape(-1, detector_width)[:, :detector_width // 2 + 1]
+    half_spectrum = np.stack([np.interp(half_frequencies, frequencies, row) for row in rows])
+    return half_spectrum.reshape(filter.shape[:-1] + (len(half_frequencies),)).astype(np.float32)
+
+
+@cached
 def ramp(detector_width:int)->np.array:
     """
     create a 1d ramp filter.
@@ -23,13 +100,9 @@ def ramp(detector_width:int)->np.array:
     :param detector_width: width of detector(filter)
     :return: filter
     """
-    filter_array = np.zeros(detector_width)
+    i = np.arange(detector_width)
     frequency_spacing = 0.5 / (detector_width / 2.0)
-    for i in range(0, filter_array.shape[0]):
-        if i <= filter_array.shape[0] / 2.0:
-            filter_array[i] = i * frequency_spacing
-        elif i > filter_array.shape[0] / 2.0:
-            filter_array[i] = 0.5 - (((i - filter_array.shape[0] / 2.0)) * frequency_spacing)
+    filter_array = np.where(i <= detector_width / 2.0, i * frequency_spacing, 0.5 - (i - detector_width / 2.0) * frequency_spacing)
     return filter_array.astype(np.float32)
 
 
@@ -41,19 +114,7 @@ def ramp_2D(detector_shape:Tuple[int,int], number_of_projections:int)->np.array:
     :param number_of_projections: number of projections
     :return: a 2d ramp filter
     """
-    detector_width = detector_shape[-1]
-
-    filter = [
-        np.reshape(
-            ramp(detector_width),
-            (1, detector_width)
-        )
-        for i in range(0, number_of_projections)
-    ]
-
-    filter = np.concatenate(filter)
-
-    return filter
+    return broadcast_filter(ramp(detector_shape[-1]), number_of_projections, 2)
 
 
 def ramp_3D(detector_shape:Tuple[int,int,int], number_of_projections:int)->np.array:
@@ -64,22 +125,11 @@ def ramp_3D(detector_shape:Tuple[int,int,int], number_of_projections:int)->np.ar
     :param number_of_projections: number of projections
     :return: a 3d ramp filter
     """
-    detector_width = detector_shape[-1]
-
-    filter = [
-        np.reshape(
-            ramp(detector_width),
-            (1, 1, detector_width)
-        )
-        for i in range(0, number_of_projections)
-    ]
-
-    filter = np.concatenate(filter)
-
-    return filter
+    return broadcast_filter(ramp(detector_shape[-1]), number_of_projections, 3)
 
 
 # Yipeng rewrote the filters direct in frequency domain
+@cached
 def ram_lak(num_detectors: int, detector_spacing: float) -> np.array:
     """Generate the RAM-LAK (Ramp) filter in the frequency domain."""
     frequencies = np.fft.fftfreq(num_detectors)
@@ -98,9 +148,7 @@ def ram_lak_2D(
     detector_spacing_width = detector_spacing[-1]
 
     filter_1D = ram_lak(detector_width, detector_spacing_width)
-    filter_2D = np.tile(filter_1D, (number_of_projections, 1))
-
-    return filter_2D
+    return broadcast_filter(filter_1D, number_of_projections, 2)
 
 
 def ram_lak_3D(
@@ -112,13 +160,10 @@ def ram_lak_3D(
     detector_spacing_width = detector_spacing[-1]
 
     filter_1D = ram_lak(detector_width, detector_spacing_width)
-    filter_3D = np.tile(
-        filter_1D.reshape(1, 1, detector_width), (number_of_projections, 1, 1)
-    )
-
-    return filter_3D
+    return broadcast_filter(filter_1D, number_of_projections, 3)
 
 
+@cached
 def shepp_logan(num_detectors: int, detector_spacing: float) -> np.array:
     """Generate the Shepp-Logan filter in the frequency domain."""
     frequencies = np.fft.fftfreq(num_detectors)
@@ -140,9 +185,7 @@ def shepp_logan_2D(
     detector_spacing_width = detector_spacing[-1]
 
     filter_1D = shepp_logan(detector_width, detector_spacing_width)
-    filter_2D = np.tile(filter_1D, (number_of_projections, 1))
-
-    return filter_2D
+    return broadcast_filter(filter_1D, number_of_projections, 2)
 
 
 def shepp_logan_3D(
@@ -154,13 +197,10 @@ def shepp_logan_3D(
     detector_spacing_width = detector_spacing[-1]
 
     filter_1D = shepp_logan(detector_width, detector_spacing_width)
-    filter_3D = np.tile(
-        filter_1D.reshape(1, 1, detector_width), (number_of_projections, 1, 1)
-    )
-
-    return filter_3D
+    return broadcast_filter(filter_1D, number_of_projections, 3)
 
 
+@cached
 def cosine(num_detectors: int, detector_spacing: float) -> np.array:
     """Generate the Cosine filter in the frequency domain."""
     frequencies = np.fft.fftfreq(num_detectors)
@@ -179,9 +219,7 @@ def cosine_2D(
     detector_spacing_width = detector_spacing[-1]
 
     filter_1D = cosine(detector_width, detector_spacing_width)
-    filter_2D = np.tile(filter_1D, (number_of_projections, 1))
-
-    return filter_2D
+    return broadcast_filter(filter_1D, number_of_projections, 2)
 
 
 def cosine_3D(
@@ -193,13 +231,10 @@ def cosine_3D(
     detector_spacing_width = detector_spacing[-1]
 
     filter_1D = cosine(detector_width, detector_spacing_width)
-    filter_3D = np.tile(
-        filter_1D.reshape(1, 1, detector_width), (number_of_projections, 1, 1)
-    )
-
-    return filter_3D
+    return broadcast_filter(filter_1D, number_of_projections, 3)
 
 
+@cached
 def hamming(num_detectors: int, detector_spacing: float) -> np.array:
     """Generate the Hamming filter in the frequency domain."""
     frequencies = np.fft.fftfreq(num_detectors)
@@ -218,9 +253,7 @@ def hamming_2D(
     detector_spacing_width = detector_spacing[-1]
 
     filter_1D = hamming(detector_width, detector_spacing_width)
-    filter_2D = np.tile(filter_1D, (number_of_projections, 1))
-
-    return filter_2D
+    return broadcast_filter(filter_1D, number_of_projections, 2)
 
 
 def hamming_3D(
@@ -232,13 +265,10 @@ def hamming_3D(
     detector_spacing_width = detector_spacing[-1]
 
     filter_1D = hamming(detector_width, detector_spacing_width)
-    filter_3D = np.tile(
-        filter_1D.reshape(1, 1, detector_width), (number_of_projections, 1, 1)
-    )
-
-    return filter_3D
+    return broadcast_filter(filter_1D, number_of_projections, 3)
 
 
+@cached
 def hann(num_detectors: int, detector_spacing: float) -> np.array:
     """Generate the Hann filter in the frequency domain."""
     frequencies = np.fft.fftfreq(num_detectors)
@@ -257,9 +287,7 @@ def hann_2D(
     detector_spacing_width = detector_spacing[-1]
 
     filter_1D = hann(detector_width, detector_spacing_width)
-    filter_2D = np.tile(filter_1D, (number_of_projections, 1))
-
-    return filter_2D
+    return broadcast_filter(filter_1D, number_of_projections, 2)
 
 
 def hann_3D(
@@ -271,8 +299,4 @@ def hann_3D(
     detector_spacing_width = detector_spacing[-1]
 
     filter_1D = hann(detector_width, detector_spacing_width)
-    filter_3D = np.tile(
-        filter_1D.reshape(1, 1, detector_width), (number_of_projections, 1, 1)
-    )
-
-    return filter_3D
+    return broadcast_filter(filter_1D, number_of_projections, 3)
@@ -0,0 +1,141 @@
+# Copyright [2019] [Christopher Syben, Markus Michen]
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import timeit
+
+import numpy as np
+
+from pyronn.ct_reconstruction.helpers.filters.filters import compact_filter, half_spectrum_filter, padded_length
+from pyronn.ct_reconstruction.helpers.misc.cache import cached
+from pyronn.ct_reconstruction.helpers.misc.general_utils import rfft_filter
+
+# benchmarked filter modes, keyed by (array type, detector width, number of rows rounded up to a power of two, filter shape)
+_mode_choices = {}
+
+
+@cached
+def spatial_kernel(filter:np.array, detector_width:int)->np.array:
+    """
+    truncated spatial domain kernel of a frequency domain filter, e.g. ram_lak or shepp_logan from filters.py.
+    the kernel is the inverse of the zero-padded half-spectrum filter of rfft_filter, thus both modes give the same result.
+
+    :param filter: frequency domain filter for the detector width, broadcast axes are collapsed
+    :param detector_width: width of detector
+    :return: kernel with shape (..., 2 * detector_width - 1), tap n - (detector_width - 1) at index n
+    """
+    length = padded_length(detector_width)
+    kernel = np.fft.irfft(half_spectrum_filter(filter, length, readonly=True), n=length, axis=-1)
+    taps = np.arange(-(detector_width - 1), detector_width) % length
+    return kernel[..., taps].astype(np.float32)
+
+
+@cached
+def convolution_matrix(filter:np.array, detector_width:int)->np.array:
+    """
+    toeplitz matrix of the spatial kernel, the filtered rows are the rows multiplied with this matrix.
+
+    :param filter: frequency domain filter for the detector width
+    :param detector_width: width of detector
+    :return: matrix with shape (..., detector_width, detector_width)
+    """
+    kernel = spatial_kernel(filter, detector_width, readonly=True)
+    # out[i] = sum_j x[j] k[i - j]
+    offsets = np.arange(detector_width)[None, :] - np.arange(detector_width)[:, None] + detector_width - 1
+    return np.ascontiguousarray(kernel[..., offsets])
+
+
+def spatial_filter(sinogram, filter):
+    """
+    filters the sinogram along the detector rows by direct convolution with the truncated spatial kernel,
+    computed as one matrix product. faster than the fft for narrow detectors.
+
+    :param sinogram: sinogram with the detector width as last axis as np.array or torch.Tensor
+    :param filter: frequency domain filter for the detector width, filters which differ per view have shape (views, 1, width)
+    :return: the filtered sinogram of the same type and device as the input
+    """
+    detector_width = sinogram.shape[-1]
+    matrix = convolution_matrix(np.asarray(filter.detach().cpu() if hasattr(filter, 'detach') else filter), detector_width, readonly=True)
+    if int(np.prod(matrix.shape[:-2])) == 1:
+        # compact filters like ram_lak_2D have size 1 axes, they are applied as one matrix product
+        matrix = matrix.reshape(detector_width, detector_width)
+    if isinstance(sinogram, np.ndarray):
+        if matrix.ndim == 2:
+            return np.matmul(sinogram, matrix).astype(sinogram.dtype, copy=False)
+        # one matrix per view: each row is multiplied as a (1, width) matrix with the matrix broadcast to it
+        return np.matmul(sinogram[..., None, :], matrix)[..., 0, :].astype(sinogram.dtype, copy=False)
+    import torch
+    matrix = torch.tensor(matrix, device=sinogram.device, dtype=sinogram.dtype)
+    if matrix.dim() == 2:
+        return torch.matmul(sinogram, matrix)
+    return torch.matmul(sinogram.unsqueeze(-2), matrix).squeeze(-2)
+
+
+def select_filter_mode(sinogram, filter=None, repeats=3):
+    """
+    chooses the faster of 'spatial' and 'fft' filtering for the detector width and number of rows of the sinogram.
+    the choice is made by a micro-benchmark on random data with the compact filter, which runs once per key.
+
+    :param sinogram: sinogram as np.array or torch.Tensor, only type, shape and device are used
+    :param filter: frequency domain filter which is applied, by default a 1d ramp
+    :param repeats: number of timed repetitions
+    :return: 'spatial' or 'fft'
+    """
+    detector_width = sinogram.shape[-1]
+    rows = int(np.prod(sinogram.shape[:-1]))
+    rows = 1 << max(rows - 1, 0).bit_length()
+    is_numpy = isinstance(sinogram, np.ndarray)
+    if filter is None:
+        filter = np.abs(np.fft.fftfreq(detector_width)).astype(np.float32)
+    filter = compact_filter(np.asarray(filter.detach().cpu() if hasattr(filter, 'detach') else filter))
+    key = ('numpy' if is_numpy else str(sinogram.device), detector_width, rows, filter.shape[:-1])
+    if key not in _mode_choices:
+        if is_numpy:
+            data = np.random.default_rng(0).random((rows, detector_width), dtype=np.float32)
+            synchronize = lambda: None
+        else:
+            import torch
+            data = torch.rand(rows, detector_width, device=sinogram.device)
+            synchronize = torch.cuda.synchronize if data.is_cuda else (lambda: None)
+
+        def run(mode_filter):
+            mode_filter(data, filter)
+            synchronize()
+
+        # the first runs fill the caches of the kernels and half-spectra
+        run(spatial_filter)
+        run(rfft_filter)
+        spatial_time = min(timeit.repeat(lambda: run(spatial_filter), number=1, repeat=repeats))
+        fft_time = min(timeit.repeat(lambda: run(rfft_filter), number=1, repeat=repeats))
+        _mode_choices[key] = 'spatial' if spatial_time < fft_time else 'fft'
+    return _mode_choices[key]
+
+
+def filter_sinogram(sinogram, filter, mode='auto'):
+    """
+    filters the sinogram along the detector rows in the spatial or in the frequency domain, both give the same result.
+
+    :param sinogram: sinogram with the detector width as last axis as np.array or torch.Tensor
+    :param filter: frequency domain filter for the detector width, e.g. from filters.py
+    :param mode: 'spatial', 'fft' or 'auto' to choose the faster mode with select_filter_mode. filters which differ per view
+                 are always applied with 'fft' by 'auto', their stack of convolution matrices is too large to be cached.
+    :return: the filtered sinogram
+    """
+    if mode == 'auto':
+        per_view = int(np.prod(compact_filter(filter).shape[:-1])) > 1
+        mode = 'fft' if per_view else select_filter_mode(sinogram, filter)
+    if mode == 'spatial':
+        return spatial_filter(sinogram, filter)
+    elif mode == 'fft':
+        return rfft_filter(sinogram, filter)
+    raise ValueError(f'Unknown filter mode {mode}, use spatial, fft or auto.')
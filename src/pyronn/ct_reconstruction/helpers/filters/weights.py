@@ -13,31 +13,45 @@
 # limitations under the License.
 
 import numpy as np
+from pyronn.ct_reconstruction.helpers.misc.cache import cached
 
 
-# 3d cosine weights
-def cosine_weights_3d(geometry):
+def cosine_weight_coordinates(geometry):
+    """
+        Separable form of the 3d cosine weights: the squared detector coordinates of the rows and columns in mm.
+        The weight of pixel (v, u) is sdd / sqrt(sdd**2 + rows[v] + columns[u]), which can be evaluated for any sub-block.
+    Returns:
+        rows with shape (detector rows, 1) and columns with shape (1, detector columns), flipped like cosine_weights_3d.
+    """
     cu = -(geometry.detector_shape[-1] - 1) / 2 * geometry.detector_spacing[-1]
     cv = -(geometry.detector_shape[-2] - 1) / 2 * geometry.detector_spacing[-2]
-    sd2 = geometry.source_detector_distance ** 2
-
-    w = np.zeros((geometry.detector_shape[-2], geometry.detector_shape[-1]), dtype=np.float32)
+    # the single precision products match the scalar computation of the coordinates
+    dv = (np.arange(geometry.detector_shape[-2], dtype=np.float32) * np.float32(geometry.detector_spacing[-2]) + cv) ** 2
+    du = (np.arange(geometry.detector_shape[-1], dtype=np.float32) * np.float32(geometry.detector_spacing[-1]) + cu) ** 2
+    return dv[::-1, None], du[None, ::-1]
 
-    for v in range(0, geometry.detector_shape[-2]):
-        dv = (v * geometry.detector_spacing[-2] + cv) ** 2
-        for u in range(0, geometry.detector_shape[-1]):
-            du = (u * geometry.detector_spacing[-1] + cu) ** 2
-            w[v, u] = geometry.source_detector_distance / np.sqrt(sd2 + dv + du)
 
-    return np.flip(w)
+# 3d cosine weights
+@cached
+def cosine_weights_3d(geometry):
+    sd2 = geometry.source_detector_distance ** 2
+    dv, du = cosine_weight_coordinates(geometry)
+    w = geometry.source_detector_distance / np.sqrt(sd2 + dv + du)
+    return w.astype(np.float32)
 
 
+@cached
 def parker_weights_3d(geometry):
     weights = np.flip(parker_weights_2d(geometry), axis=1)
-    weights = np.array(np.expand_dims(weights, axis=1), dtype=np.float32)
-    return weights
+    return weights[:, None, :].astype(np.float32)
 
 
+def _view_angles(start, angular_increment, number_of_projections):
+    # accumulated like a per view loop (beta += angular_increment), thus the angles are identical to it
+    return np.cumsum(np.concatenate([[start], np.full(number_of_projections - 1, angular_increment)]))
+
+
+@cached
 def parker_weights_2d(geometry):
     number_of_projections = geometry.number_of_projections
     angular_range = geometry.angular_range[1] - geometry.angular_range[0]
@@ -47,35 +61,25 @@ def parker_weights_2d(geometry):
     source_detector_distance = geometry.source_detector_distance
     fan_angle = geometry.fan_angle
 
-    weights = np.ones((number_of_projections, detector_shape[-1]))
     angular_increment = angular_range / number_of_projections
-    beta = 0
-    beta = ((np.pi + 2*fan_angle) - angular_range) / 2.0 # adds offset
-
-    for beta_idx in range(weights.shape[0]):
-        for gamma_idx in range(weights.shape[1]):
-                # calculate correct pos on detector and current angle
-                gamma_angle = gamma_idx * detector_spacing[-1]# + detector_origin[-1]
-                gamma_angle = np.arctan(gamma_angle / source_detector_distance)
-
-                # check if rays sampled twice and create weight volume
-                if 0 <= beta and beta <= 2*(fan_angle - gamma_angle):
-                    val = np.sin( ((np.pi/4.0) * beta) / (fan_angle - gamma_angle) ) ** 2
-                    if not np.isnan(val):
-                        weights[beta_idx, gamma_idx] = val
-
-                elif 2*(fan_angle - gamma_angle) < beta and beta < np.pi - 2*gamma_angle:
-                    weights[beta_idx, gamma_idx] = 1.0
-
-                elif np.pi - 2*gamma_angle <= beta and beta <= np.pi + 2*fan_angle:
-                    val = np.sin((np.pi/4.0) * ((np.pi + 2*fan_angle - beta) / (gamma_angle + fan_angle))) ** 2
-                    if not np.isnan(val):
-                        weights[beta_idx, gamma_idx] = val
-
-                else:
-                    weights[beta_idx, gamma_idx] = 0
-        
-        beta += angular_increment
+    offset = ((np.pi + 2*fan_angle) - angular_range) / 2.0 # adds offset
+    beta = _view_angles(offset, angular_increment, number_of_projections)[:, None]
+
+    # calculate correct pos on detector and current angle
+    gamma_angle = np.arange(detector_shape[-1], dtype=np.float64) * detector_spacing[-1]# + detector_origin[-1]
+    gamma_angle = np.arctan(gamma_angle / source_detector_distance)[None, :]
+
+    # check if rays sampled twice and create weight volume
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rising = np.sin( ((np.pi/4.0) * beta) / (fan_angle - gamma_angle) ) ** 2
+        falling = np.sin((np.pi/4.0) * ((np.pi + 2*fan_angle - beta) / (gamma_angle + fan_angle))) ** 2
+    weights = np.select([(0 <= beta) & (beta <= 2*(fan_angle - gamma_angle)),
+                         (2*(fan_angle - gamma_angle) < beta) & (beta < np.pi - 2*gamma_angle),
+                         (np.pi - 2*gamma_angle <= beta) & (beta <= np.pi + 2*fan_angle)],
+                        [np.where(np.isnan(rising), 1.0, rising),
+                         1.0,
+                         np.where(np.isnan(falling), 1.0, falling)],
+                        default=0.0)
 
     # additional scaling factor
     scale_factor = (angular_range + angular_range  / number_of_projections) / np.pi
@@ -83,53 +87,65 @@ def parker_weights_2d(geometry):
     return weights * scale_factor
 
 
-# Adapted from:
-# TV or not TV? That is the Question
-# Christian Riess, Martin Berger, Haibo Wu, Michael Manhart, Rebecca Fahrig and Andreas Maier
-# The 12th International Meeting on Fully Three-Dimensional Image Reconstruction in Radiology and Nuclear Medicine
-# Note: This is the unsmoothed version of the by Riess, et al proposed weights, which may lead to artefacts.
-def riess_weights_2d(geometry):
+def _riess_weights(geometry):
+    angular_range = geometry.angular_range[1] - geometry.angular_range[0]
+    delta_x = angular_range - np.pi # overscan
 
-    delta_x = geometry.angular_range - np.pi # overscan
+    angular_increment = angular_range / geometry.number_of_projections
+    beta = _view_angles(0.0, angular_increment, geometry.number_of_projections)[:, None]
 
-    def eta(beta, gamma_angle):
-        return np.sin( (np.pi/2.0) * (np.pi+delta_x-beta) / (delta_x-2*gamma_angle) ) ** 2
+    # calculate correct pos on detector and current angle
+    gamma_angle = np.arange(geometry.detector_shape[-1], dtype=np.float64) * geometry.detector_spacing[-1] + geometry.detector_origin[-1]
+    gamma_angle = np.arctan(gamma_angle / geometry.source_detector_distance)[None, :]
 
-    def zeta(beta, gamma_angle):
-        return np.sin( (np.pi/2.0) * beta / (delta_x+2*gamma_angle) ) ** 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        eta = np.sin( (np.pi/2.0) * (np.pi+delta_x-beta) / (delta_x-2*gamma_angle) ) ** 2
+        zeta = np.sin( (np.pi/2.0) * beta / (delta_x+2*gamma_angle) ) ** 2
 
+    # later cases overwrite earlier ones, nan values keep the previous weight
     weights = np.ones((geometry.number_of_projections, geometry.detector_shape[-1]))
-    angular_increment = geometry.angular_range / geometry.number_of_projections
-    beta = 0
-
-    for beta_idx in range(weights.shape[0]):
-        for gamma_idx in range(weights.shape[1]):
-                # calculate correct pos on detector and current angle
-                gamma_angle = gamma_idx * geometry.detector_spacing[-1] + geometry.detector_origin[-1]
-                gamma_angle = np.arctan(gamma_angle / geometry.source_detector_distance)
-
-                if np.pi + 2*gamma_angle <= beta and beta <= np.pi + delta_x:
-                    val = eta(beta, gamma_angle)
-                    if not np.isnan(val):
-                        weights[beta_idx, gamma_idx] = val
+    for condition, value in [((np.pi + 2*gamma_angle <= beta) & (beta <= np.pi + delta_x), eta),
+                             ((np.pi + 2*(delta_x - gamma_angle) <= beta) & (beta <= np.pi + delta_x), 2 - eta),
+                             ((0 <= beta) & (beta <= 2*gamma_angle + delta_x), zeta),
+                             ((0 <= beta) & (beta <= -delta_x - 2*gamma_angle), 2 - zeta)]:
+        weights = np.where(condition & ~np.isnan(value), value, weights)
 
-                if np.pi + 2*(delta_x - gamma_angle) <= beta and beta <= np.pi + delta_x:
-                    val = 2 - eta(beta, gamma_angle)
-                    if not np.isnan(val):
-                        weights[beta_idx, gamma_idx] = val
+    # additional scaling factor
+    scale_factor = angular_range / np.pi
+    return weights, scale_factor
 
-                if 0 <= beta and beta <= 2*gamma_angle + delta_x:
-                    val = zeta(beta, gamma_angle)
-                    if not np.isnan(val):
-                        weights[beta_idx, gamma_idx] = val
 
-                if 0 <= beta and beta <= -delta_x - 2*gamma_angle:
-                    val = 2 - zeta(beta, gamma_angle)
-                    if not np.isnan(val):
-                        weights[beta_idx, gamma_idx] = val
+# Adapted from:
+# TV or not TV? That is the Question
+# Christian Riess, Martin Berger, Haibo Wu, Michael Manhart, Rebecca Fahrig and Andreas Maier
+# The 12th International Meeting on Fully Three-Dimensional Image Reconstruction in Radiology and Nuclear Medicine
+# Note: This is the unsmoothed version of the by Riess, et al proposed weights, which may lead to artefacts.
+@cached
+def riess_weights_2d(geometry):
+    weights, scale_factor = _riess_weights(geometry)
+    return weights * scale_factor
 
-        beta += angular_increment
 
-    # additional scaling factor
-    scale_factor = geometry.angular_range / np.pi
+@cached
+def smoothed_riess_weights_2d(geometry, smoothing_angle=np.deg2rad(2.0)):
+    """
+        Riess weights smoothed along the views with a Gaussian, which removes the kinks of the piecewise definition.
+        The conjugate ray of a ray is a fixed number of views apart per detector column, thus the smoothing keeps the
+        sum of the weights of conjugate rays except for the first and last views.
+    Args:
+        geometry:           Fan beam Geometry object.
+        smoothing_angle:    Standard deviation of the Gaussian in radians.
+    Returns:
+        The weights with shape (number_of_projections, detector width).
+    """
+    weights, scale_factor = _riess_weights(geometry)
+    angular_range = geometry.angular_range[1] - geometry.angular_range[0]
+    sigma = smoothing_angle / (angular_range / geometry.number_of_projections)
+    radius = int(np.ceil(3 * sigma))
+    if radius > 0:
+        kernel = np.exp(-0.5 * (np.arange(-radius, radius + 1) / sigma) ** 2)
+        kernel /= kernel.sum()
+        padded = np.pad(weights, ((radius, radius), (0, 0)), mode='edge')
+        windows = np.lib.stride_tricks.sliding_window_view(padded, 2 * radius + 1, axis=0)
+        weights = windows @ kernel
     return weights * scale_factor
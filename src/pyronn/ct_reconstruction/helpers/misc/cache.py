@@ -0,0 +1,213 @@
+# Copyright [2019] [Christopher Syben, Markus Michen]
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import functools
+import hashlib
+import inspect
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# geometry members which are results of the generators and no generating parameters
+IGNORED_GEOMETRY_MEMBERS = ('trajectory', 'keyframe_trajectory', 'fov_mask')
+
+
+def _update_hash(hash, value):
+    if isinstance(value, np.ndarray):
+        hash.update(f'ndarray{value.dtype.str}{value.shape}'.encode())
+        hash.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, (list, tuple)):
+        hash.update(f'{type(value).__name__}{len(value)}'.encode())
+        for item in value:
+            _update_hash(hash, item)
+    elif isinstance(value, dict):
+        hash.update(f'dict{len(value)}'.encode())
+        for key in sorted(value):
+            _update_hash(hash, key)
+            _update_hash(hash, value[key])
+    elif isinstance(value, np.generic):
+        _update_hash(hash, value.item())
+    elif isinstance(value, (type(None), bool, int, float, complex, str, bytes, type)):
+        hash.update(f'{type(value).__name__}:{value!r}'.encode())
+    elif hasattr(value, '__dict__'):
+        # e.g. Geometry objects: the members define the content
+        members = {k: v for k, v in vars(value).items() if k not in IGNORED_GEOMETRY_MEMBERS}
+        hash.update(type(value).__qualname__.encode())
+        _update_hash(hash, members)
+    else:
+        raise TypeError(f'Cannot compute a content hash for {type(value).__name__}.')
+
+
+def cache_key(name, *args, **kwargs):
+    """
+        Computes the content hash of a generator name and its parameters.
+        Arrays are hashed by dtype, shape and data, objects like Geometries by their members.
+    Args:
+        name:   Name of the generating function.
+        args:   Positional parameters.
+        kwargs: Keyword parameters.
+    Returns:
+        Hex digest as str.
+    """
+    hash = hashlib.sha256(name.encode())
+    _update_hash(hash, list(args))
+    _update_hash(hash, kwargs)
+    return hash.hexdigest()
+
+
+class ArrayCache:
+    """
+        Cache for geometry-derived arrays like trajectories, filters and weights.
+        Arrays are kept in an in-process LRU limited by a byte budget and a number of entries and, if a directory is given,
+        stored as .npy files which are memory-mapped on later runs. Cached arrays are read-only.
+    """
+
+    def __init__(self, max_bytes=256 * 2 ** 20, directory=None, max_entries=1024):
+        """
+        Args:
+            max_bytes:      Byte budget of the in-process LRU, 0 disables it.
+            directory:      Directory of the on-disk store, None disables it.
+            max_entries:    Maximum number of arrays in the in-process LRU, memory-mapped arrays count only against this limit.
+        """
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.directory = directory
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.npy')
+
+    def _remember(self, key, array):
+        # memory-mapped arrays do not occupy the budget
+        size = 0 if isinstance(array, np.memmap) else array.nbytes
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = (array, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes or len(self._entries) > self.max_entries:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+
+    def get(self, key):
+        """
+            Looks up an array, first in memory, then on disk.
+        Args:
+            key: Key from cache_key().
+        Returns:
+            The read-only array or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry[0]
+        if self.directory is not None and os.path.exists(self._path(key)):
+            array = np.load(self._path(key), mmap_mode='r')
+            self._remember(key, array)
+            return array
+        return None
+
+    def put(self, key, array):
+        """
+            Stores an array, which is made read-only.
+        Args:
+            key:    Key from cache_key().
+            array:  np.array to store.
+        Returns:
+            The stored array.
+        """
+        array.flags.writeable = False
+        if self.directory is not None and not os.path.exists(self._path(key)):
+            # write to a temporary file first so that concurrent readers never see partial files
+            temporary_path = f'{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(temporary_path, 'wb') as f:
+                np.save(f, array)
+            os.replace(temporary_path, self._path(key))
+        self._remember(key, array)
+        return array
+
+    def clear(self):
+        """
+            Empties the in-process LRU, the on-disk store is kept.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+
+_cache = ArrayCache(directory=os.environ.get('PYRONN_CACHE_DIR'))
+
+
+def get_cache():
+    """
+        Returns the ArrayCache consulted by the cached generators or None if caching is disabled.
+        The on-disk store is enabled by default if the environment variable PYRONN_CACHE_DIR is set.
+    """
+    return _cache
+
+
+def set_cache(cache):
+    """
+        Replaces the ArrayCache consulted by the cached generators.
+    Args:
+        cache: ArrayCache object or None to disable caching.
+    """
+    global _cache
+    _cache = cache
+
+
+def cached(function):
+    """
+        Decorator for generators of geometry-derived arrays. The result is looked up in the cache under the content
+        hash of the function name and its named parameters, additional **kwargs are not part of the key as the
+        generators ignore them. Results which are no np.array are not cached.
+        The decorated function returns a writable copy of the cached array. Callers which do not modify the result
+        can pass readonly=True to get the shared read-only array without a copy.
+    """
+    signature = inspect.signature(function)
+    ignored = [name for name, parameter in signature.parameters.items() if parameter.kind == inspect.Parameter.VAR_KEYWORD]
+    name = f'{function.__module__}.{function.__qualname__}'
+
+    @functools.wraps(function)
+    def wrapper(*args, readonly=False, **kwargs):
+        cache = _cache
+        if cache is None:
+            return function(*args, **kwargs)
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        parameters = {k: v for k, v in bound.arguments.items() if k not in ignored}
+        try:
+            key = cache_key(name, **parameters)
+        except TypeError:
+            # parameters without a content hash are not cached
+            return function(*args, **kwargs)
+        result = cache.get(key)
+        if result is None:
+            result = function(*args, **kwargs)
+            if isinstance(result, np.ndarray):
+                result = cache.put(key, result)
+        if isinstance(result, np.ndarray) and not readonly:
+            result = np.array(result)
+        return result
+
+    return wrapper
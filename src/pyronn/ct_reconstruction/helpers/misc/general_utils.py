@@ -1,5 +1,6 @@
 import pyronn
 import numpy as np
+from pyronn.ct_reconstruction.helpers.filters.filters import compact_filter, half_spectrum_filter, padded_length
 def fibonacci_sphere(n):
     '''
     Calculation of the fibonacci distribution on a unit sphere with n samples.
@@ -13,46 +14,85 @@ def fibonacci_sphere(n):
     x,z, y = np.cos(theta) * np.sin(phi), np.sin(theta) * np.sin(phi), np.cos(phi)
     return np.vstack([x,y,z]).T
 
-def rotation_matrix_from_points(p1, p2):
-    # 计算单位向量
-    p1 = np.array(p1) / np.linalg.norm(p1)
-    p2 = np.array(p2) / np.linalg.norm(p2)
+def rotation_matrices_from_points(p1, p2):
+    '''
+    Batched Rodrigues' rotation formula: rotation matrices which rotate the directions of p1 onto the directions of p2.
+    Parallel directions give the identity, anti-parallel directions a rotation by 180 degree around an axis perpendicular to p1.
+    :param p1: Points with shape (..., 3), broadcastable against p2
+    :param p2: Points with shape (..., 3)
+    :return: Rotation matrices with shape (..., 3, 3)
+    '''
+    p1, p2 = np.broadcast_arrays(np.asarray(p1, dtype=np.float64), np.asarray(p2, dtype=np.float64))
+    p1 = p1 / np.linalg.norm(p1, axis=-1, keepdims=True)
+    p2 = p2 / np.linalg.norm(p2, axis=-1, keepdims=True)
 
-    # 计算旋转轴（叉积）
+    # rotation axis (cross product) and angle (dot product)
     axis = np.cross(p1, p2)
-    axis_length = np.linalg.norm(axis)
-    if axis_length < 1e-5:
-        if np.dot(p1, p2) > 0:
-            # p1 和 p2 同向，无需旋转
-            return np.eye(3)
-        else:
-            # p1 和 p2 反向，需要旋转180度，找一个垂直于p1的向量作为旋转轴
-            axis = np.array([p1[1], -p1[0], 0])
-            if np.linalg.norm(axis) == 0:
-                axis = np.array([p1[2], 0, -p1[0]])
-            axis = axis / np.linalg.norm(axis)
-            theta = np.pi
-    else:
-        axis = axis / axis_length
+    axis_length = np.linalg.norm(axis, axis=-1)
+    cos_theta = np.clip(np.sum(p1 * p2, axis=-1), -1.0, 1.0)
+    degenerate = axis_length < 1e-5
 
-    # 计算旋转角度（点积）
-    cos_theta = np.dot(p1, p2)
+    # anti-parallel: any axis perpendicular to p1
+    perpendicular = np.stack([p1[..., 1], -p1[..., 0], np.zeros_like(p1[..., 0])], axis=-1)
+    fallback = np.stack([p1[..., 2], np.zeros_like(p1[..., 0]), -p1[..., 0]], axis=-1)
+    perpendicular = np.where((np.linalg.norm(perpendicular, axis=-1) == 0)[..., None], fallback, perpendicular)
+    axis = np.where(degenerate[..., None], perpendicular, axis)
+    axis = axis / np.linalg.norm(axis, axis=-1, keepdims=True)
     sin_theta = np.sqrt(1 - cos_theta ** 2)
 
-    # 使用罗德里格斯公式（Rodrigues' rotation formula）来计算旋转矩阵
-    K = np.array([[0, -axis[2], axis[1]],
-                  [axis[2], 0, -axis[0]],
-                  [-axis[1], axis[0], 0]])
-    R = np.eye(3) + sin_theta * K + (1 - cos_theta) * np.dot(K, K)
+    K = np.zeros(axis.shape + (3,))
+    K[..., 0, 1], K[..., 0, 2] = -axis[..., 2], axis[..., 1]
+    K[..., 1, 0], K[..., 1, 2] = axis[..., 2], -axis[..., 0]
+    K[..., 2, 0], K[..., 2, 1] = -axis[..., 1], axis[..., 0]
+    R = np.eye(3) + sin_theta[..., None, None] * K + (1 - cos_theta)[..., None, None] * (K @ K)
+
+    # parallel: no rotation
+    return np.where((degenerate & (cos_theta > 0))[..., None, None], np.eye(3), R)
+
+
+def rotation_matrix_from_points(p1, p2):
+    '''
+    Rotation matrix which rotates the direction of p1 onto the direction of p2, see rotation_matrices_from_points.
+    '''
+    return rotation_matrices_from_points(p1, p2)
+
 
-    return R
+def rfft_filter(sinogram, filter):
+    '''
+    Filters the sinogram along the detector rows with real ffts of the zero-padded rows, which avoids the wraparound of the
+    circular convolution and needs half of the arithmetic of a complex fft. The half-spectrum filter is cached.
+    :param sinogram: Sinogram with the detector width as last axis as np.array or torch.Tensor
+    :param filter: Frequency domain filter for the detector width, see fft_and_ifft
+    :return: The filtered sinogram of the same type and device as the input
+    '''
+    detector_width = sinogram.shape[-1]
+    length = padded_length(detector_width)
+    half_spectrum = half_spectrum_filter(np.asarray(filter.detach().cpu() if hasattr(filter, 'detach') else filter), length, readonly=True)
+    if isinstance(sinogram, np.ndarray):
+        x = np.fft.rfft(sinogram, n=length, axis=-1)
+        x *= half_spectrum
+        return np.fft.irfft(x, n=length, axis=-1)[..., :detector_width].astype(sinogram.dtype, copy=False)
+    import torch
+    x = torch.fft.rfft(sinogram, n=length, dim=-1)
+    x = torch.multiply(x, torch.tensor(half_spectrum, device=sinogram.device))
+    return torch.fft.irfft(x, n=length, dim=-1)[..., :detector_width]
 
 
-def fft_and_ifft(sinogram, filter):
+def fft_and_ifft(sinogram, filter, zero_padding=False):
+    '''
+    Filters the sinogram along the detector rows in the frequency domain.
+    :param sinogram: Sinogram with the detector width as last axis
+    :param filter: Frequency domain filter broadcastable against the sinogram, e.g. a 1D filter or a broadcast 2D/3D filter
+    :param zero_padding: If True, the rows are zero-padded like in rfft_filter, which avoids the wraparound of the circular convolution
+    :return: The filtered sinogram
+    '''
+    filter = compact_filter(filter)
     if pyronn.read_backend() == 'torch':
         import torch
         if not isinstance(sinogram, torch.Tensor):
             sinogram = torch.tensor(sinogram).cuda()
+        if zero_padding:
+            return rfft_filter(sinogram, filter)
         if not isinstance(filter, torch.Tensor):
             filter = torch.tensor(filter).cuda()
 
@@ -62,6 +102,13 @@ def fft_and_ifft(sinogram, filter):
         return x
     elif pyronn.read_backend() == 'tensorflow':
         import tensorflow as tf
+        if zero_padding:
+            detector_width = int(sinogram.shape[-1])
+            length = padded_length(detector_width)
+            half_spectrum = half_spectrum_filter(np.asarray(filter), length, readonly=True)
+            x = tf.signal.rfft(tf.cast(sinogram, dtype=tf.float32), fft_length=[length])
+            x = tf.multiply(x, tf.cast(half_spectrum, dtype=tf.complex64))
+            return tf.signal.irfft(x, fft_length=[length])[..., :detector_width]
         sino_freq = tf.signal.fft(tf.cast(sinogram, dtype=tf.complex64))
         sino_filtered_freq = tf.multiply(sino_freq, tf.cast(filter, dtype=tf.complex64))
         sinogram_filtered = tf.math.real(tf.signal.ifft(sino_filtered_freq))
@@ -0,0 +1,153 @@
+# Copyright [2019] [Christopher Syben, Markus Michen]
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+
+from pyronn.ct_reconstruction.geometry.geometry_base import GeometryFan2D, GeometryParallel2D
+
+# Exact line integrals of ellipse and ellipsoid phantoms. An ellipsoid is described by its center c and the
+# quadric Q = R^T diag(1 / a^2) R, it contains the points x with (x - c)^T Q (x - c) <= 1. All coordinates are
+# world coordinates in mm in x, y(, z) order, x belongs to the last volume axis.
+
+
+def quadrics(semi_axes, rotations):
+    """
+        Quadrics of ellipsoids given by semi axes and rotations like the parameters of ellipsoid_phantom.
+    Args:
+        semi_axes:  Semi axes with shape (number, dim).
+        rotations:  Rotations with shape (number, dim, dim).
+    Returns:
+        Quadrics with shape (number, dim, dim).
+    """
+    rotations = np.asarray(rotations, dtype=np.float64)
+    return np.einsum('kmi,km,kmj->kij', rotations, 1.0 / np.asarray(semi_axes, dtype=np.float64) ** 2, rotations)
+
+
+def to_world(centers, semi_axes, rotations, scale, offset=0.0):
+    """
+        Transforms ellipsoids from coordinates u to world coordinates offset + scale * u, e.g. from voxel indices
+        with scale = volume_spacing and offset = volume_origin, both in x, y(, z) order.
+    Args:
+        centers:    Centers with shape (number, dim).
+        semi_axes:  Semi axes with shape (number, dim).
+        rotations:  Rotations with shape (number, dim, dim).
+        scale:      Scale per coordinate, negative values flip the axis.
+        offset:     Offset per coordinate.
+    Returns:
+        Centers and quadrics in world coordinates.
+    """
+    scale = np.asarray(scale, dtype=np.float64)
+    world_centers = offset + np.asarray(centers, dtype=np.float64) * scale
+    world_quadrics = quadrics(semi_axes, rotations) / scale[None, :, None] / scale[None, None, :]
+    return world_centers, world_quadrics
+
+
+def phantom_to_world(centers, semi_axes, rotations, volume_shape, volume_spacing, flip_y=False):
+    """
+        Transforms ellipsoids in the normalized coordinates of ellipsoid_phantom, e.g. ellipsoids(SHEPP_LOGAN_3D),
+        to the world coordinates of a centered volume.
+    Args:
+        centers:        Centers with shape (number, dim).
+        semi_axes:      Semi axes with shape (number, dim).
+        rotations:      Rotations with shape (number, dim, dim).
+        volume_shape:   The volume size in (Z,) Y, X order.
+        volume_spacing: The spacing between voxels in (Z,) Y, X order.
+        flip_y:         True for phantoms flipped along Y like shepp_logan and shepp_logan_enhanced.
+    Returns:
+        Centers and quadrics in world coordinates.
+    """
+    scale = ((np.asarray(volume_shape) - 1) / 2.0 * np.asarray(volume_spacing))[::-1]
+    if flip_y:
+        scale[1] *= -1
+    return to_world(centers, semi_axes, rotations, scale)
+
+
+def line_integrals(sources, directions, centers, quadrics, values):
+    """
+        Exact line integrals through a sum of ellipsoids, vectorized over the rays.
+    Args:
+        sources:    A point on each ray with shape (..., dim).
+        directions: The direction of each ray with shape (..., dim), any length.
+        centers:    Centers with shape (number, dim).
+        quadrics:   Quadrics with shape (number, dim, dim).
+        values:     Values of the ellipsoids.
+    Returns:
+        Line integrals with shape (...).
+    """
+    result = np.zeros(sources.shape[:-1])
+    length = np.linalg.norm(directions, axis=-1)
+    for center, quadric, value in zip(centers, quadrics, values):
+        # (s - c + t d)^T Q (s - c + t d) = 1 has the roots t = (-B +- sqrt(B^2 - 4AC)) / 2A
+        offset = sources - center
+        Qd = directions @ quadric
+        A = np.sum(Qd * directions, axis=-1)
+        B = 2.0 * np.sum(Qd * offset, axis=-1)
+        C = np.sum((offset @ quadric) * offset, axis=-1) - 1.0
+        discriminant = np.maximum(B ** 2 - 4.0 * A * C, 0.0)
+        result += value * np.sqrt(discriminant) / A * length
+    return result
+
+
+def geometry_rays(geometry, views=None):
+    """
+        Rays of all detector pixels of a geometry. Parallel and fan beam geometries use the central ray vectors of the
+        trajectory like the 2D projectors, all other geometries the projection matrices like the cone beam projector.
+    Args:
+        geometry:   Geometry object with trajectory.
+        views:      Indices or slice of the views, by default all views.
+    Returns:
+        Sources and directions with shape (views, width, 2) or (views, height, width, 3).
+    """
+    trajectory = np.asarray(geometry.expand_trajectory(views), dtype=np.float64)
+    if isinstance(geometry, (GeometryParallel2D, GeometryFan2D)):
+        u = geometry.detector_origin[-1] + np.arange(geometry.detector_shape[-1]) * geometry.detector_spacing[-1]
+        ray = trajectory[:, None, :]
+        u_vec = np.stack([-trajectory[:, 1], trajectory[:, 0]], axis=1)[:, None, :]
+        detector_points = u[None, :, None] * u_vec
+        if isinstance(geometry, GeometryParallel2D):
+            return np.broadcast_to(detector_points, detector_points.shape), np.broadcast_to(ray, detector_points.shape)
+        sources = ray * -geometry.source_isocenter_distance
+        detector_points = sources + ray * geometry.source_detector_distance + detector_points
+        return np.broadcast_to(sources, detector_points.shape), detector_points - sources
+
+    # P = [M | p4]: the source is -M^-1 p4, the ray of pixel (u, v) has the direction M^-1 (u, v, 1)
+    inverse = np.linalg.inv(trajectory[:, :, 0:3])
+    sources = -np.einsum('nij,nj->ni', inverse, trajectory[:, :, 3])
+    v, u = np.meshgrid(np.arange(geometry.detector_shape[-2]), np.arange(geometry.detector_shape[-1]), indexing='ij')
+    pixels = np.stack([u, v, np.ones_like(u)], axis=-1).astype(np.float64)
+    directions = np.einsum('nij,hwj->nhwi', inverse, pixels)
+    return np.broadcast_to(sources[:, None, None, :], directions.shape), directions
+
+
+def analytic_sinogram(geometry, centers, quadrics, values, chunk_size=16):
+    """
+        Computes the exact sinogram of a sum of ellipses or ellipsoids, chunk by chunk of views.
+        The line integrals are in mm, the cone beam projector integrates in voxel units, thus divide by the
+        isotropic voxel spacing to compare with it.
+    Args:
+        geometry:   GeometryParallel2D, GeometryFan2D, GeometryCone3D or other Geometry with projection matrices.
+        centers:    Centers in world coordinates, e.g. from phantom_to_world.
+        quadrics:   Quadrics in world coordinates.
+        values:     Values of the ellipsoids.
+        chunk_size: Number of views computed at once.
+    Returns:
+        The sinogram with shape geometry.sinogram_shape as np.array.
+    """
+    number_of_projections = geometry.number_of_projections
+    sinogram = np.zeros([number_of_projections, *geometry.sinogram_shape[1:]], dtype=np.float32)
+    for start in range(0, number_of_projections, chunk_size):
+        views = slice(start, min(start + chunk_size, number_of_projections))
+        sources, directions = geometry_rays(geometry, views)
+        sinogram[views] = line_integrals(sources, directions, centers, quadrics, values)
+    return sinogram
@@ -0,0 +1,62 @@
+# Copyright [2019] [Christopher Syben, Markus Michen]
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+
+
+def partial_volume(signed_distance, box, supersampling=4, chunk_size=2 ** 14):
+    """
+        Fractions of the voxels of a sub-block which are covered by a primitive. A voxel with index i covers the
+        coordinates [i - 0.5, i + 0.5] along each axis. Voxels whose center is farther than half a voxel diagonal from
+        the surface are completely inside or outside, only the remaining boundary voxels are supersampled,
+        thus the cost is close to the one of the binary rasterization.
+    Args:
+        signed_distance:    Function of one coordinate array per axis, which are broadcast against each other. Returns
+                            the distance to the surface in voxels, negative inside. It may underestimate the absolute
+                            distance, e.g. the maximum of the plane distances of a convex polytope, which only widens
+                            the supersampled shell.
+        box:                Tuple of slices of the sub-block, e.g. from _bounding_box in primitives_3d.
+        supersampling:      Number of sub-samples per axis of the boundary voxels.
+        chunk_size:         Number of boundary voxels supersampled at once.
+    Returns:
+        The fractions as np.array of float32 with the shape of the box.
+    """
+    ndim = len(box)
+    coordinates = np.ogrid[box]
+    distance = np.broadcast_to(signed_distance(*coordinates), tuple(len(c.ravel()) for c in coordinates))
+    half_diagonal = np.sqrt(ndim) / 2
+    fraction = (distance <= -half_diagonal).astype(np.float32)
+
+    boundary = np.nonzero(np.abs(distance) < half_diagonal)
+    # the sub-samples are evaluated in single precision, they are the bulk of the work
+    offsets = ((np.arange(supersampling) + 0.5) / supersampling - 0.5).astype(np.float32)
+    sub_samples = np.stack(np.meshgrid(*[offsets] * ndim, indexing='ij'), axis=-1).reshape(-1, ndim)
+    for start in range(0, len(boundary[0]), chunk_size):
+        voxels = tuple(index[start:start + chunk_size] for index in boundary)
+        points = [(c.ravel()[v]).astype(np.float32)[:, None] + sub_samples[None, :, axis]
+                  for axis, (c, v) in enumerate(zip(coordinates, voxels))]
+        fraction[voxels] = np.mean(signed_distance(*points) <= 0, axis=1)
+    return fraction
+
+
+def blend(region, fraction, value):
+    """
+        Places a value with the given fractions into a region in place, the covered part of each voxel is replaced
+        like the binary placers replace whole voxels.
+    Args:
+        region:     np.array, e.g. the sub-block of a grid.
+        fraction:   Fractions of the voxels, e.g. from partial_volume.
+        value:      Value of the primitive.
+    """
+    region += fraction * (value - region)
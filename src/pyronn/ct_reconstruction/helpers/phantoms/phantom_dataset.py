@@ -0,0 +1,238 @@
+# Copyright [2019] [Christopher Syben, Markus Michen]
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from pyronn.ct_reconstruction.helpers.phantoms.primitives_3d import generate_3D_primitives
+
+# A dataset directory contains index.json with the parameters, phantoms_XXXXX.npy and sinograms_XXXXX.npy shards
+# with shard_size samples each and done.npy, which marks the samples written completely.
+INDEX_FILE = 'index.json'
+DONE_FILE = 'done.npy'
+
+
+def sample_rng(seed, index):
+    """
+        The random number generator of one sample, an independent stream of the SeedSequence of the dataset seed.
+        Equal to np.random.default_rng(np.random.SeedSequence(seed).spawn(count)[index]) without spawning all streams.
+    Args:
+        seed:   Seed of the dataset.
+        index:  Index of the sample.
+    Returns:
+        np.random.Generator
+    """
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(index,)))
+
+
+def generate_sample(volume_shape, number_of_primitives, seed, index):
+    """
+        Generates the phantom of one sample, it depends only on the seed and the index.
+    Args:
+        volume_shape:           Shape of the phantom.
+        number_of_primitives:   Number of random primitives.
+        seed:                   Seed of the dataset.
+        index:                  Index of the sample.
+    Returns:
+        The phantom as np.array of float32.
+    """
+    rng = sample_rng(seed, index)
+    return generate_3D_primitives(volume_shape, number_of_primitives, rng=rng, verbose=False).astype(np.float32)
+
+
+def _indexed_sample(volume_shape, number_of_primitives, seed, index):
+    return index, generate_sample(volume_shape, number_of_primitives, seed, index)
+
+
+def cone_projector(geometry, device='cuda'):
+    """
+        Projector for build_phantom_dataset with the torch cone beam layer. The geometry tensors are created once
+        and shared by all batches.
+    Args:
+        geometry:   Cone beam Geometry object.
+        device:     Device of the projection.
+    Returns:
+        Function mapping phantoms with shape (batch, *volume_shape) to sinograms with shape (batch, *sinogram_shape).
+    """
+    import torch
+    from pyronn.ct_reconstruction.layers.torch.projection_3d import ConeProjection3D
+    from pyronn.ct_reconstruction.layers.torch.streaming import streamed_projection, tensor_geometry
+
+    projection = ConeProjection3D()
+    geometry_tensors = tensor_geometry(geometry, device, exclude=())
+
+    def project(phantoms):
+        with torch.no_grad():
+            phantoms = torch.from_numpy(np.ascontiguousarray(phantoms)).to(device)
+            if 'trajectory' not in geometry_tensors:
+                # a compressed trajectory is expanded chunk by chunk of views
+                return streamed_projection(projection, phantoms, geometry, geometry_tensors=geometry_tensors).cpu().numpy()
+            return projection.forward(phantoms, **geometry_tensors).cpu().numpy()
+
+    return project
+
+
+def _shard_path(directory, name, shard):
+    return os.path.join(directory, f'{name}_{shard:05d}.npy')
+
+
+def _open_shard(directory, name, shard, shape):
+    path = _shard_path(directory, name, shard)
+    if os.path.exists(path):
+        return np.load(path, mmap_mode='r+')
+    return np.lib.format.open_memmap(path, mode='w+', dtype=np.float32, shape=shape)
+
+
+def _write_index(directory, index):
+    # written to a temporary file first, thus an interruption never leaves a broken index
+    path = os.path.join(directory, INDEX_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(index, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def load_index(directory):
+    """
+        Reads the parameters of a dataset.
+    Args:
+        directory:  Directory of the dataset.
+    Returns:
+        Dict with count, volume_shape, sinogram_shape, shard_size, seed, number_of_primitives and completed.
+    """
+    with open(os.path.join(directory, INDEX_FILE)) as f:
+        index = json.load(f)
+    done_path = os.path.join(directory, DONE_FILE)
+    index['completed'] = int(np.load(done_path).sum()) if os.path.exists(done_path) else 0
+    return index
+
+
+def read_sample(directory, index, mmap_mode='r'):
+    """
+        Reads one sample of a dataset without loading the shards.
+    Args:
+        directory:  Directory of the dataset.
+        index:      Index of the sample.
+        mmap_mode:  Mode of the memmaps, see np.load.
+    Returns:
+        The phantom and the sinogram, the sinogram is None for datasets without geometry.
+    """
+    parameters = load_index(directory)
+    shard, position = divmod(index, parameters['shard_size'])
+    phantom = np.load(_shard_path(directory, 'phantoms', shard), mmap_mode=mmap_mode)[position]
+    sinogram = None
+    if parameters['sinogram_shape'] is not None:
+        sinogram = np.load(_shard_path(directory, 'sinograms', shard), mmap_mode=mmap_mode)[position]
+    return phantom, sinogram
+
+
+def build_phantom_dataset(directory, count, volume_shape, geometry=None, seed=0, number_of_primitives=6,
+                          shard_size=1024, workers=None, batch_size=8, projector=None):
+    """
+        Builds a dataset of random primitive phantoms and their sinograms. The phantoms are generated in a process pool,
+        each from its own SeedSequence stream, thus the dataset depends only on the seed and not on the number of workers
+        or the order of completion. The projections run in the calling process batch by batch.
+        The samples are written to sharded .npy memmaps of shard_size samples and marked as done after they are flushed,
+        thus calling the function again with the same parameters resumes an interrupted build.
+    Args:
+        directory:              Directory of the dataset, created if it does not exist.
+        count:                  Number of samples.
+        volume_shape:           Shape of the phantoms.
+        geometry:               Geometry object of the sinograms, None for phantoms only.
+        seed:                   Seed of the dataset.
+        number_of_primitives:   Number of random primitives per phantom.
+        shard_size:             Number of samples per shard.
+        workers:                Number of processes, by default the number of cores.
+        batch_size:             Number of phantoms projected at once.
+        projector:              Function mapping phantoms with shape (batch, *volume_shape) to sinograms,
+                                by default cone_projector(geometry).
+    Returns:
+        The index of the dataset, see load_index.
+    """
+    os.makedirs(directory, exist_ok=True)
+    volume_shape = [int(n) for n in volume_shape]
+    sinogram_shape = None if geometry is None else [int(n) for n in geometry.sinogram_shape]
+    parameters = {'count': int(count), 'volume_shape': volume_shape, 'sinogram_shape': sinogram_shape,
+                  'shard_size': int(shard_size), 'seed': int(seed), 'number_of_primitives': int(number_of_primitives)}
+
+    index_path = os.path.join(directory, INDEX_FILE)
+    done_path = os.path.join(directory, DONE_FILE)
+    if os.path.exists(index_path):
+        existing = load_index(directory)
+        existing.pop('completed')
+        if existing != parameters:
+            raise ValueError(f'The dataset in {directory} was built with other parameters: {existing}')
+    else:
+        _write_index(directory, parameters)
+    if os.path.exists(done_path):
+        done = np.load(done_path, mmap_mode='r+')
+    else:
+        done = np.lib.format.open_memmap(done_path, mode='w+', dtype=np.uint8, shape=(count,))
+
+    pending = [int(i) for i in np.flatnonzero(done == 0)]
+    if pending and sinogram_shape is not None and projector is None:
+        projector = cone_projector(geometry)
+
+    shards = {}
+
+    def shard_arrays(shard):
+        if shard not in shards:
+            size = min(shard_size, count - shard * shard_size)
+            shards[shard] = (_open_shard(directory, 'phantoms', shard, (size, *volume_shape)),
+                             None if sinogram_shape is None else
+                             _open_shard(directory, 'sinograms', shard, (size, *sinogram_shape)))
+        return shards[shard]
+
+    def write(batch):
+        indices = [i for i, _ in batch]
+        phantoms = np.stack([phantom for _, phantom in batch])
+        sinograms = None if sinogram_shape is None else projector(phantoms)
+        for n, i in enumerate(indices):
+            shard, position = divmod(i, shard_size)
+            phantom_shard, sinogram_shard = shard_arrays(shard)
+            phantom_shard[position] = phantoms[n]
+            if sinogram_shard is not None:
+                sinogram_shard[position] = sinograms[n]
+        for phantom_shard, sinogram_shard in shards.values():
+            phantom_shard.flush()
+            if sinogram_shard is not None:
+                sinogram_shard.flush()
+        done[indices] = 1
+        done.flush()
+        # shards are written in order, thus completed shards are closed
+        for shard in [s for s in shards if s < min(indices) // shard_size]:
+            del shards[shard]
+
+    # at most a few samples per process are in flight, thus the memory is bounded for any count
+    workers = workers or os.cpu_count()
+    max_in_flight = 2 * workers
+    batch = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = set()
+        for i in pending:
+            futures.add(executor.submit(_indexed_sample, volume_shape, number_of_primitives, seed, i))
+            if len(futures) < max_in_flight:
+                continue
+            finished, futures = wait(futures, return_when=FIRST_COMPLETED)
+            batch.extend(future.result() for future in finished)
+            while len(batch) >= batch_size:
+                write(batch[:batch_size])
+                batch = batch[batch_size:]
+        batch.extend(future.result() for future in futures)
+        while batch:
+            write(batch[:batch_size])
+            batch = batch[batch_size:]
+    return load_index(directory)
@@ -14,19 +14,26 @@
 
 import numpy as np
 
+from pyronn.ct_reconstruction.helpers.phantoms.partial_volume import partial_volume
 
-def circle(shape, pos, radius, value=1.0):
+
+def circle(shape, pos, radius, value=1.0, supersampling=1):
     """
         Creates a simple circle primitive.
     Args:
-        shape:      Shape (in [Y, X])
-        pos:        Center (in [Y, X]) from upper left corner
-        radius:     Radius
-        value:      Value
+        shape:          Shape (in [Y, X])
+        pos:            Center (in [Y, X]) from upper left corner
+        radius:         Radius
+        value:          Value
+        supersampling:  Sub-samples per axis of the pixels at the boundary, values > 1 give partial volumes
 
     Returns:
         np.array filled with circle
     """
+    if supersampling > 1:
+        distance = lambda xx, yy: np.sqrt((xx - pos[1]) ** 2 + (yy - pos[0]) ** 2) - radius
+        return partial_volume(distance, (slice(0, shape[0]), slice(0, shape[1])), supersampling) * (np.float32)(value)
+
     # create meshgrid of coords
     xx, yy = np.mgrid[:shape[0], :shape[1]].astype(dtype=np.float32)
 
@@ -36,7 +43,7 @@ def circle(shape, pos, radius, value=1.0):
     return (circle <= radius ** 2) *  (np.float32)(value)
 
 
-def ellipse(shape, pos, half_axes, value=1.0, phi=0.0):
+def ellipse(shape, pos, half_axes, value=1.0, phi=0.0, supersampling=1):
     """
         Creates a simple ellipse primitive.
     Args:
@@ -45,10 +52,21 @@ def ellipse(shape, pos, half_axes, value=1.0, phi=0.0):
         half_axes:      Half axes of the ellipse (in [b, a])
         value:          Value
         phi:            Rotation Angle in radians
+        supersampling:  Sub-samples per axis of the pixels at the boundary, values > 1 give partial volumes
 
     Returns:
         np.array filled with ellipse
     """
+    if supersampling > 1:
+        # (q - 1) * min(half_axes) is a lower bound of the distance to the boundary
+        def distance(xx, yy):
+            xc = (xx - pos[1])
+            yc = (yy - pos[0])
+            q = np.sqrt((xc * np.cos(phi) + yc * np.sin(phi)) ** 2 / half_axes[1] ** 2 +
+                        (yc * np.cos(phi) - xc * np.sin(phi)) ** 2 / half_axes[0] ** 2)
+            return (q - 1) * min(half_axes)
+        return partial_volume(distance, (slice(0, shape[0]), slice(0, shape[1])), supersampling) * value
+
     # create meshgrid of coords
     xx, yy = np.mgrid[:shape[0], :shape[1]].astype(dtype=np.float32)
 
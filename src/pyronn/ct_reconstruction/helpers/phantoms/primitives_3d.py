@@ -3,7 +3,31 @@ import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D
 import random
 
-def place_sphere(grid, pos, radius, value=1.0):
+from pyronn.ct_reconstruction.helpers.phantoms.partial_volume import blend, partial_volume
+
+
+def _bounding_box(shape, lower, upper):
+    """
+    Index slices of the sub-block which contains all voxels with coordinates between lower and upper (inclusive),
+    with a margin of one voxel and clipped to the grid. The placers evaluate their conditions only on this sub-block.
+
+    Args:
+        shape:  Shape of the grid.
+        lower:  Lower coordinate per axis.
+        upper:  Upper coordinate per axis.
+
+    Returns:
+        Tuple of slices.
+    """
+    box = []
+    for size, lo, hi in zip(shape, lower, upper):
+        start = int(np.clip(np.floor(np.min(lo)) - 1, 0, size))
+        stop = int(np.clip(np.ceil(np.max(hi)) + 2, start, size))
+        box.append(slice(start, stop))
+    return tuple(box)
+
+
+def place_sphere(grid, pos, radius, value=1.0, supersampling=1):
     """
     Updates an existing 3D grid by placing a spherical object within it.
 
@@ -12,6 +36,8 @@ def place_sphere(grid, pos, radius, value=1.0):
         pos:    Center of the sphere (in [Z, Y, X]).
         radius: Radius of the sphere.
         value:  Value to fill the sphere with.
+        supersampling: Sub-samples per axis of the voxels at the surface, values > 1 place the partial volume
+                       of the voxels instead of a binary mask.
 
     Returns:
         None; the function updates the grid in place.
@@ -23,14 +49,19 @@ def place_sphere(grid, pos, radius, value=1.0):
     # Grid shape
     shape = grid.shape
 
-    # Create meshgrid of coords based on the grid's shape
-    xx, yy, zz = np.mgrid[0:shape[0], 0:shape[1], 0:shape[2]]
+    # Open grid of coords of the sub-block around the sphere, the first axis is compared with pos[2]
+    box = _bounding_box(shape, [pos[2] - radius, pos[1] - radius, pos[0] - radius], [pos[2] + radius, pos[1] + radius, pos[0] + radius])
+    if supersampling > 1:
+        distance = lambda xx, yy, zz: np.sqrt((xx - pos[2])**2 + (yy - pos[1])**2 + (zz - pos[0])**2) - radius
+        blend(grid[box], partial_volume(distance, box, supersampling), value)
+        return
+    xx, yy, zz = np.ogrid[box]
 
     # Calculate squared distance to pos
     circle = (xx - pos[2])**2 + (yy - pos[1])**2 + (zz - pos[0])**2
 
     # Update grid in place where the condition is met
-    grid[circle <= radius**2] = value
+    grid[box][circle <= radius**2] = value
 
 def place_cube(grid, pos, size, value=1.0):
     """
@@ -72,7 +103,7 @@ def rotate_point_around_z(x, y, z, angle):
     return x_rotated, y_rotated, z
 
 
-def place_cube_with_rotation(grid, pos, size, value=1.0, angle=None):
+def place_cube_with_rotation(grid, pos, size, value=1.0, angle=None, supersampling=1):
     """
     Updates an existing 3D grid by placing a cube object within it, potentially rotated around the Z-axis.
 
@@ -82,6 +113,8 @@ def place_cube_with_rotation(grid, pos, size, value=1.0, angle=None):
         size:   Size of the cube (in [Z, Y, X]).
         value:  Value to fill the cube with.
         angle:  Rotation angle in radians around the Z-axis. If None, a random angle is chosen.
+        supersampling: Sub-samples per axis of the voxels at the surface, values > 1 place the partial volume
+                       of the voxels instead of a binary mask.
 
     Returns:
         None; the function updates the grid in place.
@@ -89,11 +122,23 @@ def place_cube_with_rotation(grid, pos, size, value=1.0, angle=None):
     if angle is None:
         angle = np.random.uniform(0, 2*np.pi)  # Random angle if not specified
 
-    xx,yy,zz = np.mgrid[0:grid.shape[0], 0:grid.shape[1], 0:grid.shape[2]]
-
     # Center of the cube
     center = np.array(pos) + np.array(size) / 2
 
+    # Sub-block around the cube, the rotated square lies within its circumscribed circle
+    half_diagonal = np.sqrt((np.array(size[2]) / 2) ** 2 + (np.array(size[1]) / 2) ** 2)
+    box = _bounding_box(grid.shape, [center[2] - half_diagonal, center[1] - half_diagonal, pos[0]],
+                        [center[2] + half_diagonal, center[1] + half_diagonal, pos[0] + size[0]])
+    if supersampling > 1:
+        # the largest distance to the faces is a lower bound of the distance to the surface
+        def distance(xx, yy, zz):
+            xx_rotated, yy_rotated, _ = rotate_point_around_z(xx - center[2], yy - center[1], 0, -angle)
+            return np.maximum(np.maximum(np.abs(xx_rotated) - size[2] / 2, np.abs(yy_rotated) - size[1] / 2),
+                              np.abs(zz - center[0]) - size[0] / 2)
+        blend(grid[box], partial_volume(distance, box, supersampling), value)
+        return
+    xx, yy, zz = np.ogrid[box]
+
     # Rotate grid points around the Z-axis in the opposite direction
     try:
         xx_rotated, yy_rotated, _ = rotate_point_around_z(xx - center[2], yy - center[1], 0, -angle)
@@ -108,7 +153,7 @@ def place_cube_with_rotation(grid, pos, size, value=1.0, angle=None):
         )
 
         # Update grid where the condition is met
-        grid[inside_cube] = value
+        grid[box][inside_cube] = value
     except ValueError:
         # Calculate start and end indices for each dimension, ensuring they are within the grid bounds
         start_indices = [max(0, p) for p in pos]
@@ -125,7 +170,7 @@ def place_cube_with_rotation(grid, pos, size, value=1.0, angle=None):
 
    
 
-def place_ellipsoid_with_rotation(grid, pos, radii, value=1.0, angle=None):
+def place_ellipsoid_with_rotation(grid, pos, radii, value=1.0, angle=None, supersampling=1):
     """
     Updates an existing 3D grid by placing a randomly rotated ellipsoid object within it.
 
@@ -135,6 +180,8 @@ def place_ellipsoid_with_rotation(grid, pos, radii, value=1.0, angle=None):
         radii:  Radii of the ellipsoid (in [Z, Y, X]).
         value:  Value to fill the ellipsoid with.
         angle:  Rotation angle in radians around the Z-axis. If None, a random angle is chosen.
+        supersampling: Sub-samples per axis of the voxels at the surface, values > 1 place the partial volume
+                       of the voxels instead of a binary mask.
 
     Returns:
         None; the function updates the grid in place.
@@ -142,7 +189,20 @@ def place_ellipsoid_with_rotation(grid, pos, radii, value=1.0, angle=None):
     if angle is None:
         angle = np.random.uniform(0, 2*np.pi)  # Random angle if not specified
 
-    zz, yy, xx = np.mgrid[0:grid.shape[0], 0:grid.shape[1], 0:grid.shape[2]]
+    # Sub-block around the ellipsoid, the rotated ellipse lies within the circle of its larger radius
+    in_plane_radius = np.maximum(radii[1], radii[2])
+    box = _bounding_box(grid.shape, [pos[0] - radii[0], pos[1] - in_plane_radius, pos[2] - in_plane_radius],
+                        [pos[0] + radii[0], pos[1] + in_plane_radius, pos[2] + in_plane_radius])
+    if supersampling > 1:
+        # the ellipsoid scaled by q >= 1 contains the ellipsoid grown by (q - 1) * min(radii), thus (q - 1) * min(radii)
+        # is a lower bound of the distance to the surface
+        def distance(zz, yy, xx):
+            xx_rotated, yy_rotated, _ = rotate_point_around_z(xx - pos[2], yy - pos[1], 0, -angle)
+            q = np.sqrt(xx_rotated**2 / radii[2]**2 + yy_rotated**2 / radii[1]**2 + (zz - pos[0])**2 / radii[0]**2)
+            return (q - 1) * np.min(radii)
+        blend(grid[box], partial_volume(distance, box, supersampling), value)
+        return
+    zz, yy, xx = np.ogrid[box]
 
     # Rotate grid points around the Z-axis in the opposite direction
     xx_rotated, yy_rotated, _ = rotate_point_around_z(xx - pos[2], yy - pos[1], 0, -angle)
@@ -159,9 +219,9 @@ def place_ellipsoid_with_rotation(grid, pos, radii, value=1.0, angle=None):
     ) <= 1
 
     # Update grid where the condition is met
-    grid[inside_ellipsoid] = value
+    grid[box][inside_ellipsoid] = value
 
-def place_cylinder_with_rotation(grid, pos, height, radius, value=1.0, angle=None):
+def place_cylinder_with_rotation(grid, pos, height, radius, value=1.0, angle=None, supersampling=1):
     """
     Updates an existing 3D grid by placing a randomly rotated cylinder object within it.
     Args:
@@ -171,14 +231,23 @@ def place_cylinder_with_rotation(grid, pos, height, radius, value=1.0, angle=Non
         radius: Radius of the cylinder in the XY plane.
         value: Value to fill the cylinder with.
         angle: Rotation angle in radians around the Z-axis. If None, a random angle is chosen.
+        supersampling: Sub-samples per axis of the voxels at the surface, values > 1 place the partial volume
+                       of the voxels instead of a binary mask.
     Returns:
         None; the function updates the grid in place.
     """
     if angle is None:
         angle = np.random.uniform(0, 2*np.pi)  # Random angle if not specified
 
-    # Create meshgrid
-    zz, yy, xx = np.mgrid[0:grid.shape[0], 0:grid.shape[1], 0:grid.shape[2]]
+    # Open grid of the sub-block around the cylinder
+    box = _bounding_box(grid.shape, [pos[0], pos[1] - radius, pos[2] - radius], [pos[0] + height, pos[1] + radius, pos[2] + radius])
+    if supersampling > 1:
+        # the rotation around the axis of the cylinder does not change it
+        distance = lambda zz, yy, xx: np.maximum(np.sqrt((xx - pos[2])**2 + (yy - pos[1])**2) - radius,
+                                                 np.abs(zz - pos[0] - height / 2) - height / 2)
+        blend(grid[box], partial_volume(distance, box, supersampling), value)
+        return
+    zz, yy, xx = np.ogrid[box]
 
     # Rotate grid points around the Z-axis in the opposite direction to simulate cylinder rotation
     xx_rotated, yy_rotated, _ = rotate_point_around_z(xx - pos[2], yy - pos[1], zz, -angle)
@@ -192,9 +261,9 @@ def place_cylinder_with_rotation(grid, pos, height, radius, value=1.0, angle=Non
                       (zz >= pos[0]) & (zz <= pos[0] + height)
 
     # Update grid where the condition is met
-    grid[inside_cylinder] = value
+    grid[box][inside_cylinder] = value
 
-def place_pyramid(grid, base_center, base_size, height, value=1.0):
+def place_pyramid(grid, base_center, base_size, height, value=1.0, supersampling=1):
     """
     Places an axis-aligned pyramid into a 3D grid.
 
@@ -204,12 +273,25 @@ def place_pyramid(grid, base_center, base_size, height, value=1.0):
         base_size: Side length of the pyramid's square base.
         height: Height of the pyramid.
         value: Value to fill the pyramid with.
+        supersampling: Sub-samples per axis of the voxels at the surface, values > 1 place the partial volume
+                       of the voxels instead of a binary mask.
 
     Returns:
         None; the grid is modified in place.
     """
-    zz, yy, xx = np.mgrid[0:grid.shape[0], 0:grid.shape[1], 0:grid.shape[2]]
-    
+    # Sub-block around the pyramid, its base lies in the plane z = 0 and its apex at z = height
+    box = _bounding_box(grid.shape, [0, base_center[1] - base_size / 2, base_center[2] - base_size / 2],
+                        [height, base_center[1] + base_size / 2, base_center[2] + base_size / 2])
+    if supersampling > 1:
+        # largest distance to the side planes dx <= base_size / 2 * (1 - z / height) and the apex plane
+        slope = base_size / (2 * height)
+        def distance(zz, yy, xx):
+            side = np.maximum(np.abs(xx - base_center[2]), np.abs(yy - base_center[1])) + slope * zz - base_size / 2
+            return np.maximum(side / np.sqrt(1 + slope**2), zz - height)
+        blend(grid[box], partial_volume(distance, box, supersampling), value)
+        return
+    zz, yy, xx = np.ogrid[box]
+
     # Calculate distances from the base center in the XY plane
     dx = np.abs(xx - base_center[2])
     dy = np.abs(yy - base_center[1])
@@ -221,7 +303,7 @@ def place_pyramid(grid, base_center, base_size, height, value=1.0):
     inside_pyramid = (dx <= max_dist) & (dy <= max_dist) & (zz <= height)
 
     # Update the grid
-    grid[inside_pyramid] = value
+    grid[box][inside_pyramid] = value
 
 def visualize_grid(grid):
     """
@@ -248,7 +330,7 @@ def visualize_grid(grid):
     # plt.show()
     plt.savefig(f'random_object.png', dpi=150, transparent=False, bbox_inches='tight')
 
-def generate_3D_primitives(volume_shape, number_of_primitives):
+def generate_3D_primitives(volume_shape, number_of_primitives, rng=None, verbose=True, supersampling=1):
     """
     Generates a 3D phantom composed of a specified number of random geometric primitives. The primitives are added
     to the phantom with random positions, orientations, sizes, and intensities. The method returns both
@@ -258,40 +340,51 @@ def generate_3D_primitives(volume_shape, number_of_primitives):
     - volume_shape: shape of the phantom
     - number_of_primitives (int, optional): The number of geometric primitives to include in the phantom.
     Defaults to 6.
+    - rng (np.random.Generator, optional): Random number generator, by default the global state of random and np.random is used.
+    - verbose (bool, optional): Prints the choice of each primitive.
+    - supersampling (int, optional): Sub-samples per axis of the voxels at the surfaces, values > 1 give partial volumes.
 
     Returns:
     - numpy.array: The 3D phantom.
     """
     grid = np.zeros(volume_shape)
 
+    if rng is None:
+        choice, randint, uniform = random.choice, np.random.randint, np.random.uniform
+        random_angle = lambda: None
+    else:
+        choice, randint, uniform = lambda options: options[rng.integers(len(options))], rng.integers, rng.uniform
+        random_angle = lambda: rng.uniform(0, 2*np.pi)
+
     for i in range(number_of_primitives):
-        object_type = random.choice(["ellipsoid", "sphere", "cube", "pyramid", "cylinder", "rectangle"])
-        pos = np.random.randint(0, volume_shape[0], 3)
-        intensitiy_value = np.random.uniform(0.4, 1.0, 1)
-        print(f"{i}th Random choice was {object_type}, placed at {pos} with intensity {intensitiy_value}.")
+        object_type = choice(["ellipsoid", "sphere", "cube", "pyramid", "cylinder", "rectangle"])
+        pos = randint(0, volume_shape[0], 3)
+        intensitiy_value = uniform(0.4, 1.0, 1)
+        if verbose:
+            print(f"{i}th Random choice was {object_type}, placed at {pos} with intensity {intensitiy_value}.")
 
         if object_type == "ellipsoid":
-            ellipsoid_radii = np.random.randint(1, int(volume_shape[0] / 5),
-                                                3)  # Radii along Z, Y, X axes
-            place_ellipsoid_with_rotation(grid, pos, ellipsoid_radii, value=intensitiy_value)
+            ellipsoid_radii = randint(1, int(volume_shape[0] / 5),
+                                      3)  # Radii along Z, Y, X axes
+            place_ellipsoid_with_rotation(grid, pos, ellipsoid_radii, value=intensitiy_value, angle=random_angle(), supersampling=supersampling)
         elif object_type == "sphere":
-            radius = np.random.randint(1, int(volume_shape[0] / 5), 1)  # Radius
-            place_sphere(grid, pos, radius, value=intensitiy_value)
+            radius = randint(1, int(volume_shape[0] / 5), 1)  # Radius
+            place_sphere(grid, pos, radius, value=intensitiy_value, supersampling=supersampling)
         elif object_type == 'rectangle':
-            cube_size = np.random.randint(1, int(volume_shape[0] / 5), 3)  # Size of the cube
-            place_cube_with_rotation(grid, pos, cube_size, value=intensitiy_value)
+            cube_size = randint(1, int(volume_shape[0] / 5), 3)  # Size of the cube
+            place_cube_with_rotation(grid, pos, cube_size, value=intensitiy_value, angle=random_angle(), supersampling=supersampling)
         elif object_type == 'cube':
-            cube_size = np.random.randint(1, int(volume_shape[0] / 5), 1)  # Size of the cube
-            place_cube_with_rotation(grid, pos, (cube_size[0], cube_size[0], cube_size[0]), value=intensitiy_value)
+            cube_size = randint(1, int(volume_shape[0] / 5), 1)  # Size of the cube
+            place_cube_with_rotation(grid, pos, (cube_size[0], cube_size[0], cube_size[0]), value=intensitiy_value, angle=random_angle(), supersampling=supersampling)
         elif object_type == 'pyramid':
-            base_size = np.random.randint(1, int(volume_shape[0] / 5), 1)  # Length of the base's side
-            height = np.random.randint(1, int(volume_shape[0] / 5), 1)  # Height of the pyramid
+            base_size = randint(1, int(volume_shape[0] / 5), 1)  # Length of the base's side
+            height = randint(1, int(volume_shape[0] / 5), 1)  # Height of the pyramid
             # Place the pyramid in the grid
-            place_pyramid(grid, pos, base_size, height, intensitiy_value)
+            place_pyramid(grid, pos, base_size, height, intensitiy_value, supersampling=supersampling)
         else:  # 'cylinder'
-            cylinder_height = np.random.randint(1, int(volume_shape[0] / 5), 1)
-            cylinder_radius = np.random.randint(1, int(volume_shape[0] / 5), 1)
-            place_cylinder_with_rotation(grid, pos, cylinder_height, cylinder_radius, value=intensitiy_value)
+            cylinder_height = randint(1, int(volume_shape[0] / 5), 1)
+            cylinder_radius = randint(1, int(volume_shape[0] / 5), 1)
+            place_cylinder_with_rotation(grid, pos, cylinder_height, cylinder_radius, value=intensitiy_value, angle=random_angle(), supersampling=supersampling)
     return grid
 
 # Example usage
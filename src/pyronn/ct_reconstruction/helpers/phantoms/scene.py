@@ -0,0 +1,207 @@
+# Copyright [2019] [Christopher Syben, Markus Michen]
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from pyronn.ct_reconstruction.helpers.phantoms.shepp_logan import _index_range, normalized_coordinates
+
+KINDS = ('ellipsoid', 'box', 'cylinder')
+OPERATIONS = ('add', 'set')
+
+
+class PhantomScene:
+    """
+        Phantom described by a list of primitives instead of voxels. The primitives live in the normalized coordinates
+        of ellipsoid_phantom, [-1, 1] along each axis of the volume in x, y(, z) order, thus a scene can be evaluated at
+        any resolution and into any sub-block or slab without creating the full volume.
+        Each primitive is an ellipsoid, box or cylinder (along its last rotated axis) with a center, semi axes,
+        a rotation and a value, which is added to the volume or replaces it, in the order of the primitives.
+        A primitive is stored as a row of 2 + dim * (dim + 2) + 1 numbers, see to_array.
+    """
+
+    def __init__(self, ndim=3):
+        """
+        Args:
+            ndim:   Dimension of the scene, 2 or 3.
+        """
+        self.ndim = ndim
+        self.kinds = []
+        self.operations = []
+        self.centers = []
+        self.semi_axes = []
+        self.rotations = []
+        self.values = []
+
+    def __len__(self):
+        return len(self.values)
+
+    def add(self, kind, center, semi_axes, rotation=None, value=1.0, operation='add'):
+        """
+            Appends a primitive.
+        Args:
+            kind:       'ellipsoid', 'box' or 'cylinder' (3D only).
+            center:     Center in x, y(, z) order in normalized coordinates.
+            semi_axes:  Semi axes along the rotated axes, for boxes the half sizes.
+            rotation:   Rotation with shape (dim, dim) like in ellipsoid_phantom, by default the identity.
+            value:      Value of the primitive.
+            operation:  'add' to add the value, 'set' to replace the volume inside the primitive.
+        Returns:
+            The scene.
+        """
+        if kind not in KINDS or (kind == 'cylinder' and self.ndim != 3):
+            raise ValueError(f'Unknown primitive {kind} for a {self.ndim}D scene, use one of {KINDS}.')
+        if operation not in OPERATIONS:
+            raise ValueError(f'Unknown operation {operation}, use one of {OPERATIONS}.')
+        self.kinds.append(kind)
+        self.operations.append(operation)
+        self.centers.append(np.asarray(center, dtype=np.float64).reshape(self.ndim))
+        self.semi_axes.append(np.asarray(semi_axes, dtype=np.float64).reshape(self.ndim))
+        self.rotations.append(np.eye(self.ndim) if rotation is None else np.asarray(rotation, dtype=np.float64).reshape(self.ndim, self.ndim))
+        self.values.append(float(value))
+        return self
+
+    @classmethod
+    def from_ellipsoids(cls, centers, semi_axes, rotations, values):
+        """
+            Creates the scene of ellipses or ellipsoids given like the parameters of ellipsoid_phantom,
+            e.g. ellipsoids(SHEPP_LOGAN_3D).
+        """
+        scene = cls(np.shape(centers)[1])
+        for center, axes, rotation, value in zip(centers, semi_axes, rotations, values):
+            scene.add('ellipsoid', center, axes, rotation, value)
+        return scene
+
+    def ellipsoid_parameters(self):
+        """
+            The parameters of a scene of added ellipsoids for ellipsoid_phantom or phantom_to_world of
+            analytic_projection, which computes its exact sinogram.
+        Returns:
+            Centers, semi axes, rotations and values as np.arrays.
+        """
+        if any(kind != 'ellipsoid' for kind in self.kinds) or any(op != 'add' for op in self.operations):
+            raise ValueError('Only scenes of added ellipsoids have ellipsoid parameters.')
+        return np.array(self.centers), np.array(self.semi_axes), np.array(self.rotations), np.array(self.values)
+
+    def to_array(self):
+        """
+            Serializes the scene, one row per primitive: kind, operation, center, semi axes, rotation and value.
+        Returns:
+            np.array of float32 with shape (number, 2 + dim * (dim + 2) + 1).
+        """
+        rows = [[KINDS.index(kind), OPERATIONS.index(operation), *center, *axes, *rotation.ravel(), value]
+                for kind, operation, center, axes, rotation, value in
+                zip(self.kinds, self.operations, self.centers, self.semi_axes, self.rotations, self.values)]
+        return np.array(rows, dtype=np.float32).reshape(len(self), 3 + self.ndim * (self.ndim + 2))
+
+    @classmethod
+    def from_array(cls, array):
+        """
+            Creates a scene from the rows of to_array.
+        """
+        array = np.asarray(array, dtype=np.float64)
+        ndim = 3 if array.shape[1] == 18 else 2
+        scene = cls(ndim)
+        for row in array:
+            scene.add(KINDS[int(row[0])], row[2:2 + ndim], row[2 + ndim:2 + 2 * ndim],
+                      row[2 + 2 * ndim:2 + 2 * ndim + ndim ** 2], row[-1], OPERATIONS[int(row[1])])
+        return scene
+
+    def _inside(self, k, centered):
+        # centered coordinates per axis of the sub-block in x, y(, z) order, rotated and scaled to the unit primitive
+        scaled = []
+        for m in range(self.ndim):
+            rotated = centered[0] * self.rotations[k][m][0]
+            for j in range(1, self.ndim):
+                rotated = rotated + centered[j] * self.rotations[k][m][j]
+            scaled.append(rotated / self.semi_axes[k][m])
+        if self.kinds[k] == 'ellipsoid':
+            return sum(u ** 2 for u in scaled) <= 1
+        if self.kinds[k] == 'box':
+            inside = np.abs(scaled[0]) <= 1
+            for u in scaled[1:]:
+                inside = inside & (np.abs(u) <= 1)
+            return inside
+        return (scaled[0] ** 2 + scaled[1] ** 2 <= 1) & (np.abs(scaled[2]) <= 1)
+
+    def evaluate(self, shape, region=None, out=None, dtype=np.float32, slab_thickness=16, threads=None):
+        """
+            Rasterizes the scene on a grid of the given resolution, only the requested region is computed.
+            Each primitive is only evaluated within its bounding box, the slabs of the region are processed in
+            parallel threads like in ellipsoid_phantom.
+        Args:
+            shape:          Shape of the full grid, (Y, X) or (Z, Y, X), which spans the normalized coordinates.
+            region:         Tuple of slices of the grid, e.g. a slab or a sub-block, by default the full grid.
+            out:            Array or np.memmap of the shape of the region to write into.
+            dtype:          dtype of the new array.
+            slab_thickness: Number of slices along the first axis per slab.
+            threads:        Number of threads, None uses the default of ThreadPoolExecutor.
+        Returns:
+            The region of the phantom as np.array.
+        """
+        ndim = self.ndim
+        if region is None:
+            region = (slice(None),) * ndim
+        # coordinate j (x, y, z order) belongs to axis ndim - 1 - j
+        coordinates = [c[r] for c, r in zip(normalized_coordinates(shape), region)]
+        region_shape = tuple(len(c) for c in coordinates)
+        axis_coordinates = [coordinates[ndim - 1 - j] for j in range(ndim)]
+        if out is None:
+            out = np.empty(region_shape, dtype=dtype)
+
+        # half extent of the bounding box of the box around each primitive along coordinate j
+        extents = [np.abs(rotation.T) @ axes for rotation, axes in zip(self.rotations, self.semi_axes)]
+        boxes = [[_index_range(axis_coordinates[j], self.centers[k][j] - extents[k][j], self.centers[k][j] + extents[k][j])
+                  for j in range(ndim)][::-1] for k in range(len(self))]
+
+        def fill(slab):
+            out[slab] = 0
+            for k in range(len(self)):
+                box = list(boxes[k])
+                start, stop = max(box[0].start, slab.start), min(box[0].stop, slab.stop)
+                if start >= stop or any(b.start >= b.stop for b in box):
+                    continue
+                box[0] = slice(start, stop)
+                centered = []
+                for j in range(ndim):
+                    axis = ndim - 1 - j
+                    vector = axis_coordinates[j][box[axis]] - self.centers[k][j]
+                    centered.append(vector.reshape([-1 if i == axis else 1 for i in range(ndim)]))
+                inside = self._inside(k, centered)
+                box[0] = slice(start - slab.start, stop - slab.start)
+                block = out[slab][tuple(box)]
+                if self.operations[k] == 'add':
+                    block += inside * self.values[k]
+                else:
+                    block[np.broadcast_to(inside, block.shape)] = self.values[k]
+
+        slabs = [slice(start, min(start + slab_thickness, region_shape[0])) for start in range(0, region_shape[0], slab_thickness)]
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            list(executor.map(fill, slabs))
+        return out
+
+    def slabs(self, shape, slab_thickness=16, dtype=np.float32):
+        """
+            Evaluates the scene slab by slab along the first axis, e.g. for the streamed engines.
+        Args:
+            shape:          Shape of the full grid.
+            slab_thickness: Number of slices per slab.
+            dtype:          dtype of the slabs.
+        Returns:
+            Generator of (slice, slab) tuples.
+        """
+        for start in range(0, shape[0], slab_thickness):
+            slab = slice(start, min(start + slab_thickness, shape[0]))
+            yield slab, self.evaluate(shape, (slab,) + (slice(None),) * (self.ndim - 1), dtype=dtype, slab_thickness=slab_thickness)
@@ -12,9 +12,175 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 
 
+# Definition of Shepp Logan Phantom
+# Ellipse	Center	         Major Axis    Minor Axis    Phi     Gray Level
+# a	        (0,0)	         0.69	       0.92	         0	     2
+# b	        (0,-0.0184)	     0.6624	       0.874	     0	     -0.98
+# c	        (0.22,0)	     0.11	       0.31	         -18°	 -0.02
+# d	        (-0.22,0)	     0.16	       0.41	         18°	 -0.02
+# e	        (0,0.35)	     0.21	       0.25	         0	     0.01
+# f	        (0,0.1)	         0.046	       0.046	     0	     0.01
+# g	        (0,-0.1)	     0.046	       0.046	     0	     0.01
+# h	        (-0.08,-0.605)	 0.046	       0.023	     0	     0.01
+# i	        (0,-0.605)	     0.023	       0.023	     0	     0.01
+# j	        (0.06,-0.605)	 0.023	       0.046	     0	     0.01
+SHEPP_LOGAN_2D = np.array([[0     ,0	      ,0.69	    ,0.92	,0	             ,2     ],
+                           [0     ,-0.0184 ,0.6624	,0.874	,0	             ,-0.98 ],
+                           [0.22  ,0	      ,0.11	    ,0.31	,np.radians(-18) ,-0.02 ],
+                           [-0.22 ,0	      ,0.16	    ,0.41	,np.radians( 18) ,-0.02 ],
+                           [0     ,0.35	  ,0.21	    ,0.25	,0	             ,0.01  ],
+                           [0     ,0.1     ,0.046	,0.046	,0	             ,0.01  ],
+                           [0     ,-0.1    ,0.046	,0.046	,0	             ,0.01  ],
+                           [-0.08 ,-0.605  ,0.046	,0.023	,0	             ,0.01  ],
+                           [0     ,-0.605  ,0.023	,0.023	,0	             ,0.01  ],
+                           [0.06  ,-0.605  ,0.023	,0.046	,0	             ,0.01  ]])
+
+# definition of ellipses with enhanced contrast values
+SHEPP_LOGAN_ENHANCED_2D = np.array([[0     ,0	      ,0.69	    ,0.92	,0	             ,1    ],
+                                    [0     ,-0.0184 ,0.6624	,0.874	,0	             ,-0.8 ],
+                                    [0.22  ,0	      ,0.11	    ,0.31	,np.radians(-18) ,-0.2 ],
+                                    [-0.22 ,0	      ,0.16	    ,0.41	,np.radians( 18) ,-0.2 ],
+                                    [0     ,0.35	  ,0.21	    ,0.25	,0	             ,0.1  ],
+                                    [0     ,0.1     ,0.046	,0.046	,0	             ,0.1  ],
+                                    [0     ,-0.1    ,0.046	,0.046	,0	             ,0.1  ],
+                                    [-0.08 ,-0.605  ,0.046	,0.023	,0	             ,0.1  ],
+                                    [0     ,-0.605  ,0.023	,0.023	,0	             ,0.1  ],
+                                    [0.06  ,-0.605  ,0.023	,0.046	,0	             ,0.1  ]])
+
+# Definition adopted from CONRAD
+#                            delta_x, delta_y, delta_z,        a,       b,       c,            phi,  theta,  psi,     rho
+SHEPP_LOGAN_3D = np.array([[       0,       0,       0,     0.69,    0.92,    0.81,              0,      0,    0,     1  ],
+                           [       0, -0.0184,       0,   0.6624,   0.874,    0.78,              0,      0,    0,   -0.8 ],
+                           [    0.22,       0,       0,     0.11,    0.31,    0.22,   -(np.pi)/10.,      0,    0,   -0.2 ],
+                           [   -0.22,       0,       0,     0.16,    0.41,    0.28,    (np.pi)/10.,      0,    0,   -0.2 ],
+                           [       0,    0.35,   -0.15,     0.21,    0.25,    0.41,              0,      0,    0,    0.1 ],
+                           [       0,     0.1,    0.25,    0.046,   0.046,    0.05,              0,      0,    0,    0.1 ],
+                           [       0,    -0.1,    0.25,    0.046,   0.046,    0.05,              0,      0,    0,    0.1 ],
+                           [   -0.08,  -0.605,       0,    0.046,   0.023,    0.05,              0,      0,    0,    0.1 ],
+                           [       0,  -0.605,       0,    0.023,   0.023,    0.02,              0,      0,    0,    0.1 ],
+                           [    0.06,  -0.605,       0,    0.023,   0.046,    0.02,              0,      0,    0,    0.1 ]])
+
+
+def ellipses(el_params):
+    """
+        Converts a table of ellipses (x, y, a, b, phi, value) like SHEPP_LOGAN_2D to the parameters of ellipsoid_phantom.
+    """
+    el_params = np.asarray(el_params, dtype=np.float64)
+    c, s = np.cos(el_params[:, 4]), np.sin(el_params[:, 4])
+    # rows of the rotation: xx = xc * cos(phi) + yc * sin(phi), yy = yc * cos(phi) - xc * sin(phi)
+    rotations = np.stack([np.stack([c, s], axis=1), np.stack([-s, c], axis=1)], axis=1)
+    return el_params[:, 0:2], el_params[:, 2:4], rotations, el_params[:, 5]
+
+
+def ellipsoids(el_params):
+    """
+        Converts a table of ellipsoids (delta_x, delta_y, delta_z, a, b, c, phi, theta, psi, rho) like SHEPP_LOGAN_3D
+        to the parameters of ellipsoid_phantom.
+    """
+    el_params = np.asarray(el_params, dtype=np.float64)
+    rotations = []
+    for phi, theta, psi in el_params[:, 6:9]:
+        c = np.cos(phi)
+        s = np.sin(phi)
+        Rz_phi   = np.array([[ c, -s,  0 ],
+                             [ s,  c,  0 ],
+                             [ 0,  0,  1 ]])
+        c = np.cos(theta)
+        s = np.sin(theta)
+        Ry_theta = np.array([[ c,  0,  s ],
+                             [ 0,  1,  0 ],
+                             [-s,  0,  c ]])
+        c = np.cos(psi)
+        s = np.sin(psi)
+        Rz_psi   = np.array([[ c, -s,  0 ],
+                             [ s,  c,  0 ],
+                             [ 0,  0,  1 ]])
+
+        # R = Rz(phi) * Ry(theta) * Rz(psi)
+        rotations.append(np.dot(np.dot(Rz_phi, Ry_theta), Rz_psi).T)
+    return el_params[:, 0:3], el_params[:, 3:6], np.array(rotations), el_params[:, 9]
+
+
+def normalized_coordinates(shape):
+    """
+        Coordinates of the voxel centers per axis, centered at 0 and normalized to [-1, 1].
+    """
+    return [(np.arange(n) - (n - 1) / 2) / ((n - 1) / 2) for n in shape]
+
+
+def _index_range(coordinates, lower, upper):
+    # indices of the coordinates in [lower, upper] with a margin of one voxel
+    inside = np.nonzero((coordinates >= lower) & (coordinates <= upper))[0]
+    if len(inside) == 0:
+        return slice(0, 0)
+    return slice(max(inside[0] - 1, 0), min(inside[-1] + 2, len(coordinates)))
+
+
+def ellipsoid_phantom(shape, centers, semi_axes, rotations, values, out=None, dtype=np.float32, coordinates=None,
+                      slab_thickness=16, threads=None):
+    """
+        Sums up ellipses or ellipsoids on a grid, slab by slab along the first axis. Each ellipsoid is only evaluated
+        on the part of each slab within its bounding box, the slabs are processed in parallel threads.
+    Args:
+        shape:          Shape of the phantom, (Y, X) or (Z, Y, X).
+        centers:        Centers with shape (number, 2 or 3) in x, y(, z) order in normalized coordinates.
+        semi_axes:      Semi axes with shape (number, 2 or 3) along the rotated axes.
+        rotations:      Rotations with shape (number, dim, dim), rotated coordinate m is sum_j (coordinate_j - center_j) * R[m, j].
+        values:         Values which are added inside the ellipsoids.
+        out:            Array or np.memmap of the shape to write into, by default a new array is allocated.
+        dtype:          dtype of the new array.
+        coordinates:    Coordinate vector per axis, by default normalized_coordinates(shape).
+        slab_thickness: Number of slices along the first axis per slab.
+        threads:        Number of threads, None uses the default of ThreadPoolExecutor.
+    Returns:
+        The phantom as np.array.
+    """
+    ndim = len(shape)
+    if out is None:
+        out = np.empty(shape, dtype=dtype)
+    if coordinates is None:
+        coordinates = normalized_coordinates(shape)
+    # coordinate j (x, y, z order) belongs to axis ndim - 1 - j
+    axis_coordinates = [coordinates[ndim - 1 - j] for j in range(ndim)]
+    # half extent of the bounding box along coordinate j: sqrt(sum_m (R[m, j] * a_m)^2)
+    extents = np.sqrt(np.einsum('kmj,km->kj', np.asarray(rotations) ** 2, np.asarray(semi_axes) ** 2))
+    boxes = [[_index_range(axis_coordinates[j], centers[k][j] - extents[k][j], centers[k][j] + extents[k][j])
+              for j in range(ndim)][::-1] for k in range(len(values))]
+
+    def fill(slab):
+        out[slab] = 0
+        for k in range(len(values)):
+            box = list(boxes[k])
+            start, stop = max(box[0].start, slab.start), min(box[0].stop, slab.stop)
+            if start >= stop or any(b.start >= b.stop for b in box):
+                continue
+            box[0] = slice(start, stop)
+            # broadcast coordinate vectors of the sub-block, moved to the center
+            centered = []
+            for j in range(ndim):
+                axis = ndim - 1 - j
+                vector = axis_coordinates[j][box[axis]] - centers[k][j]
+                centered.append(vector.reshape([-1 if i == axis else 1 for i in range(ndim)]))
+            ellipse_points = 0
+            for m in range(ndim):
+                rotated = centered[0] * rotations[k][m][0]
+                for j in range(1, ndim):
+                    rotated = rotated + centered[j] * rotations[k][m][j]
+                ellipse_points = ellipse_points + (rotated ** 2) / (semi_axes[k][m] ** 2)
+            box[0] = slice(start - slab.start, stop - slab.start)
+            out[slab][tuple(box)] += (ellipse_points <= 1) * values[k]
+
+    slabs = [slice(start, min(start + slab_thickness, shape[0])) for start in range(0, shape[0], slab_thickness)]
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(fill, slabs))
+    return out
+
+
 def shepp_logan(shape):
     """
         Creates the Shepp Logan Phantom.
@@ -26,64 +192,10 @@ def shepp_logan(shape):
         Shepp Logan of shape as np.array
 
     """
-    # Definition of Shepp Logan Phantom
-    # Ellipse	Center	         Major Axis    Minor Axis    Phi     Gray Level
-    # a	        (0,0)	         0.69	       0.92	         0	     2
-    # b	        (0,-0.0184)	     0.6624	       0.874	     0	     -0.98
-    # c	        (0.22,0)	     0.11	       0.31	         -18°	 -0.02
-    # d	        (-0.22,0)	     0.16	       0.41	         18°	 -0.02
-    # e	        (0,0.35)	     0.21	       0.25	         0	     0.01
-    # f	        (0,0.1)	         0.046	       0.046	     0	     0.01
-    # g	        (0,-0.1)	     0.046	       0.046	     0	     0.01
-    # h	        (-0.08,-0.605)	 0.046	       0.023	     0	     0.01
-    # i	        (0,-0.605)	     0.023	       0.023	     0	     0.01
-    # j	        (0.06,-0.605)	 0.023	       0.046	     0	     0.01
-    shepp_logan = np.zeros(shape)
-
-    # create meshgrid of coords
-    yy_base, xx_base = np.mgrid[:shape[0], :shape[1]]
-
-    # center at 0, 0 and normalize
-    xx_base = (xx_base - (shape[1] - 1) / 2) / ((shape[1] - 1) / 2)
-    yy_base = (yy_base - (shape[0] - 1) / 2) / ((shape[0] - 1) / 2)
-
-    # definition of ellipses as np.array:
-    el_params = np.array([[0     ,0	      ,0.69	    ,0.92	,0	             ,2     ],
-                          [0     ,-0.0184 ,0.6624	,0.874	,0	             ,-0.98 ],
-                          [0.22  ,0	      ,0.11	    ,0.31	,np.radians(-18) ,-0.02 ],
-                          [-0.22 ,0	      ,0.16	    ,0.41	,np.radians( 18) ,-0.02 ],
-                          [0     ,0.35	  ,0.21	    ,0.25	,0	             ,0.01  ],
-                          [0     ,0.1     ,0.046	,0.046	,0	             ,0.01  ],
-                          [0     ,-0.1    ,0.046	,0.046	,0	             ,0.01  ],
-                          [-0.08 ,-0.605  ,0.046	,0.023	,0	             ,0.01  ],
-                          [0     ,-0.605  ,0.023	,0.023	,0	             ,0.01  ],
-                          [0.06  ,-0.605  ,0.023	,0.046	,0	             ,0.01  ]])
-
-    # create ellipses and sum up
-    for i in range(el_params.shape[0]):
-        # get params:
-        x_pos = el_params[i][0]
-        y_pos = el_params[i][1]
-        a     = el_params[i][2]
-        b     = el_params[i][3]
-        phi   = el_params[i][4]
-        value = el_params[i][5]
-
-        # move to pos
-        xc = (xx_base - x_pos)
-        yc = (yy_base - y_pos)
-        
-        # rotate
-        xx = xc * np.cos(phi) + yc * np.sin(phi)
-        yy = yc * np.cos(phi) - xc * np.sin(phi)
-
-        # calc squared distance to pos
-        ellipse_points = (xx ** 2) / (a ** 2) + (yy ** 2) / (b ** 2)
-
-        # sum up
-        shepp_logan = shepp_logan + (ellipse_points <= 1) * value
-
-    return np.flip(shepp_logan, axis=0)
+    # the phantom is flipped along Y
+    coordinates = normalized_coordinates(shape)
+    coordinates[0] = coordinates[0][::-1]
+    return ellipsoid_phantom(shape, *ellipses(SHEPP_LOGAN_2D), dtype=np.float64, coordinates=coordinates)
 
 
 def shepp_logan_enhanced(shape):
@@ -97,132 +209,24 @@ def shepp_logan_enhanced(shape):
         Phantom of shape as np.array
 
     """
-    shepp_logan = np.zeros(shape, dtype=np.float32)
-
-    # create meshgrid of coords
-    yy_base, xx_base = np.mgrid[:shape[0], :shape[1]]
-
-    # center at 0, 0 and normalize
-    xx_base = (xx_base - (shape[1] - 1) / 2) / ((shape[1] - 1) / 2)
-    yy_base = (yy_base - (shape[0] - 1) / 2) / ((shape[0] - 1) / 2)
-
-    # definition of ellipses with enhanced contrast values as np.array:
-    el_params = np.array([[0     ,0	      ,0.69	    ,0.92	,0	             ,1    ],
-                          [0     ,-0.0184 ,0.6624	,0.874	,0	             ,-0.8 ],
-                          [0.22  ,0	      ,0.11	    ,0.31	,np.radians(-18) ,-0.2 ],
-                          [-0.22 ,0	      ,0.16	    ,0.41	,np.radians( 18) ,-0.2 ],
-                          [0     ,0.35	  ,0.21	    ,0.25	,0	             ,0.1  ],
-                          [0     ,0.1     ,0.046	,0.046	,0	             ,0.1  ],
-                          [0     ,-0.1    ,0.046	,0.046	,0	             ,0.1  ],
-                          [-0.08 ,-0.605  ,0.046	,0.023	,0	             ,0.1  ],
-                          [0     ,-0.605  ,0.023	,0.023	,0	             ,0.1  ],
-                          [0.06  ,-0.605  ,0.023	,0.046	,0	             ,0.1  ]])
-
-    # create ellipses and sum up
-    for i in range(el_params.shape[0]):
-        # get params:
-        x_pos = el_params[i][0]
-        y_pos = el_params[i][1]
-        a     = el_params[i][2]
-        b     = el_params[i][3]
-        phi   = el_params[i][4]
-        value = el_params[i][5]
-
-        # move to pos
-        xc = (xx_base - x_pos)
-        yc = (yy_base - y_pos)
-
-        # rotate
-        xx = xc * np.cos(phi) + yc * np.sin(phi)
-        yy = yc * np.cos(phi) - xc * np.sin(phi)
-
-        # calc squared distance to pos
-        ellipse_points = (xx ** 2) / (a ** 2) + (yy ** 2) / (b ** 2)
-
-        # sum up
-        shepp_logan = shepp_logan + (ellipse_points <= 1) * value
-
-    return np.flip(shepp_logan, axis=0)
-
-
-def shepp_logan_3d(shape):
+    # the phantom is flipped along Y
+    coordinates = normalized_coordinates(shape)
+    coordinates[0] = coordinates[0][::-1]
+    return ellipsoid_phantom(shape, *ellipses(SHEPP_LOGAN_ENHANCED_2D), dtype=np.float64, coordinates=coordinates)
+
+
+def shepp_logan_3d(shape, out=None, slab_thickness=16, threads=None):
     """
         Creates a Shepp Logan like 3d Phantom. Definition adopted from CONRAD.
+        The phantom is generated slab by slab in float32, optionally into a given array or np.memmap.
     Args:
-        shape: Shape (in [Y, X]) of Shepp Logan phantom to create.
+        shape:          Shape (in [Z, Y, X]) of Shepp Logan phantom to create.
+        out:            Array or np.memmap of shape to write into, by default a new array is allocated.
+        slab_thickness: Number of z-slices per slab.
+        threads:        Number of threads processing the slabs.
 
     Returns:
         Phantom of shape as np.array
     """
-    shepp_logan = np.zeros(shape, dtype=np.float32)
-
-    # create meshgrid of coords
-    zz_base, yy_base, xx_base = np.mgrid[:shape[0], :shape[1], :shape[2]]
-
-    # center at 0, 0 and normalize
-    xx_base = (xx_base - (shape[2] - 1) / 2) / ((shape[2] - 1) / 2)
-    yy_base = (yy_base - (shape[1] - 1) / 2) / ((shape[1] - 1) / 2)
-    zz_base = (zz_base - (shape[0] - 1) / 2) / ((shape[0] - 1) / 2)
-
-    # definition of ellipsoids as np.array:
-    #                       delta_x, delta_y, delta_z,        a,       b,       c,            phi,  theta,  psi,     rho
-    el_params = np.array([[       0,       0,       0,     0.69,    0.92,    0.81,              0,      0,    0,     1  ],
-                          [       0, -0.0184,       0,   0.6624,   0.874,    0.78,              0,      0,    0,   -0.8 ],
-                          [    0.22,       0,       0,     0.11,    0.31,    0.22,   -(np.pi)/10.,      0,    0,   -0.2 ],
-                          [   -0.22,       0,       0,     0.16,    0.41,    0.28,    (np.pi)/10.,      0,    0,   -0.2 ],
-                          [       0,    0.35,   -0.15,     0.21,    0.25,    0.41,              0,      0,    0,    0.1 ],
-                          [       0,     0.1,    0.25,    0.046,   0.046,    0.05,              0,      0,    0,    0.1 ],
-                          [       0,    -0.1,    0.25,    0.046,   0.046,    0.05,              0,      0,    0,    0.1 ],
-                          [   -0.08,  -0.605,       0,    0.046,   0.023,    0.05,              0,      0,    0,    0.1 ],
-                          [       0,  -0.605,       0,    0.023,   0.023,    0.02,              0,      0,    0,    0.1 ],
-                          [    0.06,  -0.605,       0,    0.023,   0.046,    0.02,              0,      0,    0,    0.1 ]])
-
-    # create ellipses and sum up
-    for i in range(el_params.shape[0]):
-        # get params:
-        x_pos  = el_params[i][0]
-        y_pos  = el_params[i][1]
-        z_pos  = el_params[i][2]
-        a_axis = el_params[i][3]
-        b_axis = el_params[i][4]
-        c_axis = el_params[i][5]
-        phi    = el_params[i][6]
-        value  = el_params[i][9]
-
-        # move to pos
-        xc = (xx_base - x_pos)
-        yc = (yy_base - y_pos)
-        zc = (zz_base - z_pos)
-
-        # Rotation
-        c = np.cos(phi)
-        s = np.sin(phi)
-        Rz_phi   = np.array([[ c, -s,  0 ],
-                             [ s,  c,  0 ],
-                             [ 0,  0,  1 ]])
-        c = np.cos(0)
-        s = np.sin(0)
-        Ry_theta = np.array([[ c,  0,  s ],
-                             [ 0,  1,  0 ],
-                             [-s,  0,  c ]])
-        c = np.cos(0)
-        s = np.sin(0)
-        Rz_psi   = np.array([[ c, -s,  0 ],
-                             [ s,  c,  0 ],
-                             [ 0,  0,  1 ]])
-
-        # R = Rz(phi) * Ry(theta) * Rz(psi)
-        R = np.dot(np.dot(Rz_phi, Ry_theta), Rz_psi).T
-
-        xx = xc * R[0, 0] + yc * R[0, 1] + zc * R[0, 2]
-        yy = xc * R[1, 0] + yc * R[1, 1] + zc * R[1, 2]
-        zz = xc * R[2, 0] + yc * R[2, 1] + zc * R[2, 2]
-
-        # calc squared distance to pos
-        ellipse_points = (xx ** 2) / (a_axis ** 2) + (yy ** 2) / (b_axis ** 2) + (zz ** 2) / (c_axis ** 2)
-
-        # sum up
-        shepp_logan = shepp_logan + (ellipse_points <= 1) * value
-
-    return shepp_logan
-
+    return ellipsoid_phantom(shape, *ellipsoids(SHEPP_LOGAN_3D), out=out, coordinates=None,
+                             slab_thickness=slab_thickness, threads=threads)
@@ -14,39 +14,75 @@
 
 import numpy as np
 
+from pyronn.ct_reconstruction.helpers.misc.cache import cached
 
-def circular_trajectory_2d(number_of_projections, angular_range, swap_detector_axis):
+
+def circular_angles(number_of_projections, angular_range):
     """
-        Generates the central ray vectors defining a circular trajectory for use with the 2d projection layers.
+        Equidistant projection angles of a circular trajectory, the end of angular_range is excluded.
     Args:
-        geometry: 2d Geometry class including angular_range and number_of_projections
+        number_of_projections:  Number of equidistant projections.
+        angular_range:          The covered angular range [start, end] in radians.
     Returns:
-        Central ray vectors as np.array.
+        Angles with shape (num_projections,) as np.array.
     """
-    rays = np.zeros([number_of_projections, 2])
     angular_increment = (angular_range[1] - angular_range[0]) / number_of_projections
-    for i in range(number_of_projections):
-        if swap_detector_axis:
-            rays[i] = [np.cos(angular_range[0] + i * angular_increment), -np.sin(angular_range[0] + i * angular_increment)]
-        else:
-            rays[i] = [np.cos(angular_range[0] + i * angular_increment), np.sin(angular_range[0] + i * angular_increment)]
-    return rays
+    return angular_range[0] + np.arange(number_of_projections) * angular_increment
 
 
-def circular_trajectory_3d(number_of_projections, angular_range, detector_spacing, detector_origin, source_isocenter_distance, source_detector_distance, swap_detector_axis, **kwargs):
+@cached
+def circular_trajectory_2d(number_of_projections, angular_range, swap_detector_axis, angles=None, **kwargs):
+    """
+        Generates the central ray vectors defining a circular trajectory for use with the 2d projection layers.
+    Args:
+        number_of_projections:  Number of equidistant projections.
+        angular_range:          The covered angular range [start, end] in radians.
+        swap_detector_axis:     Flips the rotation direction of the rays.
+        angles:                 Optional array of arbitrary projection angles in radians for non-uniform sampling,
+                                replaces number_of_projections and angular_range.
+    Returns:
+        Central ray vectors with shape (num_projections, 2) as np.array.
+    """
+    if angles is None:
+        angles = circular_angles(number_of_projections, angular_range)
+    return _circular_rays(angles, swap_detector_axis)
+
+
+def _circular_rays(angles, swap_detector_axis):
+    # uncached core of circular_trajectory_2d, also used by the chunked generators of streaming_trajectory
+    angles = np.asarray(angles, dtype=np.float64)
+    sign = -1 if swap_detector_axis else 1
+    return np.stack([np.cos(angles), sign * np.sin(angles)], axis=1)
+
+
+@cached
+def circular_trajectory_3d(number_of_projections, angular_range, detector_spacing, detector_origin, source_isocenter_distance, source_detector_distance, swap_detector_axis, angles=None, **kwargs):
     """
         Generates the projection matrices defining a circular trajectory around the z-axis
         for use with the 3d projection layers.
         Adapted from CONRAD Source code https://github.com/akmaier/CONRAD.
     Args:
-        geometry: 3d Geometry class including angular_range, number_of_projections, source_detector_distance,
-        detector_spacing, volume_origin, volume_shape and volume_spacing.
+        number_of_projections:      Number of equidistant projections.
+        angular_range:              The covered angular range [start, end] in radians.
+        detector_spacing:           The spacing between detector pixels in Y, X order.
+        detector_origin:            The detector origin in Y, X order.
+        source_isocenter_distance:  The source to isocenter distance (sid).
+        source_detector_distance:   The source to detector distance (sdd).
+        swap_detector_axis:         Flips the v direction of the detector.
+        angles:                     Optional array of arbitrary projection angles in radians for non-uniform sampling,
+                                    replaces number_of_projections and angular_range.
     Returns:
         Projection matrices with shape (num_projections, 3, 4) as np.array.
     """
+    if angles is None:
+        angles = circular_angles(number_of_projections, angular_range)
+    return _circular_matrices(angles, detector_spacing, detector_origin, source_isocenter_distance, source_detector_distance,
+                              swap_detector_axis)
+
 
-    # init empty
-    projection_matrices = np.zeros((number_of_projections, 3, 4))
+def _circular_matrices(angles, detector_spacing, detector_origin, source_isocenter_distance, source_detector_distance, swap_detector_axis):
+    # uncached core of circular_trajectory_3d, also used by the chunked generators of streaming_trajectory
+    angles = np.asarray(angles, dtype=np.float64)
 
     # axes for later use
     x_axis = np.array([1.0, 0.0, 0.0])
@@ -55,63 +91,41 @@ def circular_trajectory_3d(number_of_projections, angular_range, detector_spacin
 
     # defining u and v directions by: main coord axes
     u_dir = y_axis
-    if swap_detector_axis:
-        v_dir = x_axis
-    else:
-        v_dir = -x_axis
+    v_dir = x_axis if swap_detector_axis else -x_axis
 
-    # configure intrinsic camera parameters
+    # configure intrinsic camera parameters, we follow the [z,y,x] convention for spacing and origin
     intrinsic_params_mat = np.eye(3, 3)
-    for i in range(2):
-        intrinsic_params_mat[i, i] = source_detector_distance / detector_spacing[1-i]
-
-    # calc and set detector origin
-    # we need t_x and t_y, and follow the [z,y,x] convention
-
-    intrinsic_params_mat[0,2] = detector_origin[-1] / detector_spacing[-1] *-1
-    intrinsic_params_mat[1,2] = detector_origin[-2] / detector_spacing[-2] *-1
-    # intrinsic_params_mat[0:2, 2] = detector_origin / detector_spacing *-1
-    # configure extrinisc pararams and create projection_matrices
-    current_angle = angular_range[0]
-    angular_increment = (angular_range[1] - angular_range[0]) / number_of_projections
-    for p in range(number_of_projections):
-        # calculate extrinsic params
-        extrinsic_params_mat = np.eye(4, 4)
-
-        # rotation of axes from world system to plane of rotation system
-        R_to_plane = np.eye(4, 4)
-        R_to_plane[0:3, 0:3] = np.array([z_axis, np.cross(z_axis, x_axis), -x_axis])
-
-        # rotation for u and v direction
-        axis_align_R = np.eye(4, 4)
-        axis_align_R[0:3, 0] = u_dir
-        axis_align_R[0:3, 1] = v_dir
-        axis_align_R[0:3, 2] = np.cross(u_dir, v_dir)
-        axis_align_R = axis_align_R.T
-
-        # rotation about x axis
-        R_x_axis = np.eye(4, 4)
-        R_x_axis[0:3, 0:3] = np.array([1, 0, 0,
-                                       0, np.cos(-current_angle), -np.sin(-current_angle),
-                                       0, np.sin(-current_angle), np.cos(-current_angle)]).reshape((3, 3))
-
-        # translation of camera
-        translation = np.eye(4, 4)
-        translation[0:4, 3] = np.array([0, 0, source_isocenter_distance, 1])
-
-        # combine the above into 4x4 extrinsic params matrix
-        extrinsic_params_mat = np.dot(np.dot(np.dot(translation, axis_align_R), R_x_axis), R_to_plane)
-        extrinsic_params_mat = extrinsic_params_mat / extrinsic_params_mat[3, 3]
-
-        # calculate projection matrix
-        projection_matrices[p][0:3, 0:3] = np.dot(intrinsic_params_mat, extrinsic_params_mat[0:3, 0:3])
-        projection_matrices[p][0:3, 3] = np.dot(intrinsic_params_mat, extrinsic_params_mat[0:3, 3])
-
-        # next angle
-        current_angle += angular_increment
-
-    return projection_matrices
-
-if __name__ == '__main__':
-    ss = circular_trajectory_3d(360, [0,2*np.pi], [1.,1.], [-199.5, -299.5], 750, 1200, False)
-    a = 5
\ No newline at end of file
+    intrinsic_params_mat[0, 0] = source_detector_distance / detector_spacing[-1]
+    intrinsic_params_mat[1, 1] = source_detector_distance / detector_spacing[-2]
+    intrinsic_params_mat[0, 2] = detector_origin[-1] / detector_spacing[-1] * -1
+    intrinsic_params_mat[1, 2] = detector_origin[-2] / detector_spacing[-2] * -1
+
+    # rotation of axes from world system to plane of rotation system
+    R_to_plane = np.eye(4, 4)
+    R_to_plane[0:3, 0:3] = np.array([z_axis, np.cross(z_axis, x_axis), -x_axis])
+
+    # rotation for u and v direction
+    axis_align_R = np.eye(4, 4)
+    axis_align_R[0:3, 0] = u_dir
+    axis_align_R[0:3, 1] = v_dir
+    axis_align_R[0:3, 2] = np.cross(u_dir, v_dir)
+    axis_align_R = axis_align_R.T
+
+    # translation of camera
+    translation = np.eye(4, 4)
+    translation[0:4, 3] = np.array([0, 0, source_isocenter_distance, 1])
+
+    # view independent part of the projection matrices
+    camera = intrinsic_params_mat @ (translation @ axis_align_R)[0:3, :]
+
+    # stack of rotations about the x axis of the plane of rotation system
+    cos, sin = np.cos(-angles), np.sin(-angles)
+    R_x_axis = np.zeros((len(angles), 4, 4))
+    R_x_axis[:, 0, 0] = 1
+    R_x_axis[:, 1, 1] = cos
+    R_x_axis[:, 1, 2] = -sin
+    R_x_axis[:, 2, 1] = sin
+    R_x_axis[:, 2, 2] = cos
+    R_x_axis[:, 3, 3] = 1
+
+    return camera @ R_x_axis @ R_to_plane
@@ -0,0 +1,64 @@
+# Copyright [2019] [Christopher Syben, Markus Michen]
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+
+from pyronn.ct_reconstruction.helpers.misc.cache import cached
+from pyronn.ct_reconstruction.helpers.trajectories.circular_trajectory import circular_trajectory_3d
+
+
+def helical_source_positions(number_of_projections, angular_range, table_feed, **kwargs):
+    """
+        Computes the z-position of the source for every projection of a helical trajectory.
+        The helix is centered around the isocenter, i.e. the source travels from -total_feed/2 to +total_feed/2.
+    Args:
+        number_of_projections:  Number of equidistant projections.
+        angular_range:          The covered angular range [start, end] in radians (multiple turns allowed).
+        table_feed:             Table feed per full turn (2*pi) in mm.
+    Returns:
+        Source z-positions with shape (num_projections,) as np.array.
+    """
+    angular_increment = (angular_range[1] - angular_range[0]) / number_of_projections
+    relative_angles = np.arange(number_of_projections) * angular_increment
+    total_feed = table_feed * (angular_range[1] - angular_range[0]) / (2 * np.pi)
+    return relative_angles * table_feed / (2 * np.pi) - total_feed / 2.0
+
+
+@cached
+def helical_trajectory_3d(number_of_projections, angular_range, detector_spacing, detector_origin, source_isocenter_distance,
+                          source_detector_distance, swap_detector_axis, table_feed, **kwargs):
+    """
+        Generates the projection matrices defining a helical trajectory around the z-axis
+        for use with the 3d projection layers. The rotation part follows circular_trajectory_3d,
+        the table feed is applied as a translation of the object along the z-axis.
+    Args:
+        number_of_projections:      Number of equidistant projections.
+        angular_range:              The covered angular range [start, end] in radians (multiple turns allowed).
+        detector_spacing:           The spacing between detector pixels in Y, X order.
+        detector_origin:            The detector origin in Y, X order.
+        source_isocenter_distance:  The source to isocenter distance (sid).
+        source_detector_distance:   The source to detector distance (sdd).
+        swap_detector_axis:         Flips the v direction of the detector.
+        table_feed:                 Table feed per full turn (2*pi) in mm.
+    Returns:
+        Projection matrices with shape (num_projections, 3, 4) as np.array.
+    """
+    projection_matrices = circular_trajectory_3d(number_of_projections, angular_range, detector_spacing, detector_origin,
+                                                 source_isocenter_distance, source_detector_distance, swap_detector_axis)
+
+    # table feed: shift the object by the source z-position, i.e. P @ T(0, 0, -z)
+    source_z = helical_source_positions(number_of_projections, angular_range, table_feed)
+    projection_matrices[:, :, 3] -= source_z[:, None] * projection_matrices[:, :, 2]
+
+    return projection_matrices
@@ -0,0 +1,157 @@
+# Copyright [2019] [Christopher Syben, Markus Michen]
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+
+from pyronn.ct_reconstruction.helpers.trajectories.arbitrary_trajectory import pack_headers, vector_projection_matrices
+
+POSE_FIELDS = ('source', 'detector_center', 'detector_h', 'detector_v')
+
+
+def _hermite(knots, values, positions):
+    # piecewise cubic Hermite interpolation with tangents from finite differences on the non-uniform knots
+    tangents = np.gradient(values, knots, axis=0)
+    segment = np.clip(np.searchsorted(knots, positions, side='right') - 1, 0, len(knots) - 2)
+    t0, t1 = knots[segment], knots[segment + 1]
+    h = (t1 - t0)[:, None]
+    s = ((positions - t0) / (t1 - t0))[:, None]
+    h00 = 2 * s ** 3 - 3 * s ** 2 + 1
+    h10 = s ** 3 - 2 * s ** 2 + s
+    h01 = -2 * s ** 3 + 3 * s ** 2
+    h11 = s ** 3 - s ** 2
+    return h00 * values[segment] + h10 * h * tangents[segment] + h01 * values[segment + 1] + h11 * h * tangents[segment + 1]
+
+
+def _reprojection_error(reference, projection_matrices, test_points):
+    # max distance in detector pixels of the test points projected with both matrices
+    homogeneous = np.concatenate([test_points, np.ones((len(test_points), 1))], axis=1)
+    a = np.einsum('nij,mj->nmi', reference, homogeneous)
+    b = np.einsum('nij,mj->nmi', projection_matrices, homogeneous)
+    a = a[..., 0:2] / a[..., 2:3]
+    b = b[..., 0:2] / b[..., 2:3]
+    return np.max(np.linalg.norm(a - b, axis=-1), axis=1)
+
+
+class KeyframeTrajectory:
+    """
+        Compact trajectory of a smooth scan: source and detector poses at keyframes only, the poses of the other views
+        are interpolated with piecewise cubic Hermite splines and expanded to projection matrices on demand.
+        Can be passed to GeometryBase.set_trajectory.
+    """
+
+    def __init__(self, keyframe_indices, poses, number_of_projections, detector_shape, swap_detector_axis=False):
+        """
+        Args:
+            keyframe_indices:       Sorted view indices of the keyframes, including the first and the last view.
+            poses:                  Dict with the keyframe arrays 'source', 'detector_center', 'detector_h' and 'detector_v',
+                                    each of shape (num_keyframes, 3) in voxel units, see pack_headers.
+            number_of_projections:  Number of views of the full trajectory.
+            detector_shape:         Shape of the detector in vertical, horizontal order.
+            swap_detector_axis:     Flips the Z-axis of the matrices.
+        """
+        self.keyframe_indices = np.asarray(keyframe_indices)
+        self.poses = {k: np.asarray(poses[k], dtype=np.float64) for k in POSE_FIELDS}
+        self.number_of_projections = number_of_projections
+        self.detector_shape = np.asarray(detector_shape)
+        self.swap_detector_axis = swap_detector_axis
+
+    @classmethod
+    def from_poses(cls, poses, detector_shape, max_error=0.1, test_points=None, swap_detector_axis=False):
+        """
+            Selects keyframes from the poses of all views such that the interpolated projection matrices reproject
+            the test points with at most max_error detector pixels deviation. Starting from the first and the last view,
+            the view with the largest error of every failing segment is added as keyframe until the bound holds.
+        Args:
+            poses:              Dict with the arrays 'source', 'detector_center', 'detector_h' and 'detector_v'
+                                of shape (num_projections, 3) in voxel units, e.g. from pack_headers.
+            detector_shape:     Shape of the detector in vertical, horizontal order.
+            max_error:          Bound of the reprojection error in detector pixels.
+            test_points:        Points with shape (num_points, 3) in voxel units the error is evaluated on. Defaults to the
+                                isocenter and the corners of a cube with a quarter of the smallest source distance as half edge.
+            swap_detector_axis: Flips the Z-axis of the matrices.
+        Returns:
+            KeyframeTrajectory object.
+        """
+        poses = {k: np.asarray(poses[k], dtype=np.float64) for k in POSE_FIELDS}
+        number_of_projections = len(poses['source'])
+        if test_points is None:
+            half_edge = 0.25 * np.min(np.linalg.norm(poses['source'], axis=1))
+            corners = np.array(np.meshgrid([-1, 1], [-1, 1], [-1, 1], indexing='ij')).reshape(3, -1).T * half_edge
+            test_points = np.concatenate([np.zeros((1, 3)), corners])
+        reference = vector_projection_matrices(**poses, detector_shape=detector_shape, swap_detector_axis=swap_detector_axis)
+
+        keyframe_indices = np.unique([0, number_of_projections - 1])
+        while True:
+            trajectory = cls(keyframe_indices, {k: v[keyframe_indices] for k, v in poses.items()},
+                             number_of_projections, detector_shape, swap_detector_axis)
+            error = _reprojection_error(reference, trajectory.expand(), test_points)
+            if error.max() <= max_error:
+                return trajectory
+            segments = np.split(np.arange(number_of_projections), keyframe_indices[1:-1])
+            new_keyframes = [views[np.argmax(error[views])] for views in segments if error[views].max() > max_error]
+            keyframe_indices = np.union1d(keyframe_indices, new_keyframes)
+
+    @classmethod
+    def from_headers(cls, headers, voxel_size=[0.45, 0.45], max_error=0.1, test_points=None, swap_detector_axis=False):
+        """
+            Compresses the trajectory of a scan described by per projection headers, see arbitrary_projection_matrix.
+        """
+        detector_shape = np.array([headers[0].number_vertical_pixels, headers[0].number_horizontal_pixels])
+        return cls.from_poses(pack_headers(headers, voxel_size), detector_shape, max_error, test_points, swap_detector_axis)
+
+    def interpolate_poses(self, view_indices):
+        """
+            Interpolates the source and detector poses of the given views.
+        Args:
+            view_indices: Array of view indices.
+        Returns:
+            Dict of pose arrays with shape (len(view_indices), 3).
+        """
+        positions = np.asarray(view_indices, dtype=np.float64)
+        if len(self.keyframe_indices) == 1:
+            return {k: np.repeat(v, len(positions), axis=0) for k, v in self.poses.items()}
+        knots = self.keyframe_indices.astype(np.float64)
+        return {k: _hermite(knots, v, positions) for k, v in self.poses.items()}
+
+    def expand(self, view_indices=None):
+        """
+            Expands the projection matrices of the given views, by default of all views.
+        Args:
+            view_indices: Array of view indices or None.
+        Returns:
+            Projection matrices with shape (len(view_indices), 3, 4) as np.array.
+        """
+        if view_indices is None:
+            view_indices = np.arange(self.number_of_projections)
+        return vector_projection_matrices(**self.interpolate_poses(view_indices), detector_shape=self.detector_shape,
+                                          swap_detector_axis=self.swap_detector_axis)
+
+    def chunks(self, chunk_size=1024):
+        """
+            Expands the trajectory chunk by chunk, see helpers.trajectories.streaming_trajectory.
+        Args:
+            chunk_size: Maximum number of views per chunk.
+        Returns:
+            Generator of (view_indices, projection matrices) tuples.
+        """
+        for start in range(0, self.number_of_projections, chunk_size):
+            view_indices = np.arange(start, min(start + chunk_size, self.number_of_projections))
+            yield view_indices, self.expand(view_indices)
+
+    def __len__(self):
+        return self.number_of_projections
+
+    @property
+    def nbytes(self):
+        return self.keyframe_indices.nbytes + sum(v.nbytes for v in self.poses.values())
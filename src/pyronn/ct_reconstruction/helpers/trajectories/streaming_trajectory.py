@@ -0,0 +1,104 @@
+# Copyright [2019] [Christopher Syben, Markus Michen]
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+
+from pyronn.ct_reconstruction.helpers.trajectories.circular_trajectory import _circular_matrices, _circular_rays
+
+# The generators below yield (view_indices, trajectory chunk) tuples, so only one chunk of a long scan is materialized
+# at a time. The chunks are computed by the uncached cores of the generators as they are consumed only once.
+
+
+def array_trajectory_chunks(trajectory, chunk_size=1024):
+    """
+        Splits an already materialized trajectory, e.g. an np.memmap, into chunks.
+    Args:
+        trajectory: Ray vectors or projection matrices with the views along the first axis.
+        chunk_size: Maximum number of views per chunk.
+    Returns:
+        Generator of (view_indices, trajectory chunk) tuples.
+    """
+    for start in range(0, len(trajectory), chunk_size):
+        stop = min(start + chunk_size, len(trajectory))
+        yield np.arange(start, stop), np.asarray(trajectory[start:stop])
+
+
+def circular_trajectory_2d_chunks(number_of_projections, angular_range, swap_detector_axis, chunk_size=1024, **kwargs):
+    """
+        Generates the central ray vectors of circular_trajectory_2d chunk by chunk.
+    Args:
+        number_of_projections:  Number of equidistant projections.
+        angular_range:          The covered angular range [start, end] in radians.
+        swap_detector_axis:     Flips the rotation direction of the rays.
+        chunk_size:             Maximum number of views per chunk.
+    Returns:
+        Generator of (view_indices, rays) tuples, rays with shape (chunk, 2).
+    """
+    angular_increment = (angular_range[1] - angular_range[0]) / number_of_projections
+    for start in range(0, number_of_projections, chunk_size):
+        view_indices = np.arange(start, min(start + chunk_size, number_of_projections))
+        angles = angular_range[0] + view_indices * angular_increment
+        yield view_indices, _circular_rays(angles, swap_detector_axis)
+
+
+def circular_trajectory_3d_chunks(number_of_projections, angular_range, detector_spacing, detector_origin, source_isocenter_distance,
+                                  source_detector_distance, swap_detector_axis, chunk_size=1024, **kwargs):
+    """
+        Generates the projection matrices of circular_trajectory_3d chunk by chunk.
+    Args:
+        number_of_projections:      Number of equidistant projections.
+        angular_range:              The covered angular range [start, end] in radians.
+        detector_spacing:           The spacing between detector pixels in Y, X order.
+        detector_origin:            The detector origin in Y, X order.
+        source_isocenter_distance:  The source to isocenter distance (sid).
+        source_detector_distance:   The source to detector distance (sdd).
+        swap_detector_axis:         Flips the v direction of the detector.
+        chunk_size:                 Maximum number of views per chunk.
+    Returns:
+        Generator of (view_indices, projection matrices) tuples, matrices with shape (chunk, 3, 4).
+    """
+    angular_increment = (angular_range[1] - angular_range[0]) / number_of_projections
+    for start in range(0, number_of_projections, chunk_size):
+        view_indices = np.arange(start, min(start + chunk_size, number_of_projections))
+        angles = angular_range[0] + view_indices * angular_increment
+        yield view_indices, _circular_matrices(angles, detector_spacing, detector_origin, source_isocenter_distance,
+                                                  source_detector_distance, swap_detector_axis)
+
+
+def helical_trajectory_3d_chunks(number_of_projections, angular_range, detector_spacing, detector_origin, source_isocenter_distance,
+                                 source_detector_distance, swap_detector_axis, table_feed, chunk_size=1024, **kwargs):
+    """
+        Generates the projection matrices of helical_trajectory_3d chunk by chunk.
+    Args:
+        number_of_projections:      Number of equidistant projections.
+        angular_range:              The covered angular range [start, end] in radians (multiple turns allowed).
+        detector_spacing:           The spacing between detector pixels in Y, X order.
+        detector_origin:            The detector origin in Y, X order.
+        source_isocenter_distance:  The source to isocenter distance (sid).
+        source_detector_distance:   The source to detector distance (sdd).
+        swap_detector_axis:         Flips the v direction of the detector.
+        table_feed:                 Table feed per full turn (2*pi) in mm.
+        chunk_size:                 Maximum number of views per chunk.
+    Returns:
+        Generator of (view_indices, projection matrices) tuples, matrices with shape (chunk, 3, 4).
+    """
+    angular_increment = (angular_range[1] - angular_range[0]) / number_of_projections
+    total_feed = table_feed * (angular_range[1] - angular_range[0]) / (2 * np.pi)
+    for view_indices, projection_matrices in circular_trajectory_3d_chunks(number_of_projections, angular_range, detector_spacing,
+                                                                           detector_origin, source_isocenter_distance,
+                                                                           source_detector_distance, swap_detector_axis, chunk_size):
+        # same as helical_source_positions for the views of this chunk
+        source_z = view_indices * angular_increment * table_feed / (2 * np.pi) - total_feed / 2.0
+        projection_matrices[:, :, 3] -= source_z[:, None] * projection_matrices[:, :, 2]
+        yield view_indices, projection_matrices
@@ -24,6 +24,8 @@ class ParallelBackProjectionFor2D:
 
                         sinogram = sinogram.cuda()
                         tensor_geometry[k] = tmp_tensor.cuda()
+                    elif k == 'rotational_symmetry':
+                        tensor_geometry[k] = torch.Tensor([param]).cuda()
                 except:
                     print('Attribute <' + k + '> could not be transformed to torch.Tensor')
 
@@ -13,6 +13,11 @@ class ConeBackProjectionFor3D:
             else:
                 sinogram = torch.clone(input)
 
+            if getattr(geometry, 'keyframe_trajectory', None) is not None:
+                # the compressed trajectory is expanded chunk by chunk of views
+                from pyronn.ct_reconstruction.layers.torch.streaming import streamed_backprojection
+                return streamed_backprojection(ConeBackProjection3D(), sinogram.cuda().contiguous(), geometry).cpu().numpy()
+
             tensor_geometry = {}
             geo_dict = vars(geometry)
             for k in geo_dict:
@@ -20,6 +20,8 @@ class ParallelProjectionFor2D:
 
                     phantom = torch.tensor(input.copy(), dtype=torch.float32).cuda()
                     tensor_geometry[k] = tmp_tensor.cuda()
+                elif k == 'rotational_symmetry':
+                    tensor_geometry[k] = torch.Tensor([param]).cuda()
             sinogram =  ParallelProjection2D().forward(phantom, **tensor_geometry)
             return sinogram.cpu().numpy()
         except Exception as e:
@@ -18,6 +18,11 @@ class ConeProjectionFor3D(Projection3D):
 
             phantom = torch.tensor(input.copy(), dtype=torch.float32)
 
+            if getattr(geometry, 'keyframe_trajectory', None) is not None:
+                # the compressed trajectory is expanded chunk by chunk of views
+                from pyronn.ct_reconstruction.layers.torch.streaming import streamed_projection
+                return streamed_projection(ConeProjection3D(), phantom.cuda(), geometry).cpu().numpy()
+
             tensor_geometry = {}
             geo_dict = vars(geometry)
             for k in geo_dict:
@@ -29,13 +29,17 @@ def parallel_backprojection2d(sinogram, geometry):
             Initialized lme_custom_ops.parallel_backprojection2d layer.
     """
     batch = np.shape(sinogram)[0]
-    return pyronn_layers.parallel_backprojection2d(sinogram,
+    reco = pyronn_layers.parallel_backprojection2d(sinogram,
                                                    volume_shape=geometry.volume_shape,
                                                     volume_origin   =np.broadcast_to(geometry.volume_origin,[batch,*np.shape(geometry.volume_origin)]),
                                                     detector_origin =np.broadcast_to(geometry.detector_origin,[batch,*np.shape(geometry.detector_origin)]),
                                                     volume_spacing  =np.broadcast_to(geometry.volume_spacing,[batch,*np.shape(geometry.volume_spacing)]),
                                                     detector_spacing=np.broadcast_to(geometry.detector_spacing,[batch,*np.shape(geometry.detector_spacing)]),
                                                     ray_vectors     =np.broadcast_to(geometry.trajectory,[batch,*np.shape(geometry.trajectory)]))
+    if getattr(geometry, 'fov_mask', None) is not None:
+        # zero the corners outside of the field of view
+        reco = tf.multiply(reco, tf.cast(geometry.fov_mask, tf.float32))
+    return reco
 
 
 @ops.RegisterGradient("ParallelBackprojection2D")
@@ -66,7 +70,7 @@ def fan_backprojection2d(sinogram, geometry):
             Initialized lme_custom_ops.fan_backprojection2d layer.
     """
     batch = np.shape(sinogram)[0]
-    return pyronn_layers.fan_backprojection2d(sinogram,
+    reco = pyronn_layers.fan_backprojection2d(sinogram,
                                               volume_shape=geometry.volume_shape,
                                               volume_origin=np.broadcast_to(geometry.volume_origin, [batch, *np.shape(geometry.volume_origin)]),
                                               detector_origin=np.broadcast_to(geometry.detector_origin, [batch, *np.shape(geometry.detector_origin)]),
@@ -75,6 +79,10 @@ def fan_backprojection2d(sinogram, geometry):
                                               source_2_isocenter_distance=np.broadcast_to(geometry.source_isocenter_distance, [batch, *np.shape(geometry.source_isocenter_distance)]),
                                               source_2_detector_distance=np.broadcast_to(geometry.source_detector_distance, [batch, *np.shape(geometry.source_detector_distance)]),
                                               central_ray_vectors=np.broadcast_to(geometry.trajectory, [batch, *np.shape(geometry.trajectory)]))
+    if getattr(geometry, 'fov_mask', None) is not None:
+        # zero the corners outside of the field of view
+        reco = tf.multiply(reco, tf.cast(geometry.fov_mask, tf.float32))
+    return reco
 
 
 @ops.RegisterGradient("FanBackprojection2D")
@@ -30,7 +30,7 @@ def cone_backprojection3d(sinogram, geometry, hardware_interp=True):
     """
     batch = np.shape(sinogram)[0]
     step_size=1.0
-    return pyronn_layers.cone_backprojection3d(sinogram,
+    reco = pyronn_layers.cone_backprojection3d(sinogram,
                                                volume_shape=geometry.volume_shape,
                                                volume_origin=np.broadcast_to(geometry.volume_origin, [batch, *np.shape(geometry.volume_origin)]),
                                                volume_spacing=np.broadcast_to(geometry.volume_spacing, [batch, *np.shape(geometry.volume_spacing)]),
@@ -38,6 +38,10 @@ def cone_backprojection3d(sinogram, geometry, hardware_interp=True):
                                                hardware_interp=hardware_interp,
                                                step_size=np.broadcast_to(step_size, [batch, *np.shape(step_size)]),
                                                projection_multiplier=np.broadcast_to(geometry.projection_multiplier, [batch, *np.shape(geometry.projection_multiplier)]))
+    if getattr(geometry, 'fov_mask', None) is not None:
+        # zero the corners outside of the field of view
+        reco = tf.multiply(reco, tf.cast(geometry.fov_mask, tf.float32))
+    return reco
 
 
 @ops.RegisterGradient("ConeBackprojection3D")
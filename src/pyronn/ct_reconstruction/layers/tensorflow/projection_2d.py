@@ -30,6 +30,9 @@ def parallel_projection2d(volume, geometry):
             Initialized lme_custom_ops.parallel_projection2d layer.
     """
     batch = np.shape(volume)[0]
+    if getattr(geometry, 'fov_mask', None) is not None:
+        # voxels outside of the field of view are treated as zero
+        volume = tf.multiply(volume, tf.cast(geometry.fov_mask, tf.float32))
     return pyronn_layers.parallel_projection2d(volume,
                                                projection_shape=geometry.sinogram_shape,
                                                volume_origin=np.broadcast_to(geometry.volume_origin, [batch, *np.shape(geometry.volume_origin)]),
@@ -68,6 +71,9 @@ def fan_projection2d(volume, geometry):
             Initialized lme_custom_ops.fan_projection2d layer.
     """
     batch = np.shape(volume)[0]
+    if getattr(geometry, 'fov_mask', None) is not None:
+        # voxels outside of the field of view are treated as zero
+        volume = tf.multiply(volume, tf.cast(geometry.fov_mask, tf.float32))
     return pyronn_layers.fan_projection2d(volume,
                                           projection_shape=geometry.sinogram_shape,
                                           volume_origin=np.broadcast_to(geometry.volume_origin, [batch, *np.shape(geometry.volume_origin)]),
@@ -30,6 +30,9 @@ def cone_projection3d(volume, geometry, hardware_interp=True, step_size=1.0):
             Initialized lme_custom_ops.cone_projection3d layer.
     """
     batch = np.shape(volume)[0]
+    if getattr(geometry, 'fov_mask', None) is not None:
+        # voxels outside of the field of view are treated as zero
+        volume = tf.multiply(volume, tf.cast(geometry.fov_mask, tf.float32))
     return pyronn_layers.cone_projection3d(volume,
                                            projection_shape=geometry.sinogram_shape,
                                            volume_origin=np.broadcast_to(geometry.volume_origin, [batch, *np.shape(geometry.volume_origin)]),
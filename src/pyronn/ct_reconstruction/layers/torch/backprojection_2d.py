@@ -21,13 +21,15 @@ import pyronn_layers
 
 class ParallelBackProjection2DFunction(Function):
     @staticmethod
-    def forward(ctx, input:Tensor, volume_shape:Tensor, volume_origin:Tensor, detector_origin:Tensor, volume_spacing:Tensor, detector_spacing:Tensor, trajectory:Tensor)->Tensor:
+    def forward(ctx, input:Tensor, volume_shape:Tensor, volume_origin:Tensor, detector_origin:Tensor, volume_spacing:Tensor, detector_spacing:Tensor, trajectory:Tensor, fov_mask:Tensor, rotational_symmetry:Tensor)->Tensor:
         outputs = pyronn_layers.parallel_backprojection2d(input,volume_shape,
                                                                 volume_origin,
                                                                 detector_origin,
                                                                 volume_spacing,
                                                                 detector_spacing,                                                                
-                                                                trajectory)
+                                                                trajectory,
+                                                                fov_mask,
+                                                                rotational_symmetry)
         
         ctx.sinogram_shape = torch.tensor(input.shape[1:]).cuda()
         ctx.volume_origin = volume_origin
@@ -35,6 +37,7 @@ class ParallelBackProjection2DFunction(Function):
         ctx.volume_spacing = volume_spacing
         ctx.detector_spacing = detector_spacing
         ctx.trajectory = trajectory
+        ctx.fov_mask = fov_mask
 
         
 
@@ -49,6 +52,9 @@ class ParallelBackProjection2DFunction(Function):
         volume_spacing    =  ctx.volume_spacing         
         detector_spacing  =  ctx.detector_spacing       
         trajectory        =  ctx.trajectory         
+        fov_mask          =  ctx.fov_mask
+        if fov_mask.numel() > 0:
+            grad = torch.multiply(grad, fov_mask)
         if not grad.is_contiguous():
             grad = grad.contiguous()
         outputs = pyronn_layers.parallel_projection2d(grad,
@@ -60,7 +66,7 @@ class ParallelBackProjection2DFunction(Function):
                                                                 trajectory)
         d_input = outputs
         
-        return d_input , None, None, None, None, None, None
+        return d_input , None, None, None, None, None, None, None, None
 
 
 
@@ -69,13 +75,15 @@ class ParallelBackProjection2D(nn.Module):
         super(ParallelBackProjection2D, self).__init__()
 
     def forward(self, input:Tensor, **geometry:dict)->Tensor:
-        return ParallelBackProjection2DFunction.apply(input, geometry['volume_shape'],geometry['volume_origin'],geometry['detector_origin'],geometry['volume_spacing'],geometry['detector_spacing'],geometry['trajectory'])
+        fov_mask = geometry.get('fov_mask', torch.empty(0, device=input.device))
+        rotational_symmetry = geometry.get('rotational_symmetry', torch.zeros(1))
+        return ParallelBackProjection2DFunction.apply(input, geometry['volume_shape'],geometry['volume_origin'],geometry['detector_origin'],geometry['volume_spacing'],geometry['detector_spacing'],geometry['trajectory'], fov_mask, rotational_symmetry)
 
 #Fan Layer
 
 class FanBackProjection2DFunction(Function):
     @staticmethod
-    def forward(ctx, input:Tensor, volume_shape:Tensor, volume_origin:Tensor, detector_origin:Tensor, volume_spacing:Tensor, detector_spacing:Tensor, source_isocenter_distance:Tensor, source_detector_distance:Tensor, trajectory:Tensor,)->Tensor:
+    def forward(ctx, input:Tensor, volume_shape:Tensor, volume_origin:Tensor, detector_origin:Tensor, volume_spacing:Tensor, detector_spacing:Tensor, source_isocenter_distance:Tensor, source_detector_distance:Tensor, trajectory:Tensor, fov_mask:Tensor, rotational_symmetry:Tensor)->Tensor:
         outputs = pyronn_layers.fan_backprojection2d(input,volume_shape,
                                                                 volume_origin,
                                                                 detector_origin,
@@ -83,7 +91,9 @@ class FanBackProjection2DFunction(Function):
                                                                 detector_spacing,    
                                                                 source_isocenter_distance,      
                                                                 source_detector_distance,                                                      
-                                                                trajectory)
+                                                                trajectory,
+                                                                fov_mask,
+                                                                rotational_symmetry)
         
         ctx.sinogram_shape = torch.tensor(input.shape[1:]).cuda()
         ctx.volume_origin = volume_origin
@@ -93,6 +103,7 @@ class FanBackProjection2DFunction(Function):
         ctx.source_isocenter_distance = source_isocenter_distance
         ctx.source_detector_distance = source_detector_distance
         ctx.trajectory = trajectory
+        ctx.fov_mask = fov_mask
 
         return outputs
 
@@ -107,6 +118,9 @@ class FanBackProjection2DFunction(Function):
         source_isocenter_distance   =  ctx.source_isocenter_distance         
         source_detector_distance    =  ctx.source_detector_distance   
         trajectory                  =  ctx.trajectory  
+        fov_mask                    =  ctx.fov_mask
+        if fov_mask.numel() > 0:
+            grad = torch.multiply(grad, fov_mask)
         if not grad.is_contiguous():
             grad = grad.contiguous()
         outputs = pyronn_layers.fan_projection2d(grad,
@@ -120,7 +134,7 @@ class FanBackProjection2DFunction(Function):
                                                                 trajectory)
         d_input = outputs
         
-        return d_input , None, None, None, None, None, None, None, None
+        return d_input , None, None, None, None, None, None, None, None, None, None
 
 
 
@@ -129,5 +143,7 @@ class FanBackProjection2D(nn.Module):
         super(FanBackProjection2D, self).__init__()
 
     def forward(self, input:Tensor, **geometry:dict)->Tensor:
+        fov_mask = geometry.get('fov_mask', torch.empty(0, device=input.device))
+        rotational_symmetry = geometry.get('rotational_symmetry', torch.zeros(1))
         return FanBackProjection2DFunction.apply(input, geometry['volume_shape'],geometry['volume_origin'],geometry['detector_origin'],geometry['volume_spacing'],geometry['detector_spacing'],
-                                                        geometry['source_isocenter_distance'], geometry['source_detector_distance'], geometry['trajectory'])
+                                                        geometry['source_isocenter_distance'], geometry['source_detector_distance'], geometry['trajectory'], fov_mask, rotational_symmetry)
@@ -19,14 +19,16 @@ import pyronn_layers
 
 class ConeBackProjection3DFunction(Function):
     @staticmethod
-    def forward(ctx, input:Tensor, volume_shape:Tensor, volume_origin:Tensor, volume_spacing:Tensor, trajectory:Tensor, projection_multiplier:Tensor, step_size:Tensor, hardware_interp:Tensor)->Tensor:
+    def forward(ctx, input:Tensor, volume_shape:Tensor, volume_origin:Tensor, volume_spacing:Tensor, trajectory:Tensor, projection_multiplier:Tensor, step_size:Tensor, hardware_interp:Tensor, fov_mask:Tensor, rotational_symmetry:Tensor)->Tensor:
         outputs = pyronn_layers.cone_backprojection3d(input, 
                                                             volume_shape,
                                                             volume_origin,
                                                             volume_spacing,                                                      
                                                             trajectory,
                                                             projection_multiplier,
-                                                            hardware_interp)
+                                                            hardware_interp,
+                                                            fov_mask,
+                                                            rotational_symmetry)
         
         ctx.sinogram_shape = torch.tensor(input.shape[1:]).cuda()                                 
         ctx.volume_origin = volume_origin    
@@ -34,6 +36,7 @@ class ConeBackProjection3DFunction(Function):
         ctx.trajectory  = trajectory        
         ctx.step_size = step_size         
         ctx.hardware_interp = hardware_interp
+        ctx.fov_mask = fov_mask
         return outputs
 
     @staticmethod
@@ -44,6 +47,9 @@ class ConeBackProjection3DFunction(Function):
         trajectory      =  ctx.trajectory 
         step_size       =  ctx.step_size
         hardware_interp =  ctx.hardware_interp
+        fov_mask        =  ctx.fov_mask
+        if fov_mask.numel() > 0:
+            grad = torch.multiply(grad, fov_mask)
         if not grad.is_contiguous():
             grad = grad.contiguous()
         outputs = pyronn_layers.cone_projection3d(grad,
@@ -55,7 +61,7 @@ class ConeBackProjection3DFunction(Function):
                                                         hardware_interp)
         d_input = outputs
         
-        return d_input , None, None, None, None, None, None, None
+        return d_input , None, None, None, None, None, None, None, None, None
 
 
 
@@ -65,5 +71,7 @@ class ConeBackProjection3D(nn.Module):
         self.hardware_interp = torch.Tensor([hardware_interp]).cpu()
 
     def forward(self, input:Tensor, **geometry:dict)->Tensor:
-        return ConeBackProjection3DFunction.apply(input, geometry['volume_shape'],geometry['volume_origin'],geometry['volume_spacing'], geometry['trajectory'], geometry['projection_multiplier'], geometry['step_size'], self.hardware_interp)
+        fov_mask = geometry.get('fov_mask', torch.empty(0, device=input.device))
+        rotational_symmetry = geometry.get('rotational_symmetry', torch.zeros(1))
+        return ConeBackProjection3DFunction.apply(input, geometry['volume_shape'],geometry['volume_origin'],geometry['volume_spacing'], geometry['trajectory'], geometry['projection_multiplier'], geometry['step_size'], self.hardware_interp, fov_mask, rotational_symmetry)
 
@@ -0,0 +1,126 @@
+# Copyright [2019] [Christopher Syben, Markus Michen]
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import OrderedDict
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, IterableDataset, get_worker_info
+
+from pyronn.ct_reconstruction.helpers.misc.cache import cache_key
+from pyronn.ct_reconstruction.helpers.phantoms.phantom_dataset import generate_sample, sample_rng
+from pyronn.ct_reconstruction.layers.torch.projection_3d import ConeProjection3D
+from pyronn.ct_reconstruction.layers.torch.streaming import streamed_projection, tensor_geometry
+
+# projection plans, keyed by the content hash of geometry, trajectory and device, the least recently used plans are dropped
+MAX_PLANS = 8
+_plans = OrderedDict()
+
+
+def projection_plan(geometry, device='cuda'):
+    """
+        The cone beam projection layer and the geometry tensors of a geometry. The plan is created once per geometry
+        and device and shared by all callers, thus batches are projected without converting the geometry again.
+        At most MAX_PLANS plans are kept with their device tensors.
+    Args:
+        geometry:   Cone beam Geometry object.
+        device:     Device of the projection.
+    Returns:
+        ConeProjection3D module and dict of geometry tensors.
+    """
+    key = cache_key('projection_plan', geometry, getattr(geometry, 'trajectory', None),
+                    getattr(geometry, 'keyframe_trajectory', None), str(device))
+    if key in _plans:
+        _plans.move_to_end(key)
+    else:
+        _plans[key] = (ConeProjection3D(), tensor_geometry(geometry, device, exclude=()))
+        while len(_plans) > MAX_PLANS:
+            _plans.popitem(last=False)
+    return _plans[key]
+
+
+class PhantomStream(IterableDataset):
+    """
+        Stream of batches of random phantoms for the geometry of a SpecificGeometry. Sample i is generated from its own
+        random stream of the seed like in build_phantom_dataset, thus the stream is reproducible and DataLoader workers
+        generate disjoint batches: worker w generates the batches w, w + workers, ..., which the DataLoader
+        returns in order. Use projected_batches to project the phantoms on the device.
+    """
+
+    def __init__(self, specific_geometry, batch_size=8, count=None, seed=0, number_of_primitives=6, phantom_func=None):
+        """
+        Args:
+            specific_geometry:      SpecificGeometry object, e.g. CircularGeometrys3D.
+            batch_size:             Number of phantoms per batch.
+            count:                  Number of samples, None for an endless stream.
+            seed:                   Seed of the stream.
+            number_of_primitives:   Number of random primitives per phantom.
+            phantom_func:           Function (volume_shape, rng) returning a phantom, by default random primitives.
+        """
+        super(PhantomStream, self).__init__()
+        self.geometry = specific_geometry.geometry
+        self.volume_shape = [int(n) for n in specific_geometry.geometry_info['volume_shape']]
+        self.batch_size = batch_size
+        self.count = count
+        self.seed = seed
+        self.number_of_primitives = number_of_primitives
+        self.phantom_func = phantom_func
+
+    def phantom(self, index):
+        """
+            Generates the phantom of sample index.
+        """
+        if self.phantom_func is None:
+            return generate_sample(self.volume_shape, self.number_of_primitives, self.seed, index)
+        return self.phantom_func(self.volume_shape, sample_rng(self.seed, index))
+
+    def __iter__(self):
+        worker_info = get_worker_info()
+        worker, workers = (0, 1) if worker_info is None else (worker_info.id, worker_info.num_workers)
+        start = worker * self.batch_size
+        while self.count is None or start < self.count:
+            stop = start + self.batch_size if self.count is None else min(start + self.batch_size, self.count)
+            # the batch is filled in place, the DataLoader moves it to shared memory without another copy
+            phantoms = torch.empty((stop - start, *self.volume_shape), dtype=torch.float32)
+            for n, index in enumerate(range(start, stop)):
+                phantoms[n] = torch.from_numpy(np.asarray(self.phantom(index), dtype=np.float32))
+            yield torch.arange(start, stop), phantoms
+            start += workers * self.batch_size
+
+
+def projected_batches(stream, num_workers=4, device='cuda', prefetch_factor=2):
+    """
+        Iterates over the batches of a PhantomStream with their sinograms. The phantoms are generated by num_workers
+        processes ahead of the consumer, collected in pinned memory and projected with one call of the shared
+        projection plan per batch.
+    Args:
+        stream:             PhantomStream object.
+        num_workers:        Number of generating processes, 0 generates in the calling process.
+        device:             Device of the projection.
+        prefetch_factor:    Number of batches generated ahead by each worker.
+    Returns:
+        Generator of (indices, phantoms, sinograms) tuples of tensors, phantoms and sinograms on the device.
+    """
+    loader = DataLoader(stream, batch_size=None, num_workers=num_workers, pin_memory=torch.device(device).type == 'cuda',
+                        prefetch_factor=prefetch_factor if num_workers > 0 else None, persistent_workers=num_workers > 0)
+    projection, geometry = projection_plan(stream.geometry, device)
+    for indices, phantoms in loader:
+        phantoms = phantoms.to(device, non_blocking=True)
+        with torch.no_grad():
+            if 'trajectory' in geometry:
+                sinograms = projection.forward(phantoms, **geometry)
+            else:
+                # a compressed trajectory is expanded chunk by chunk of views
+                sinograms = streamed_projection(projection, phantoms, stream.geometry, geometry_tensors=geometry)
+        yield indices, phantoms, sinograms
@@ -24,7 +24,7 @@ import pyronn_layers
 
 class ParallelProjection2DFunction(Function):
     @staticmethod
-    def forward(ctx, input:Tensor, sinogram_shape:Tensor, volume_origin:Tensor, detector_origin:Tensor, volume_spacing:Tensor, detector_spacing:Tensor, trajectory)->Tensor:
+    def forward(ctx, input:Tensor, sinogram_shape:Tensor, volume_origin:Tensor, detector_origin:Tensor, volume_spacing:Tensor, detector_spacing:Tensor, trajectory, fov_mask:Tensor, rotational_symmetry:Tensor)->Tensor:
         """
         Forward operator of 2D parallel projection
         Args: 
@@ -32,7 +32,11 @@ class ParallelProjection2DFunction(Function):
                 sinogram_shape:     number_of_projections x detector_width
                 volume_origin:      origin of the world coordinate system w.r.t. the volume array (tensor)
                 ...
+                fov_mask:           voxels outside of the field of view are treated as zero, empty to disable
+                rotational_symmetry: direction of the 90 degree symmetry of the trajectory used by the adjoint, 0 to disable
         """
+        if fov_mask.numel() > 0:
+            input = torch.multiply(input, fov_mask).contiguous()
         outputs = pyronn_layers.parallel_projection2d(input,sinogram_shape, volume_origin,detector_origin,volume_spacing,detector_spacing,trajectory)
         
         ctx.volume_shape        = torch.tensor(input.shape[1:]).cuda()
@@ -41,6 +45,8 @@ class ParallelProjection2DFunction(Function):
         ctx.volume_spacing      = volume_spacing
         ctx.detector_spacing    = detector_spacing
         ctx.trajectory          = trajectory
+        ctx.fov_mask            = fov_mask
+        ctx.rotational_symmetry = rotational_symmetry
 
         return outputs
 
@@ -53,6 +59,8 @@ class ParallelProjection2DFunction(Function):
         volume_spacing      = ctx.volume_spacing
         detector_spacing    = ctx.detector_spacing
         trajectory          = ctx.trajectory
+        fov_mask            = ctx.fov_mask
+        rotational_symmetry = ctx.rotational_symmetry
         if not grad.is_contiguous():
             grad = grad.contiguous()
         outputs = pyronn_layers.parallel_backprojection2d(grad,
@@ -61,10 +69,12 @@ class ParallelProjection2DFunction(Function):
                                                                 detector_origin,
                                                                 volume_spacing,
                                                                 detector_spacing,                                                                
-                                                                trajectory)
+                                                                trajectory,
+                                                                fov_mask,
+                                                                rotational_symmetry)
         d_input = outputs
         
-        return d_input, None, None, None, None, None, None
+        return d_input, None, None, None, None, None, None, None, None
 
 
 class ParallelProjection2D(nn.Module):
@@ -72,11 +82,13 @@ class ParallelProjection2D(nn.Module):
         super(ParallelProjection2D, self).__init__()
 
     def forward(self, input:Tensor, **geometry:dict)->Tensor:
-        return ParallelProjection2DFunction.apply(input, geometry['sinogram_shape'],geometry['volume_origin'],geometry['detector_origin'],geometry['volume_spacing'],geometry['detector_spacing'],geometry['trajectory'])
+        fov_mask = geometry.get('fov_mask', torch.empty(0, device=input.device))
+        rotational_symmetry = geometry.get('rotational_symmetry', torch.zeros(1))
+        return ParallelProjection2DFunction.apply(input, geometry['sinogram_shape'],geometry['volume_origin'],geometry['detector_origin'],geometry['volume_spacing'],geometry['detector_spacing'],geometry['trajectory'], fov_mask, rotational_symmetry)
 
 class FanProjection2DFunction(Function):
     @staticmethod
-    def forward(ctx, input:Tensor, sinogram_shape:Tensor, volume_origin:Tensor, detector_origin:Tensor, volume_spacing:Tensor, detector_spacing:Tensor, source_isocenter_distance:Tensor, source_detector_distance:Tensor, trajectory:Tensor)->Tensor:
+    def forward(ctx, input:Tensor, sinogram_shape:Tensor, volume_origin:Tensor, detector_origin:Tensor, volume_spacing:Tensor, detector_spacing:Tensor, source_isocenter_distance:Tensor, source_detector_distance:Tensor, trajectory:Tensor, fov_mask:Tensor, rotational_symmetry:Tensor)->Tensor:
         """
         Forward operator of 2D fan projection
         Args: 
@@ -84,7 +96,11 @@ class FanProjection2DFunction(Function):
                 sinogram_shape:     number_of_projections x detector_width
                 volume_origin:      origin of the world coordinate system w.r.t. the volume array (tensor)
                 ...
+                fov_mask:           voxels outside of the field of view are treated as zero, empty to disable
+                rotational_symmetry: direction of the 90 degree symmetry of the trajectory used by the adjoint, 0 to disable
         """
+        if fov_mask.numel() > 0:
+            input = torch.multiply(input, fov_mask).contiguous()
         outputs = pyronn_layers.fan_projection2d(input,sinogram_shape, volume_origin,detector_origin,volume_spacing,detector_spacing,source_isocenter_distance,source_detector_distance,trajectory)
     
         ctx.volume_shape        = torch.tensor(input.shape[1:]).cuda()
@@ -95,6 +111,8 @@ class FanProjection2DFunction(Function):
         ctx.source_isocenter_distance      = source_isocenter_distance
         ctx.source_detector_distance    = source_detector_distance
         ctx.trajectory          = trajectory
+        ctx.fov_mask            = fov_mask
+        ctx.rotational_symmetry = rotational_symmetry
 
         return outputs
 
@@ -108,6 +126,8 @@ class FanProjection2DFunction(Function):
         source_isocenter_distance   = ctx.source_isocenter_distance
         source_detector_distance    = ctx.source_detector_distance
         trajectory                  = ctx.trajectory
+        fov_mask                    = ctx.fov_mask
+        rotational_symmetry         = ctx.rotational_symmetry
         if not grad.is_contiguous():
             grad = grad.contiguous()
         outputs = pyronn_layers.fan_backprojection2d(grad,
@@ -118,10 +138,12 @@ class FanProjection2DFunction(Function):
                                                                 detector_spacing,   
                                                                 source_isocenter_distance,
                                                                 source_detector_distance,                                                             
-                                                                trajectory)
+                                                                trajectory,
+                                                                fov_mask,
+                                                                rotational_symmetry)
         d_input = outputs
         
-        return d_input, None, None, None, None, None, None, None, None
+        return d_input, None, None, None, None, None, None, None, None, None, None
 
 
 class FanProjection2D(nn.Module):
@@ -129,6 +151,8 @@ class FanProjection2D(nn.Module):
         super(FanProjection2D, self).__init__()
 
     def forward(self, input:Tensor, **geometry:dict)->Tensor:
+        fov_mask = geometry.get('fov_mask', torch.empty(0, device=input.device))
+        rotational_symmetry = geometry.get('rotational_symmetry', torch.zeros(1))
         return FanProjection2DFunction.apply(input, geometry['sinogram_shape'], geometry['volume_origin'], geometry['detector_origin'], geometry['volume_spacing'], geometry['detector_spacing'],
-                                                    geometry['source_isocenter_distance'], geometry['source_detector_distance'], geometry['trajectory'])
+                                                    geometry['source_isocenter_distance'], geometry['source_detector_distance'], geometry['trajectory'], fov_mask, rotational_symmetry)
     
\ No newline at end of file
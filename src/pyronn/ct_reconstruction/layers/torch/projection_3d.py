@@ -23,7 +23,7 @@ import numpy as np
 class ConeProjection3DFunction(Function):
     @staticmethod
     def forward(ctx, input:Tensor, sinogram_shape:Tensor, volume_origin:Tensor, volume_spacing:Tensor, trajectory:Tensor,
-                     projection_multiplier:Tensor, step_size:Tensor, hardware_interp:Tensor)->Tensor:
+                     projection_multiplier:Tensor, step_size:Tensor, hardware_interp:Tensor, fov_mask:Tensor, rotational_symmetry:Tensor)->Tensor:
         """
         Forward operator of 2D fan projection
         Args: 
@@ -31,7 +31,11 @@ class ConeProjection3DFunction(Function):
                 sinogram_shape:     number_of_projections x detector_width
                 volume_origin:      origin of the world coordinate system w.r.t. the volume array (tensor)
                 ...
+                fov_mask:           voxels outside of the field of view are treated as zero, empty to disable
+                rotational_symmetry: direction of the 90 degree symmetry of the trajectory used by the adjoint, 0 to disable
         """
+        if fov_mask.numel() > 0:
+            input = torch.multiply(input, fov_mask).contiguous()
         outputs = pyronn_layers.cone_projection3d(input,sinogram_shape, volume_origin,volume_spacing,trajectory, step_size, hardware_interp)
         
         ctx.volume_shape            = torch.tensor(input.shape[1:]).cuda()
@@ -40,6 +44,8 @@ class ConeProjection3DFunction(Function):
         ctx.trajectory              = trajectory
         ctx.projection_multiplier   = projection_multiplier
         ctx.hardware_interp         = hardware_interp
+        ctx.fov_mask                = fov_mask
+        ctx.rotational_symmetry     = rotational_symmetry
 
         return outputs
 
@@ -51,6 +57,8 @@ class ConeProjection3DFunction(Function):
         trajectory              = ctx.trajectory
         projection_multiplier   = ctx.projection_multiplier
         hardware_interp         = ctx.hardware_interp
+        fov_mask                = ctx.fov_mask
+        rotational_symmetry     = ctx.rotational_symmetry
         if not grad.is_contiguous():
             grad = grad.contiguous()
         outputs = pyronn_layers.cone_backprojection3d(grad,
@@ -59,10 +67,12 @@ class ConeProjection3DFunction(Function):
                                                                 volume_spacing,                                                             
                                                                 trajectory,
                                                                 projection_multiplier,
-                                                                hardware_interp)
+                                                                hardware_interp,
+                                                                fov_mask,
+                                                                rotational_symmetry)
         d_input = outputs
         
-        return d_input, None, None, None, None, None, None, None
+        return d_input, None, None, None, None, None, None, None, None, None
 
 
 class ConeProjection3D(nn.Module):
@@ -71,4 +81,6 @@ class ConeProjection3D(nn.Module):
         self.hardware_interp = torch.Tensor([hardware_interp]).cpu()
 
     def forward(self, input:Tensor, **geometry:dict)->Tensor:
-        return ConeProjection3DFunction.apply(input, geometry['sinogram_shape'], geometry['volume_origin'], geometry['volume_spacing'], geometry['trajectory'], geometry['projection_multiplier'], geometry['step_size'], self.hardware_interp)
\ No newline at end of file
+        fov_mask = geometry.get('fov_mask', torch.empty(0, device=input.device))
+        rotational_symmetry = geometry.get('rotational_symmetry', torch.zeros(1))
+        return ConeProjection3DFunction.apply(input, geometry['sinogram_shape'], geometry['volume_origin'], geometry['volume_spacing'], geometry['trajectory'], geometry['projection_multiplier'], geometry['step_size'], self.hardware_interp, fov_mask, rotational_symmetry)
\ No newline at end of file
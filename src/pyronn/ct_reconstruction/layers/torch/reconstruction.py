@@ -3,6 +3,7 @@ import numpy as np
 import torch
 from torch import nn
 from pyronn.ct_reconstruction.geometry.geometry import Geometry
+from pyronn.ct_reconstruction.helpers.filters.filters import compact_filter
 
 
 class ParallelBeamReconstruction2D(nn.Module):
@@ -17,6 +18,8 @@ class ParallelBeamReconstruction2D(nn.Module):
         """
         from pyronn.ct_reconstruction.layers.torch.backprojection_2d import ParallelBackProjection2D
         super(ParallelBeamReconstruction2D, self).__init__()
+        # a trainable filter keeps the shape passed by the caller, e.g. one filter per view
+        filter = np.ascontiguousarray(filter) if tainable_filter else compact_filter(filter)
         self.filter = nn.Parameter(torch.tensor(filter, requires_grad=tainable_filter,dtype=torch.cfloat).cuda())
         self.backprojection = ParallelBackProjection2D()
     def forward(self, input, **kwargs):
@@ -42,6 +45,8 @@ class FanBeamReconstruction(nn.Module):
         """
         from pyronn.ct_reconstruction.layers.torch.backprojection_2d import FanBackProjection2D
         super(FanBeamReconstruction, self).__init__()
+        # a trainable filter keeps the shape passed by the caller, e.g. one filter per view
+        filter = np.ascontiguousarray(filter) if trainable_filter else compact_filter(filter)
         self.filter = nn.Parameter(torch.tensor(filter, requires_grad=trainable_filter).cuda())
         if short_scan:
             self.redundancy_weights = nn.Parameter(torch.tensor(redundancy_weights, requires_grad=trainable_redundancy_weights).cuda())
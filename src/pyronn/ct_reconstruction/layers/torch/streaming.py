@@ -0,0 +1,108 @@
+# Copyright [2019] [Christopher Syben, Markus Michen]
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+import torch
+from torch import Tensor
+from torch import nn
+
+from pyronn.ct_reconstruction.layers.torch.backprojection_3d import ConeBackProjection3D
+
+
+def tensor_geometry(geometry, device='cuda', exclude=('trajectory', 'keyframe_trajectory')):
+    """
+        Converts the members of a Geometry object to tensors as expected by the layers.
+        A compressed trajectory like KeyframeTrajectory is never converted, use the streamed layers for it.
+    Args:
+        geometry:   Geometry object.
+        device:     Device of the tensors.
+        exclude:    Members which are not converted.
+    Returns:
+        Dict of tensors.
+    """
+    tensors = {}
+    for k, param in vars(geometry).items():
+        if k in exclude or param is None or isinstance(param, (str, type)) or hasattr(param, 'expand'):
+            continue
+        tensors[k] = torch.tensor(np.array(param if hasattr(param, '__len__') else [param], dtype=np.float32), device=device)
+    return tensors
+
+
+def streamed_projection(projection:nn.Module, volume:Tensor, geometry, trajectory_chunks=None, chunk_size=1024, geometry_tensors=None)->Tensor:
+    """
+        Projects a long scan chunk by chunk of views, the views of a projection are independent.
+        Only one trajectory chunk is on the device at a time, e.g. expanded from the keyframe_trajectory of the geometry.
+    Args:
+        projection:         ParallelProjection2D, FanProjection2D or ConeProjection3D module.
+        volume:             Volume with shape (batch, *volume_shape) as torch.Tensor.
+        geometry:           Geometry object, its trajectory member is not used.
+        trajectory_chunks:  Iterable of (view_indices, trajectory chunk) tuples, by default geometry.trajectory_chunks(chunk_size).
+        chunk_size:         Number of views per chunk of the default chunks.
+        geometry_tensors:   Dict of the geometry tensors on the device of the volume, e.g. of a projection plan,
+                            by default the geometry is converted with tensor_geometry.
+    Returns:
+        The sinogram with shape (batch, number_of_projections, ...) as torch.Tensor.
+    """
+    if trajectory_chunks is None:
+        trajectory_chunks = geometry.trajectory_chunks(chunk_size)
+    chunk_geometry = tensor_geometry(geometry, volume.device) if geometry_tensors is None else dict(geometry_tensors)
+    chunk_geometry['rotational_symmetry'] = torch.zeros(1)
+
+    chunks = []
+    for view_indices, trajectory in trajectory_chunks:
+        chunk_geometry['trajectory'] = torch.tensor(np.asarray(trajectory, dtype=np.float32), device=volume.device)
+        chunk_geometry['sinogram_shape'] = torch.tensor(np.array([len(view_indices), *geometry.detector_shape], dtype=np.float32),
+                                                        device=volume.device)
+        chunks.append(projection(volume, **chunk_geometry))
+    return torch.cat(chunks, dim=1)
+
+
+def streamed_backprojection(backprojection:nn.Module, sinogram, geometry, trajectory_chunks=None, chunk_size=1024)->Tensor:
+    """
+        Backprojects a long scan chunk by chunk of views and accumulates the volume, the backprojection is linear in the views.
+        Only one trajectory chunk and the corresponding sinogram views are on the device at a time,
+        thus the memory is bounded by the chunk size regardless of the scan length.
+    Args:
+        backprojection:     ParallelBackProjection2D, FanBackProjection2D or ConeBackProjection3D module.
+        sinogram:           Sinogram with shape (batch, number_of_projections, ...) as torch.Tensor or np.array, e.g. an np.memmap.
+                            Views of np.arrays are uploaded per chunk.
+        geometry:           Geometry object, its trajectory member is not used.
+        trajectory_chunks:  Iterable of (view_indices, trajectory chunk) tuples, e.g. from helpers.trajectories.streaming_trajectory
+                            or KeyframeTrajectory.chunks(), by default geometry.trajectory_chunks(chunk_size).
+        chunk_size:         Number of views per chunk of the default chunks.
+    Returns:
+        The volume with shape (batch, *volume_shape) as torch.Tensor.
+    """
+    if trajectory_chunks is None:
+        trajectory_chunks = geometry.trajectory_chunks(chunk_size)
+    device = sinogram.device if isinstance(sinogram, Tensor) else torch.device('cuda')
+    chunk_geometry = tensor_geometry(geometry, device)
+    # the symmetry of the full trajectory does not hold for a chunk
+    chunk_geometry['rotational_symmetry'] = torch.zeros(1)
+    number_of_projections = sinogram.shape[1]
+
+    volume = None
+    for view_indices, trajectory in trajectory_chunks:
+        if isinstance(sinogram, Tensor):
+            chunk_sinogram = sinogram[:, torch.as_tensor(view_indices, device=device)].contiguous()
+        else:
+            chunk_sinogram = torch.tensor(np.asarray(sinogram[:, view_indices], dtype=np.float32), device=device)
+        chunk_geometry['trajectory'] = torch.tensor(np.asarray(trajectory, dtype=np.float32), device=device)
+
+        chunk_volume = backprojection(chunk_sinogram, **chunk_geometry)
+        if not isinstance(backprojection, ConeBackProjection3D):
+            # the 2D kernels normalize by the number of views they see, the cone kernel uses the projection_multiplier of the geometry
+            chunk_volume = chunk_volume * (len(view_indices) / number_of_projections)
+        volume = chunk_volume if volume is None else volume + chunk_volume
+    return volume
@@ -0,0 +1,73 @@
+# Copyright [2019] [Christopher Syben, Markus Michen]
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+import torch
+from torch import Tensor
+from torch import nn
+
+from pyronn.ct_reconstruction.helpers.filters.filters import half_spectrum_filter, padded_length
+
+
+class TrainableFrequencyFilter(nn.Module):
+    """
+        Trainable reconstruction filter. The parameters are the half-spectrum of the zero-padded detector rows,
+        which is applied by broadcasting over the rfft of the sinogram, thus the filter is real and even by construction
+        and is never expanded to the sinogram shape.
+    """
+
+    def __init__(self, filter:np.ndarray, sinogram_shape, sharing:str='all')->None:
+        """
+        Args:
+            filter:         Frequency domain filter the parameters are initialized with, e.g. ram_lak from helpers.filters.filters.
+            sinogram_shape: Sinogram shape without batch axis, (projections, width) or (projections, rows, width).
+            sharing:        'all' for one filter, 'view' for one filter per projection or 'row' for one filter per detector row.
+        """
+        super(TrainableFrequencyFilter, self).__init__()
+        sinogram_shape = tuple(int(n) for n in sinogram_shape)
+        self.detector_width = sinogram_shape[-1]
+        self.padded_length = padded_length(self.detector_width)
+        # the half spectrum of a broadcast filter, e.g. ram_lak_2D, is compact with shape (1, F) or (1, 1, F)
+        half_spectrum = half_spectrum_filter(np.asarray(filter), self.padded_length)
+        frequencies = half_spectrum.shape[-1]
+        if sharing == 'all':
+            shape = (frequencies,)
+        elif sharing == 'view':
+            shape = (sinogram_shape[0],) + (1,) * (len(sinogram_shape) - 2) + (frequencies,)
+        elif sharing == 'row' and len(sinogram_shape) == 3:
+            shape = (sinogram_shape[1], frequencies)
+        else:
+            raise ValueError(f'Unknown sharing {sharing} for sinogram shape {sinogram_shape}, use all, view or row (3D only).')
+        # the filter axes are aligned with the sinogram axes from the right, it may only vary along the shared axis
+        ndim = len(sinogram_shape)
+        if half_spectrum.ndim > ndim:
+            raise ValueError(f'The filter with shape {np.shape(filter)} has more axes than the sinogram shape {sinogram_shape}.')
+        half_spectrum = half_spectrum.reshape((1,) * (ndim - half_spectrum.ndim) + half_spectrum.shape)
+        varying = {axis for axis in range(ndim - 1) if not np.all(half_spectrum == half_spectrum.take([0], axis=axis))}
+        if varying - {'all': set(), 'view': {0}, 'row': {1}}[sharing]:
+            raise ValueError(f'The filter with shape {np.shape(filter)} varies along the sinogram axes {sorted(varying)}, '
+                             f'it cannot initialize the sharing {sharing} for sinogram shape {sinogram_shape}.')
+        half_spectrum = half_spectrum[tuple(slice(None) if axis in varying else slice(0, 1) for axis in range(ndim - 1))]
+        if sharing == 'all':
+            half_spectrum = half_spectrum.reshape(frequencies)
+        elif sharing == 'row':
+            half_spectrum = half_spectrum[0]
+        self.sharing = sharing
+        self.weights = nn.Parameter(torch.tensor(np.broadcast_to(half_spectrum, shape).copy(), dtype=torch.float32))
+
+    def forward(self, input:Tensor)->Tensor:
+        x = torch.fft.rfft(input, n=self.padded_length, dim=-1)
+        x = x * self.weights
+        return torch.fft.irfft(x, n=self.padded_length, dim=-1)[..., :self.detector_width]
+
@@ -0,0 +1,104 @@
+# Copyright [2019] [Christopher Syben, Markus Michen]
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import timeit
+
+import numpy as np
+
+from pyronn.ct_reconstruction.helpers.misc.cache import get_cache, set_cache
+from pyronn.ct_reconstruction.helpers.trajectories.circular_trajectory import circular_trajectory_2d, circular_trajectory_3d
+
+
+def loop_circular_trajectory_2d(number_of_projections, angular_range, swap_detector_axis):
+    # reference: per view implementation the vectorized version replaces
+    rays = np.zeros([number_of_projections, 2])
+    angular_increment = (angular_range[1] - angular_range[0]) / number_of_projections
+    for i in range(number_of_projections):
+        angle = angular_range[0] + i * angular_increment
+        rays[i] = [np.cos(angle), -np.sin(angle) if swap_detector_axis else np.sin(angle)]
+    return rays
+
+
+def loop_circular_trajectory_3d(number_of_projections, angular_range, detector_spacing, detector_origin, source_isocenter_distance, source_detector_distance, swap_detector_axis):
+    # reference: per view implementation the vectorized version replaces
+    projection_matrices = np.zeros((number_of_projections, 3, 4))
+    x_axis = np.array([1.0, 0.0, 0.0])
+    y_axis = np.array([0.0, 1.0, 0.0])
+    z_axis = np.array([0.0, 0.0, 1.0])
+    u_dir = y_axis
+    v_dir = x_axis if swap_detector_axis else -x_axis
+
+    intrinsic_params_mat = np.eye(3, 3)
+    for i in range(2):
+        intrinsic_params_mat[i, i] = source_detector_distance / detector_spacing[1 - i]
+    intrinsic_params_mat[0, 2] = detector_origin[-1] / detector_spacing[-1] * -1
+    intrinsic_params_mat[1, 2] = detector_origin[-2] / detector_spacing[-2] * -1
+
+    current_angle = angular_range[0]
+    angular_increment = (angular_range[1] - angular_range[0]) / number_of_projections
+    for p in range(number_of_projections):
+        R_to_plane = np.eye(4, 4)
+        R_to_plane[0:3, 0:3] = np.array([z_axis, np.cross(z_axis, x_axis), -x_axis])
+
+        axis_align_R = np.eye(4, 4)
+        axis_align_R[0:3, 0] = u_dir
+        axis_align_R[0:3, 1] = v_dir
+        axis_align_R[0:3, 2] = np.cross(u_dir, v_dir)
+        axis_align_R = axis_align_R.T
+
+        R_x_axis = np.eye(4, 4)
+        R_x_axis[0:3, 0:3] = np.array([1, 0, 0,
+                                       0, np.cos(-current_angle), -np.sin(-current_angle),
+                                       0, np.sin(-current_angle), np.cos(-current_angle)]).reshape((3, 3))
+
+        translation = np.eye(4, 4)
+        translation[0:4, 3] = np.array([0, 0, source_isocenter_distance, 1])
+
+        extrinsic_params_mat = np.dot(np.dot(np.dot(translation, axis_align_R), R_x_axis), R_to_plane)
+        extrinsic_params_mat = extrinsic_params_mat / extrinsic_params_mat[3, 3]
+
+        projection_matrices[p][0:3, 0:3] = np.dot(intrinsic_params_mat, extrinsic_params_mat[0:3, 0:3])
+        projection_matrices[p][0:3, 3] = np.dot(intrinsic_params_mat, extrinsic_params_mat[0:3, 3])
+        current_angle += angular_increment
+    return projection_matrices
+
+
+def benchmark_trajectories(number_of_projections=10000, repeats=3):
+    angular_range = [0, 2 * np.pi]
+    detector_spacing = [1.0, 1.0]
+    detector_origin = [-199.5, -299.5]
+    sid, sdd = 750, 1200
+
+    cases = {
+        'circular_trajectory_2d': (lambda: loop_circular_trajectory_2d(number_of_projections, angular_range, False),
+                                   lambda: circular_trajectory_2d(number_of_projections, angular_range, False)),
+        'circular_trajectory_3d': (lambda: loop_circular_trajectory_3d(number_of_projections, angular_range, detector_spacing, detector_origin, sid, sdd, False),
+                                   lambda: circular_trajectory_3d(number_of_projections, angular_range, detector_spacing, detector_origin, sid, sdd, False)),
+    }
+    # the generators are cached, without the cache every call computes the trajectory
+    cache = get_cache()
+    set_cache(None)
+    try:
+        for name, (loop, vectorized) in cases.items():
+            deviation = np.max(np.abs(loop() - vectorized()))
+            loop_time = min(timeit.repeat(loop, number=1, repeat=repeats))
+            vectorized_time = min(timeit.repeat(vectorized, number=1, repeat=repeats))
+            print(f'{name}: {number_of_projections} views, loop {loop_time * 1e3:.1f} ms, vectorized {vectorized_time * 1e3:.2f} ms, '
+                  f'speedup {loop_time / vectorized_time:.0f}x, max deviation {deviation:.2e}')
+    finally:
+        set_cache(cache)
+
+
+if __name__ == '__main__':
+    benchmark_trajectories()